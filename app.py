@@ -1,18 +1,34 @@
 import os
 from datetime import datetime
-from flask import Flask, render_template, redirect, url_for, request, flash, jsonify, send_file, session
+from functools import wraps
+from flask import Flask, Response, abort, make_response, render_template, redirect, url_for, request, flash, jsonify, send_file, session, stream_with_context
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from models.users import db, User, Person, SaldoFavor
+from models.users import db, User, Person, SaldoFavor, PersonBalance
 from models.move import Movimiento, DetalleMovimiento, Abono, AbonoIndirecto
 from forms.forms import LoginForm, RegisterForm, PersonForm, MovimientoForm
-import csv
-import io
+from services.asignacion import ESTRATEGIAS, aplicar_plan, deudas_abiertas, disponible_abono, pagina_deudas_abiertas, planificar
+from services.cache import crear_cache, clave_usuario, incrementar_version
+from services.dashboard import RESOLUCIONES, RANGOS, inicio_rango, totales_por_tipo, totales_rango, gastos_por_categoria, serie_ingresos_gastos
+from services.exportar import filas_csv, movimientos_exportables
+from services.importar import ImportacionError, importar_movimientos
+from services.instrumentacion import Instrumentacion
+from services.jobs import JobRunner
+from services import metricas
+from services.motor import configurar_engine, opciones_engine
+from services.paginacion import PaginaKeyset, paginar_keyset
+from services.muestreo import reducir_serie
+from services.movimientos import TIPOS, ajustar_abonado, crear_movimientos
+from services.serializacion import respuesta_json, tabla
+from services.rollups import descontar_movimiento, reconstruir_rollups
+from services.balances import deudas_por_persona, falta_movimiento, actualizar_balances, personas_de_movimiento, personas_con_detalles, obtener_balance, obtener_balances, reconstruir_balances
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 import logging
+import click
 from dotenv import load_dotenv
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 from flask_migrate import Migrate
 
 load_dotenv()
@@ -20,6 +36,9 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
+# Identifica el despliegue en los ETag: un deploy nuevo (plantillas distintas) no reutiliza 304 viejos
+RELEASE = os.getenv('RENDER_GIT_COMMIT') or os.getenv('APP_RELEASE', '')
+
 
 # -------------------------
 # Helpers
@@ -49,6 +68,58 @@ def parse_amount(value, default=0):
         raise ValueError(f"Monto inválido: {value}") from e
 
 
+def parse_date_arg(value, nombre='fecha'):
+    """Parsea una fecha ISO de un parámetro de filtro. Devuelve date o None.
+
+    Los valores inválidos se registran y se ignoran (el filtro no se aplica).
+    """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).date()
+    except Exception as e:
+        logger.warning(f"Fecha {nombre} inválida: {value} → {e}")
+        return None
+
+
+def prefiere_json():
+    """True si el cliente pidió JSON explícitamente (fetch, integraciones)."""
+    return request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+
+def respuesta_condicional(vista=None, variante=None):
+    """GET condicional con ETag a partir de la versión de datos del usuario.
+
+    Si el navegador ya tiene la versión actual responde 304 antes de ejecutar
+    la vista (sin consultas). Va debajo de @login_required. No aplica si hay
+    mensajes flash pendientes, que solo se muestran al renderizar.
+
+    `variante` es una función opcional cuyo resultado se agrega al ETag, para
+    vistas que dependen de algo más que los datos (p. ej. la fecha de hoy).
+    No se envía Last-Modified: con resolución de segundos no distingue dos
+    escrituras dentro del mismo segundo, y la versión sí.
+    """
+    if vista is None:
+        return lambda v: respuesta_condicional(v, variante)
+
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        if request.method != 'GET' or '_flashes' in session:
+            return vista(*args, **kwargs)
+
+        etag = f'u{current_user.id}-v{current_user.data_version}-{RELEASE}'
+        if variante is not None:
+            etag += f'-{variante()}'
+
+        vigente = request.if_none_match.contains(etag)
+        respuesta = make_response('', 304) if vigente else make_response(vista(*args, **kwargs))
+        if respuesta.status_code in (200, 304):
+            respuesta.set_etag(etag)
+            respuesta.headers['Cache-Control'] = 'private, no-cache'
+        return respuesta
+    return envoltura
+
+
 def format_currency_int(value):
     """Formatea un entero como moneda: $1,234"""
     try:
@@ -58,6 +129,12 @@ def format_currency_int(value):
     return "${:,.0f}".format(v)
 
 
+def clave_movimiento(fila):
+    """Posición (fecha, id) de una fila (Movimiento, falta) para el cursor."""
+    mov = fila[0]
+    return mov.fecha, mov.id
+
+
 # -------------------------
 # App factory
 # -------------------------
@@ -67,10 +144,38 @@ def create_app():
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY') or 'dev'
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL') or 'sqlite:///' + os.path.join(BASE_DIR, 'db', 'database.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opciones_engine(app.config['SQLALCHEMY_DATABASE_URI'])
 
     db.init_app(app)
     Migrate(app, db)
 
+    # Pragmas de SQLite / statement_timeout de PostgreSQL en cada conexión nueva
+    with app.app_context():
+        configurar_engine(db.engine)
+
+    jobs = JobRunner(
+        os.getenv('EXPORTS_DIR') or os.path.join(app.instance_path, 'exports'),
+        max_workers=int(os.getenv('EXPORT_WORKERS', '2')),
+        al_terminar=metricas.registrar_exportacion,
+    )
+    app.extensions['jobs'] = jobs
+
+    cache = crear_cache()
+    app.extensions['cache'] = cache
+
+    # Métricas Prometheus en /metrics
+    with app.app_context():
+        metricas.init_app(app, db.engine)
+
+    # Métricas de SQL por petición (opcional): header Server-Timing, log "app.sql" y /admin/sql
+    if os.getenv('SQL_INSTRUMENTACION') == '1':
+        instrumentacion = Instrumentacion(
+            capacidad=int(os.getenv('SQL_BUFFER', '200')),
+            lenta_ms=float(os.getenv('SQL_LENTA_MS', '100')),
+        )
+        with app.app_context():
+            instrumentacion.init_app(app, db.engine)
+
     login_manager = LoginManager()
     login_manager.init_app(app)
     login_manager.login_view = 'login'
@@ -138,140 +243,183 @@ def create_app():
     @app.route('/dashboard')
     @login_required
     def dashboard():
-        page = request.args.get("page", 1, type=int)
-        per_page = 10
-
-        pagination = Movimiento.query \
-            .filter_by(user_id=current_user.id) \
-            .order_by(Movimiento.fecha.desc()) \
-            .paginate(page=page, per_page=per_page)
-
-        movimientos = prepare_movimientos_saldo(pagination.items)
-
-        all_movs = Movimiento.query.filter_by(user_id=current_user.id).all()
-
-        ingresos = sum(int(m.monto) for m in all_movs if m.tipo == 'ingreso')
-        gastos = sum(int(m.monto) for m in all_movs if m.tipo == 'gasto')
-        pagos = sum(int(m.monto) for m in all_movs if m.tipo == 'pago')
-        balance = ingresos - gastos
-
-        ingresos_gastos_data = {
-            'labels': [m.fecha.strftime('%d/%m') for m in all_movs],
-            'ingresos': [int(m.monto) for m in all_movs if m.tipo == 'ingreso'],
-            'gastos': [int(m.monto) for m in all_movs if m.tipo == 'gasto'],
-        }
-
-        categorias = {}
-        for m in all_movs:
-            if m.tipo == 'gasto':
-                categorias[m.categoria] = categorias.get(m.categoria, 0) + int(m.monto)
-
-        categorias_data = {
-            'labels': list(categorias.keys()),
-            'valores': list(categorias.values()),
-        }
-
-        # --- Deudas por persona ---
-        persons = Person.query.filter_by(user_id=current_user.id).all()
-        deudas = []
-        total_deuda = 0
-
-        for p in persons:
-            total_monto = 0
-            total_abonos = 0
-            total_le_deben = 0
-
-            for d in p.detalles:
-                if d.movimiento.user_id != current_user.id:
-                    continue
-
-                abonos_sum = sum(int(a.monto) for a in d.abonos)
-                total_monto += int(d.monto)
-                total_abonos += abonos_sum
-
-                if getattr(d, 'pago_todo', False):
-                    otros_detalles = DetalleMovimiento.query.filter(
-                        DetalleMovimiento.movimiento_id == d.movimiento_id,
-                        DetalleMovimiento.persona_id != p.id,
-                    ).all()
-
-                    for od in otros_detalles:
-                        abonos_od = sum(int(a.monto) for a in od.abonos)
-                        deuda_od = max(int(od.monto) - abonos_od, 0)
-                        total_le_deben += deuda_od
-
-            saldo_favor_total = db.session.query(
-                db.func.coalesce(db.func.sum(SaldoFavor.monto), 0)
-            ).filter_by(persona_id=p.id, user_id=current_user.id).scalar() or 0
-
-            total_debe = max(total_monto - total_abonos, 0)
-            balance_person = total_le_deben - total_debe + int(saldo_favor_total)
-
-            total_deuda += total_debe
-
-            deudas.append({
-                'person': p,
-                'debe': total_debe,
-                'pagado': total_abonos,
-                'le_deben': total_le_deben,
-                'saldo_favor': int(saldo_favor_total),
-                'balance': balance_person,
-            })
-
-        return render_template(
-            'dashboard.html',
-            movimientos=movimientos,
-            pagination=pagination,
-            ingresos=ingresos,
-            gastos=gastos,
-            pagos=pagos,
-            balance=balance,
-            deudas=deudas,
-            ingresos_gastos_data=ingresos_gastos_data,
-            categorias_data=categorias_data,
-            total_deuda=total_deuda,
-        )
+        """Esqueleto del dashboard: cada panel se pide aparte (/api/v1/* y
+        /dashboard/table) desde dashboard.js, así uno lento no frena al resto."""
+        granularidad, rango = parametros_grafica()
+        return render_template('dashboard.html', granularidad=granularidad, rango=rango)
+
+    def parametros_grafica():
+        granularidad = request.args.get('agrupar', 'mes')
+        if granularidad not in RESOLUCIONES:
+            granularidad = 'mes'
+        rango = request.args.get('rango', '12')
+        if rango not in RANGOS:
+            rango = '12'
+        return granularidad, rango
+
+    def resumen_usuario():
+        def calcular():
+            totales = totales_por_tipo(current_user.id)
+            return {
+                'ingresos': totales['ingreso'],
+                'gastos': totales['gasto'],
+                'pagos': totales['pago'],
+                'balance': totales['ingreso'] - totales['gasto'],
+            }
+
+        return cache.obtener(clave_usuario('resumen', current_user), calcular)
+
+    def deudas_usuario():
+        def calcular():
+            return [dict(d, person={'id': d['person'].id, 'name': d['person'].name}) for d in deudas_por_persona(current_user.id)]
+
+        return cache.obtener(clave_usuario('deudas', current_user), calcular)
+
+    def series_usuario(granularidad, rango):
+        desde = inicio_rango(rango)
+
+        def calcular():
+            return {
+                'ingresos_gastos': serie_ingresos_gastos(current_user.id, granularidad, desde),
+                'categorias': gastos_por_categoria(current_user.id, desde),
+            }
+
+        # El inicio del rango depende de la fecha de hoy, no solo de los datos
+        return cache.obtener(clave_usuario('series', current_user, granularidad, desde), calcular)
+
+    def ventana_grafica():
+        """Inicio del rango pedido, para el ETag de las vistas que lo usan."""
+        return inicio_rango(parametros_grafica()[1]) or 'todo'
 
     @app.route('/dashboard/table')
     @login_required
+    @respuesta_condicional
     def dashboard_table():
-        page = request.args.get("page", 1, type=int)
-        per_page = 10
-
-        pagination = Movimiento.query \
-            .filter_by(user_id=current_user.id) \
-            .order_by(Movimiento.fecha.desc()) \
-            .paginate(page=page, per_page=per_page)
-
-        movimientos = prepare_movimientos_saldo(pagination.items)  # función reutilizable
+        pagination, movimientos = pagina_movimientos(request.args.get('despues'), request.args.get('antes'))  # función reutilizable
 
         return render_template("dashboard_table.html",
                             movimientos=movimientos,
                             pagination=pagination)
-    
-    def prepare_movimientos_saldo(movimientos):
-        """Prepara la lista de movimientos con su saldo faltante."""
-        data = []
 
-        for mov in movimientos:
-            total_falta = 0
+    def pagina_movimientos(despues=None, antes=None):
+        """paginar_movimientos con caché: guarda los cursores y las filas ya convertidas."""
+        def calcular():
+            pagination, movimientos = paginar_movimientos(despues, antes)
+            return PaginaKeyset([], pagination.next_cursor, pagination.prev_cursor), movimientos
+
+        return cache.obtener(clave_usuario('movimientos', current_user, despues, antes), calcular)
+    
+    def paginar_movimientos(despues=None, antes=None, per_page=10):
+        """Página de movimientos del usuario con su saldo faltante.
+
+        Usa paginación por cursor sobre (fecha DESC, id DESC) y calcula el
+        faltante en la misma consulta (subconsulta correlacionada sobre
+        detalle_movimiento / abono): una sola consulta por página, sin COUNT.
+        """
+        query = Movimiento.query \
+            .filter_by(user_id=current_user.id) \
+            .add_columns(falta_movimiento().label('falta'))
 
-            for det in mov.detalles:
-                abonos_sum = sum(int(a.monto) for a in det.abonos)
-                falta_detalle = int(det.monto) - abonos_sum
-                total_falta += max(falta_detalle, 0)
+        pagination = paginar_keyset(query, Movimiento.fecha, Movimiento.id, clave_movimiento, despues, antes, per_page)
+        return pagination, prepare_movimientos_saldo(pagination.items)
 
-            data.append({
+    def prepare_movimientos_saldo(filas):
+        """Convierte filas (Movimiento, falta) en los diccionarios de la tabla."""
+        return [
+            {
                 'id': mov.id,
                 'fecha': mov.fecha,
                 'tipo': mov.tipo,
                 'categoria': mov.categoria,
                 'descripcion': mov.descripcion,
-                'monto': int(mov.monto),
-                'falta': total_falta,
-            })
+                'monto': mov.monto,
+                'falta': falta,
+            }
+            for mov, falta in filas
+        ]
+
+    # -------------------------
+    # API v1: lecturas del dashboard en JSON
+    # -------------------------
+    COLUMNAS_DEUDAS = ('persona_id', 'persona', 'debe', 'pagado', 'le_deben', 'saldo_favor', 'balance')
+    COLUMNAS_MOVIMIENTOS = ('id', 'fecha', 'tipo', 'categoria', 'descripcion', 'monto', 'falta')
+    COLUMNAS_DEUDAS_ABIERTAS = ('detalle_id', 'movimiento_id', 'fecha', 'categoria', 'descripcion', 'falta')
+    POR_PAGINA_DEUDAS = 20
+    MAX_LIMITE_API = 100
+    MIN_PUNTOS_SERIE, MAX_PUNTOS_SERIE = 10, 2000
+
+    @app.route('/api/v1/summary')
+    @login_required
+    @respuesta_condicional
+    def api_summary():
+        return respuesta_json(dict(resumen_usuario(), total_deuda=sum(d['debe'] for d in deudas_usuario())))
+
+    @app.route('/api/v1/deudas')
+    @login_required
+    @respuesta_condicional
+    def api_deudas():
+        deudas = deudas_usuario()
+        filas = [dict(d, persona_id=d['person']['id'], persona=d['person']['name']) for d in deudas]
+        return respuesta_json(dict(tabla(COLUMNAS_DEUDAS, filas), total_deuda=sum(d['debe'] for d in deudas)))
+
+    @app.route('/api/v1/series')
+    @login_required
+    @respuesta_condicional(variante=ventana_grafica)
+    def api_series():
+        """Serie de ingresos/gastos y gastos por categoría (?agrupar=, ?rango= como el dashboard).
+
+        `?puntos=` es el máximo de puntos de la serie de ingresos/gastos; si
+        hay más se reduce con LTTB y `total_puntos` indica el largo original.
+        """
+        granularidad, rango = parametros_grafica()
+        puntos = min(max(request.args.get('puntos', MAX_PUNTOS_SERIE, type=int), MIN_PUNTOS_SERIE), MAX_PUNTOS_SERIE)
+        series = series_usuario(granularidad, rango)
+        return respuesta_json(dict(
+            series,
+            ingresos_gastos=reducir_serie(series['ingresos_gastos'], puntos),
+            agrupar=granularidad,
+            rango=rango,
+        ))
+
+    @app.route('/api/v1/movimientos')
+    @login_required
+    @respuesta_condicional
+    def api_movimientos():
+        """Página de movimientos con su faltante; cursores en `siguiente` / `anterior` (?despues=, ?antes=)."""
+        despues, antes = request.args.get('despues'), request.args.get('antes')
+        limite = min(max(request.args.get('limite', 25, type=int), 1), MAX_LIMITE_API)
+
+        def calcular():
+            pagination, movimientos = paginar_movimientos(despues, antes, per_page=limite)
+            return dict(
+                tabla(COLUMNAS_MOVIMIENTOS, movimientos),
+                siguiente=pagination.next_cursor,
+                anterior=pagination.prev_cursor,
+            )
+
+        return respuesta_json(cache.obtener(clave_usuario('api_movimientos', current_user, despues, antes, limite), calcular))
+
+    @app.route('/api/v1/personas/<int:persona_id>/deudas-abiertas')
+    @login_required
+    @respuesta_condicional
+    def api_deudas_abiertas(persona_id):
+        """Deudas abiertas de una persona para el selector de movimiento destino.
+
+        ?q= busca por categoría, descripción o número; cursores en `siguiente`
+        / `anterior` (?despues=, ?antes=) como en /api/v1/movimientos.
+        """
+        Person.query.filter_by(id=persona_id, user_id=current_user.id).first_or_404()
+        limite = min(max(request.args.get('limite', POR_PAGINA_DEUDAS, type=int), 1), MAX_LIMITE_API)
+        pagina, deudas = pagina_deudas_abiertas(
+            current_user.id, persona_id, request.args.get('q', ''),
+            request.args.get('despues'), request.args.get('antes'), por_pagina=limite,
+        )
+        return respuesta_json(dict(
+            tabla(COLUMNAS_DEUDAS_ABIERTAS, deudas),
+            siguiente=pagina.next_cursor,
+            anterior=pagina.prev_cursor,
+        ))
 
-        return data
 
     # Personas
     @app.route('/personas', methods=['GET', 'POST'])
@@ -281,22 +429,24 @@ def create_app():
         if form.validate_on_submit():
             p = Person(name=form.name.data.strip(), user_id=current_user.id)
             db.session.add(p)
+            incrementar_version(current_user.id)
             db.session.commit()
             flash('Persona agregada', 'success')
             return redirect(url_for('personas'))
         persons = Person.query.filter_by(user_id=current_user.id).all()
-        return render_template('personas.html', form=form, persons=persons)
+        con_registros = personas_con_detalles([p.id for p in persons])
+        return render_template('personas.html', form=form, persons=persons, con_registros=con_registros)
 
     @app.route('/personas/delete/<int:person_id>', methods=['POST'])
     @login_required
     def person_delete(person_id):
         p = Person.query.filter_by(id=person_id, user_id=current_user.id).first_or_404()
-        tiene_detalles = bool(p.detalles)
-        tiene_abonos = any(d.abonos for d in p.detalles)
-        if tiene_detalles or tiene_abonos:
+        if personas_con_detalles([p.id]):
             flash('No puedes eliminar esta persona porque tiene registros asociados a movimientos o abonos.', 'danger')
             return redirect(url_for('personas'))
+        PersonBalance.query.filter_by(persona_id=p.id).delete()
         db.session.delete(p)
+        incrementar_version(current_user.id)
         db.session.commit()
         flash('Persona eliminada correctamente.', 'success')
         return redirect(url_for('personas'))
@@ -310,21 +460,21 @@ def create_app():
 
         desde = request.args.get('desde')
         hasta = request.args.get('hasta')
-        query = Movimiento.query.filter_by(user_id=current_user.id)
-        if desde:
-            try:
-                d = datetime.fromisoformat(desde).date()
+
+        def render_listado():
+            """Página del historial (filtrada por desde/hasta) con los totales del rango."""
+            query = Movimiento.query.filter_by(user_id=current_user.id)
+            d = parse_date_arg(desde, 'desde')
+            h = parse_date_arg(hasta, 'hasta')
+            if d:
                 query = query.filter(Movimiento.fecha >= d)
-            except Exception as e:
-                logger.warning(f"Fecha desde inválida: {desde} → {e}")
-        if hasta:
-            try:
-                h = datetime.fromisoformat(hasta).date()
+            if h:
                 query = query.filter(Movimiento.fecha <= h)
-            except Exception as e:
-                logger.warning(f"Fecha hasta inválida: {hasta} → {e}")
 
-        movimientos_list = query.order_by(Movimiento.fecha.desc()).all()
+            pagination = paginar_keyset(query, Movimiento.fecha, Movimiento.id, lambda m: (m.fecha, m.id),
+                                        request.args.get('despues'), request.args.get('antes'), per_page=50)
+            totales = totales_rango(current_user.id, d, h)
+            return render_template('movimientos.html', form=form, movimientos=pagination.items, pagination=pagination, totales=totales, persons=persons, desde=desde or '', hasta=hasta or '')
 
         if request.method == 'POST':
             try:
@@ -336,56 +486,33 @@ def create_app():
 
                 if not tipo or not categoria or not monto_raw or not fecha_raw:
                     flash('Por favor completa todos los campos obligatorios.', 'danger')
-                    return render_template('movimientos.html', form=form, movimientos=movimientos_list, persons=persons, desde=desde or '', hasta=hasta or '')
+                    return render_listado()
 
                 monto = parse_amount(monto_raw)
                 fecha = datetime.strptime(fecha_raw, '%Y-%m-%d').date()
 
-                movimiento = Movimiento(tipo=tipo, categoria=categoria, descripcion=descripcion, monto=monto, fecha=fecha, user_id=current_user.id)
-                db.session.add(movimiento)
-                db.session.flush()
-
+                detalles = []
                 for p in persons:
-                    key_m = f"monto_{p.id}"
-                    key_a = f"abonado_{p.id}"
-                    key_e = f"estado_{p.id}"
-
-                    monto_persona_raw = request.form.get(key_m, '').strip()
+                    monto_persona_raw = request.form.get(f"monto_{p.id}", '').strip()
                     if not monto_persona_raw:
                         continue
                     try:
-                        monto_persona = parse_amount(monto_persona_raw)
-                        abonado = parse_amount(request.form.get(key_a, '0'))
-                        estado = request.form.get(key_e, 'Debe')
-                        pago_key = f"pago_{p.id}"
-
-                        detalle = DetalleMovimiento(
-                            persona_id=p.id,
-                            movimiento_id=movimiento.id,
-                            monto=monto_persona,
-                            abonado=0,
-                            falta=monto_persona,
-                            estado=estado,
-                        )
-                        detalle.pago_todo = request.form.get(pago_key) == '1'
-                        db.session.add(detalle)
-                        db.session.flush()
-
-                        if abonado > 0:
-                            abono_inicial = Abono(detalle_id=detalle.id, monto=abonado, fecha=datetime.combine(fecha, datetime.min.time()))
-                            db.session.add(abono_inicial)
-                            db.session.flush()
-
-                        total_abonos = sum(int(a.monto) for a in detalle.abonos)
-                        detalle.abonado = total_abonos
-                        detalle.falta = max(int(detalle.monto) - total_abonos, 0)
-                        detalle.estado = 'Pagado' if detalle.falta == 0 else 'Debe'
-
-                        db.session.commit()
+                        detalles.append({
+                            'persona_id': p.id,
+                            'monto': parse_amount(monto_persona_raw),
+                            'abonado': parse_amount(request.form.get(f"abonado_{p.id}", '0')),
+                            'pago_todo': request.form.get(f"pago_{p.id}") == '1',
+                        })
                     except ValueError as ve:
                         logger.warning(f"Error parseando monto/abonado para {p.name}: {ve}")
                         continue
 
+                # Movimiento, repartos, abonos, acumulados y balances en una sola transacción
+                crear_movimientos(current_user.id, [{
+                    'tipo': tipo, 'categoria': categoria, 'descripcion': descripcion,
+                    'monto': monto, 'fecha': fecha, 'detalles': detalles,
+                }])
+                incrementar_version(current_user.id)
                 db.session.commit()
                 flash('Movimiento creado correctamente.', 'success')
                 return redirect(url_for('movimientos'))
@@ -394,7 +521,17 @@ def create_app():
                 logger.exception('Error guardando movimiento')
                 flash(f'Error al guardar movimiento: {e}', 'danger')
 
-        return render_template('movimientos.html', form=form, movimientos=movimientos_list, persons=persons, desde=desde or '', hasta=hasta or '')
+        return render_listado()
+
+    def abono_del_usuario(abono_id):
+        """Consulta del abono limitada a los movimientos del usuario actual."""
+        return Abono.query.join(
+            DetalleMovimiento, DetalleMovimiento.id == Abono.detalle_id,
+        ).join(
+            Movimiento, Movimiento.id == DetalleMovimiento.movimiento_id,
+        ).filter(
+            Abono.id == abono_id, Movimiento.user_id == current_user.id,
+        )
 
     @app.route('/movimiento/<int:mov_id>', methods=['GET', 'POST'])
     @login_required
@@ -403,43 +540,45 @@ def create_app():
         abono = None
         movimientos_deudor = []
 
-        m = Movimiento.query.filter_by(id=mov_id, user_id=current_user.id).first_or_404()
+        # Repartos (con su persona) y sus abonos en dos consultas, no una por reparto
+        detalles = selectinload(Movimiento.detalles)
+        m = Movimiento.query.options(
+            detalles.selectinload(DetalleMovimiento.abonos),
+            detalles.joinedload(DetalleMovimiento.person),
+        ).filter_by(id=mov_id, user_id=current_user.id).first_or_404()
         pagador_todo = next((d for d in m.detalles if d.pago_todo), None)
         deuda_total = 0
         if pagador_todo:
             for d in m.detalles:
                 if d.id != pagador_todo.id:
-                    abonado_total = d.abonado + sum(int(a.monto) for a in d.abonos)
-                    deuda_total += max(int(d.monto) - abonado_total, 0)
+                    abonado_total = d.abonado + sum(a.monto for a in d.abonos)
+                    deuda_total += max(d.monto - abonado_total, 0)
 
+        deudas_siguiente = None
         if abono_id:
-            abono = Abono.query.get(abono_id)
+            abono = abono_del_usuario(abono_id).first()
             if abono:
-                session['ultimo_abono_monto'] = int(abono.monto)
+                session['ultimo_abono_monto'] = abono.monto
 
             if pagador_todo:
-                movimientos_deudor = [
-                    {
-                        'movimiento_id': d.movimiento_id,
-                        'categoria': m.categoria,
-                        'descripcion': m.descripcion,
-                        'falta': int(d.falta),
-                    }
-                    for d, m in db.session.query(DetalleMovimiento, Movimiento)
-                    .filter(
-                        DetalleMovimiento.persona_id == pagador_todo.persona_id,
-                        DetalleMovimiento.falta > 0,
-                        DetalleMovimiento.movimiento_id == Movimiento.id,
-                    )
-                ]
-
-        return render_template('deuda_detalle.html', mov=m, pagador_todo=pagador_todo, deuda_total=deuda_total, abono=abono, movimientos_deudor=movimientos_deudor, abono_monto=session.get('ultimo_abono_monto'))
+                # Primera página del selector; el resto (y la búsqueda) por api_deudas_abiertas
+                pagina, movimientos_deudor = pagina_deudas_abiertas(current_user.id, pagador_todo.persona_id, por_pagina=POR_PAGINA_DEUDAS)
+                deudas_siguiente = pagina.next_cursor
+
+        return render_template('deuda_detalle.html', mov=m, pagador_todo=pagador_todo, deuda_total=deuda_total, abono=abono, movimientos_deudor=movimientos_deudor, deudas_siguiente=deudas_siguiente, abono_monto=session.get('ultimo_abono_monto'), estrategias=ESTRATEGIAS)
 
     @app.route('/movimiento/delete/<int:mov_id>', methods=['POST'])
     @login_required
     def movimiento_delete(mov_id):
         movimiento = Movimiento.query.filter_by(id=mov_id, user_id=current_user.id).first_or_404()
+        personas_afectadas = personas_de_movimiento(movimiento.id)
+        descontar_movimiento(movimiento)
+        # Los saldos ligados a este movimiento (o a sus abonos) se conservan sin el vínculo
+        SaldoFavor.query.filter_by(movimiento_id=movimiento.id).update({'abono_id': None, 'movimiento_id': None}, synchronize_session=False)
         db.session.delete(movimiento)
+        db.session.flush()
+        actualizar_balances(current_user.id, personas_afectadas)
+        incrementar_version(current_user.id)
         db.session.commit()
         flash('Movimiento y todos sus registros asociados eliminados correctamente.', 'success')
         return redirect(url_for('movimientos'))
@@ -449,9 +588,86 @@ def create_app():
     def toggle_detalle(detalle_id):
         d = DetalleMovimiento.query.join(Movimiento).filter(DetalleMovimiento.id == detalle_id, Movimiento.user_id == current_user.id).first_or_404()
         d.estado = 'Pagado' if d.estado == 'Debe' else 'Debe'
+        incrementar_version(current_user.id)
         db.session.commit()
         return jsonify({'status': 'ok', 'estado': d.estado})
 
+    MAX_LOTE_API = 1000
+
+    def validar_movimiento_api(datos, persona_ids):
+        """Convierte un movimiento del JSON de la API; lanza ValueError si es inválido."""
+        if not isinstance(datos, dict):
+            raise ValueError('Se espera un objeto')
+        tipo = str(datos.get('tipo') or '').strip().lower()
+        categoria = str(datos.get('categoria') or '').strip()
+        if tipo not in TIPOS:
+            raise ValueError(f"tipo inválido (se espera {', '.join(TIPOS)})")
+        if not categoria:
+            raise ValueError('categoria es obligatoria')
+        try:
+            fecha = datetime.strptime(str(datos.get('fecha') or ''), '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError('fecha inválida (se espera AAAA-MM-DD)')
+        if datos.get('monto') in (None, ''):
+            raise ValueError('monto es obligatorio')
+
+        detalles = []
+        for d in datos.get('detalles') or []:
+            persona_id = d.get('persona_id') if isinstance(d, dict) else None
+            if persona_id not in persona_ids:
+                raise ValueError(f'persona_id {persona_id} no existe')
+            monto_persona = parse_amount(d.get('monto'))
+            abonado = parse_amount(d.get('abonado'))
+            if monto_persona < 0 or abonado < 0:
+                raise ValueError('monto y abonado de un reparto no pueden ser negativos')
+            detalles.append({'persona_id': persona_id, 'monto': monto_persona, 'abonado': abonado,
+                             'pago_todo': bool(d.get('pago_todo'))})
+
+        return {
+            'tipo': tipo,
+            'categoria': categoria,
+            'descripcion': str(datos.get('descripcion') or '').strip(),
+            'monto': parse_amount(datos.get('monto')),
+            'fecha': fecha,
+            'detalles': detalles,
+        }
+
+    @app.route('/api/movimientos/batch', methods=['POST'])
+    @login_required
+    def api_movimientos_batch():
+        """Crea muchos movimientos con sus repartos en una sola transacción.
+
+        Cuerpo: {"movimientos": [{tipo, categoria, descripcion, monto, fecha,
+        detalles: [{persona_id, monto, abonado, pago_todo}]}]}. Si algún
+        movimiento es inválido no se guarda ninguno (400 con los errores).
+        """
+        cuerpo = request.get_json(silent=True) or {}
+        lote = cuerpo.get('movimientos') if isinstance(cuerpo, dict) else None
+        if not isinstance(lote, list) or not lote:
+            return jsonify({'error': 'Se espera {"movimientos": [...]} con al menos un elemento'}), 400
+        if len(lote) > MAX_LOTE_API:
+            return jsonify({'error': f'Máximo {MAX_LOTE_API} movimientos por lote'}), 413
+
+        persona_ids = {pid for (pid,) in db.session.query(Person.id).filter_by(user_id=current_user.id)}
+        movimientos, errores = [], []
+        for i, datos in enumerate(lote):
+            try:
+                movimientos.append(validar_movimiento_api(datos, persona_ids))
+            except ValueError as e:
+                errores.append({'indice': i, 'error': str(e)})
+        if errores:
+            return jsonify({'error': 'Lote inválido', 'errores': errores}), 400
+
+        try:
+            ids = crear_movimientos(current_user.id, movimientos)
+            incrementar_version(current_user.id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logger.exception('Error guardando lote de movimientos')
+            return jsonify({'error': 'No se pudo guardar el lote'}), 500
+        return jsonify({'status': 'ok', 'ids': ids}), 201
+
     @app.route('/movimiento/<int:mov_id>/abonar', methods=['POST'])
     @login_required
     def abonar(mov_id):
@@ -471,8 +687,7 @@ def create_app():
         detalle = DetalleMovimiento.query.filter_by(id=detalle_id, movimiento_id=mov.id).first_or_404()
         persona = detalle.person
 
-        saldo_actual = db.session.query(db.func.coalesce(db.func.sum(SaldoFavor.monto), 0)).filter_by(persona_id=persona.id).scalar() or 0
-        saldo_actual = int(saldo_actual)
+        saldo_actual = obtener_balance(current_user.id, persona.id).saldo_favor
 
         if usar_saldo == 'si':
             if saldo_actual <= 0:
@@ -482,18 +697,18 @@ def create_app():
                 flash(f'El saldo disponible de {persona.name} ({format_currency_int(saldo_actual)}) es insuficiente.', 'error')
                 return redirect(url_for('movimiento_detail', mov_id=mov.id))
 
-            registro_saldo = SaldoFavor(persona_id=persona.id, user_id=current_user.id, monto=-monto, fecha=fecha_obj, comentario=f'Uso de saldo a favor en movimiento #{mov.id}')
-            db.session.add(registro_saldo)
-
         nuevo_abono = Abono(detalle_id=detalle.id, monto=monto, fecha=fecha_obj)
         db.session.add(nuevo_abono)
         db.session.flush()
 
-        total_abonos = sum(int(a.monto) for a in detalle.abonos)
-        detalle.abonado = total_abonos
-        detalle.falta = max(int(detalle.monto) - total_abonos, 0)
-        detalle.estado = 'Pagado' if detalle.falta == 0 else 'Debe'
+        if usar_saldo == 'si':
+            registro_saldo = SaldoFavor(persona_id=persona.id, user_id=current_user.id, monto=-monto, fecha=fecha_obj, comentario=f'Uso de saldo a favor en movimiento #{mov.id}', abono_id=nuevo_abono.id, movimiento_id=mov.id)
+            db.session.add(registro_saldo)
+
+        ajustar_abonado({detalle.id: monto})
 
+        actualizar_balances(current_user.id, personas_de_movimiento(mov.id))
+        incrementar_version(current_user.id)
         db.session.commit()
 
         if usar_saldo == 'si':
@@ -506,7 +721,7 @@ def create_app():
     @app.route('/abono/<int:abono_id>/delete', methods=['POST'])
     @login_required
     def delete_abono(abono_id):
-        abono = Abono.query.get_or_404(abono_id)
+        abono = abono_del_usuario(abono_id).first_or_404()
         detalle = abono.detalle
         mov = detalle.movimiento
         persona = detalle.person
@@ -516,21 +731,25 @@ def create_app():
             for indirecto in abono.indirectos:
                 db.session.delete(indirecto)
 
+        # Uso de saldo registrado por abonar(usar_saldo='si'): búsqueda por índice en abono_id
         uso_saldo = SaldoFavor.query.filter(
-            SaldoFavor.persona_id == persona.id,
+            SaldoFavor.abono_id == abono.id,
             SaldoFavor.user_id == current_user.id,
-            SaldoFavor.monto == -abono.monto,
-            SaldoFavor.comentario.like(f'%movimiento #{mov.id}%'),
+            SaldoFavor.monto < 0,
         ).first()
 
         if uso_saldo:
-            reversion = SaldoFavor(persona_id=persona.id, user_id=current_user.id, monto=abono.monto, fecha=datetime.utcnow(), comentario=f'Reversión de uso de saldo por eliminación de abono #{abono.id} del movimiento #{mov.id}')
+            reversion = SaldoFavor(persona_id=uso_saldo.persona_id, user_id=current_user.id, monto=-uso_saldo.monto, fecha=datetime.utcnow(), comentario=f'Reversión de uso de saldo por eliminación de abono #{abono.id} del movimiento #{mov.id}', movimiento_id=mov.id)
             db.session.add(reversion)
 
-        detalle.abonado = max(int(detalle.abonado) - int(abono.monto), 0)
-        detalle.estado = 'Pagado' if detalle.abonado >= detalle.monto else 'Debe'
+        ajustar_abonado({detalle.id: -abono.monto})
 
+        # Como ON DELETE SET NULL, también en SQLite (que no aplica las FK y puede reutilizar el id)
+        SaldoFavor.query.filter_by(abono_id=abono.id).update({'abono_id': None}, synchronize_session=False)
         db.session.delete(abono)
+        db.session.flush()
+        actualizar_balances(current_user.id, personas_de_movimiento(mov.id))
+        incrementar_version(current_user.id)
         db.session.commit()
 
         flash('Abono eliminado correctamente. Se revirtió el saldo si aplicaba.', 'success')
@@ -539,7 +758,8 @@ def create_app():
     @app.route('/abono/<int:abono_id>/asignar-indirecto', methods=['POST'])
     @login_required
     def asignar_abono_indirecto(abono_id):
-        abono_origen = Abono.query.get_or_404(abono_id)
+        # Bloqueado como en asignar_abono_automatico: disponible_abono() se revisa con el abono tomado
+        abono_origen = abono_del_usuario(abono_id).with_for_update(of=Abono).first_or_404()
         detalle_origen = abono_origen.detalle
         mov_origen = detalle_origen.movimiento
 
@@ -556,8 +776,7 @@ def create_app():
             flash('Monto inválido.', 'error')
             return redirect(url_for('movimiento_detail', mov_id=mov_origen.id))
 
-        monto_total_distribuido = db.session.query(db.func.coalesce(db.func.sum(AbonoIndirecto.monto_aplicado), 0)).filter(AbonoIndirecto.abono_id == abono_id).scalar() or 0
-        monto_restante_abono = int(abono_origen.monto) - int(monto_total_distribuido)
+        monto_restante_abono = disponible_abono(abono_origen)
         if monto > monto_restante_abono:
             flash(f'El monto supera el saldo disponible del abono ({format_currency_int(monto_restante_abono)}).', 'error')
             return redirect(url_for('movimiento_detail', mov_id=mov_origen.id, abono_id=abono_id))
@@ -567,47 +786,105 @@ def create_app():
                 flash('No hay monto restante para asignar a saldo a favor.', 'info')
                 return redirect(url_for('movimiento_detail', mov_id=mov_origen.id))
 
-            nuevo_saldo = SaldoFavor(persona_id=pagador_todo.persona_id, user_id=current_user.id, monto=monto_restante_abono, fecha=datetime.utcnow(), comentario=f'Saldo a favor generado por abono #{abono_id} del movimiento #{mov_origen.id}')
+            nuevo_saldo = SaldoFavor(persona_id=pagador_todo.persona_id, user_id=current_user.id, monto=monto_restante_abono, fecha=datetime.utcnow(), comentario=f'Saldo a favor generado por abono #{abono_id} del movimiento #{mov_origen.id}', abono_id=abono_origen.id, movimiento_id=mov_origen.id)
             db.session.add(nuevo_saldo)
+            actualizar_balances(current_user.id, [pagador_todo.persona_id])
+            incrementar_version(current_user.id)
             db.session.commit()
 
             flash(f'Se registró {format_currency_int(monto_restante_abono)} como saldo a favor para {pagador_todo.person.name}.', 'success')
             return redirect(url_for('movimiento_detail', mov_id=mov_origen.id))
 
-        detalle_destino = DetalleMovimiento.query.filter_by(movimiento_id=movimiento_id, persona_id=pagador_todo.persona_id).first()
+        detalle_destino = DetalleMovimiento.query.filter_by(movimiento_id=movimiento_id, persona_id=pagador_todo.persona_id).with_for_update().first()
         if not detalle_destino:
             flash('No se encontró un registro válido en el movimiento destino.', 'error')
             return redirect(url_for('movimiento_detail', mov_id=mov_origen.id))
 
-        monto_aplicable = min(monto, int(detalle_destino.falta))
+        monto_aplicable = min(monto, detalle_destino.falta)
 
         nuevo_abono = Abono(detalle_id=detalle_destino.id, monto=monto_aplicable, fecha=datetime.now())
         db.session.add(nuevo_abono)
         db.session.flush()
 
-        detalle_destino.abonado = int(detalle_destino.abonado) + int(monto_aplicable)
-        detalle_destino.falta = max(int(detalle_destino.monto) - int(detalle_destino.abonado), 0)
-        detalle_destino.estado = 'Pagado' if detalle_destino.falta == 0 else 'Debe'
+        ajustar_abonado({detalle_destino.id: monto_aplicable})
 
         relacion = AbonoIndirecto(abono_id=abono_origen.id, movimiento_destino_id=movimiento_id, persona_destino_id=detalle_destino.persona_id, monto_aplicado=monto_aplicable)
         db.session.add(relacion)
+        actualizar_balances(current_user.id, personas_de_movimiento(detalle_destino.movimiento_id))
+        incrementar_version(current_user.id)
         db.session.commit()
 
         flash(f'Abono indirecto aplicado correctamente ({format_currency_int(monto_aplicable)}).', 'success')
         return redirect(url_for('movimiento_detail', mov_id=mov_origen.id))
 
+    COLUMNAS_ASIGNACION = ('movimiento_id', 'fecha', 'categoria', 'descripcion', 'falta', 'aplicar')
+
+    @app.route('/abono/<int:abono_id>/asignar-automatico', methods=['POST'])
+    @login_required
+    def asignar_abono_automatico(abono_id):
+        """Reparte el resto del abono entre todas las deudas abiertas del pagador.
+
+        Con simular=1 solo devuelve el plan en JSON (no escribe nada).
+        """
+        simular = request.form.get('simular') == '1'
+        abono_origen = abono_del_usuario(abono_id).with_for_update(of=Abono).first_or_404()
+        mov_origen_id = abono_origen.detalle.movimiento_id
+
+        def rechazar(mensaje):
+            if simular:
+                return respuesta_json({'error': mensaje}, status=400)
+            flash(mensaje, 'error')
+            return redirect(url_for('movimiento_detail', mov_id=mov_origen_id, abono_id=abono_id))
+
+        pagador_todo = DetalleMovimiento.query.filter_by(movimiento_id=mov_origen_id, pago_todo=True).first()
+        if not pagador_todo:
+            return rechazar('No hay pagador principal asociado a este movimiento.')
+        estrategia = request.form.get('estrategia', 'antiguos')
+        if estrategia not in ESTRATEGIAS:
+            return rechazar('Estrategia de asignación inválida.')
+
+        disponible = disponible_abono(abono_origen)
+        plan = planificar(disponible, deudas_abiertas(current_user.id, pagador_todo.persona_id, bloquear=not simular), estrategia)
+        asignado = sum(p['aplicar'] for p in plan)
+        sobrante = disponible - asignado
+
+        if simular:
+            return respuesta_json({
+                'estrategia': estrategia,
+                'disponible': disponible,
+                'asignado': asignado,
+                'sobrante': sobrante,
+                'deudas': tabla(COLUMNAS_ASIGNACION, plan),
+            })
+
+        a_saldo = sobrante if request.form.get('sobrante') == 'saldo' else 0
+        if not plan and not a_saldo:
+            flash('No hay monto ni deudas abiertas para asignar.', 'info')
+            return redirect(url_for('movimiento_detail', mov_id=mov_origen_id))
+
+        aplicar_plan(current_user.id, abono_origen, pagador_todo.persona_id, plan, sobrante=a_saldo, movimiento_origen_id=mov_origen_id)
+        incrementar_version(current_user.id)
+        db.session.commit()
+
+        mensaje = f'Se asignaron {format_currency_int(asignado)} en {len(plan)} movimientos ({ESTRATEGIAS[estrategia].lower()}).'
+        if a_saldo:
+            mensaje += f' {format_currency_int(a_saldo)} quedaron como saldo a favor de {pagador_todo.person.name}.'
+        flash(mensaje, 'success')
+        return redirect(url_for('movimiento_detail', mov_id=mov_origen_id))
+
     # SALDO A FAVOR
     @app.route('/saldo-favor', methods=['GET'])
     @login_required
+    @respuesta_condicional
     def saldo_favor():
-        personas = Person.query.filter_by(user_id=current_user.id).all()
-        data = []
-        for p in personas:
-            movimientos = SaldoFavor.query.filter_by(persona_id=p.id, user_id=current_user.id).all()
-            saldo_total = sum(m.monto if m.tipo == 'ingreso' else -m.monto for m in movimientos)
-            ultima_fecha = max((m.fecha for m in movimientos), default=None)
-            data.append({'id': p.id, 'name': p.name, 'saldo_total': int(saldo_total), 'ultima_fecha': ultima_fecha})
-        return render_template('saldo_favor.html', registros=data, personas=personas)
+        def calcular():
+            balances = obtener_balances(current_user.id)
+            return {
+                'registros': [{'id': p.id, 'name': p.name, 'saldo_total': b.saldo_neto, 'ultima_fecha': b.ultima_fecha_saldo} for p, b in balances],
+                'personas': [{'id': p.id, 'name': p.name} for p, _ in balances],
+            }
+
+        return render_template('saldo_favor.html', **cache.obtener(clave_usuario('saldo_favor', current_user), calcular))
 
     @app.route('/saldo-favor/add', methods=['POST'])
     @login_required
@@ -635,52 +912,227 @@ def create_app():
 
         nuevo = SaldoFavor(persona_id=persona_id, user_id=current_user.id, monto=monto, comentario=comentario, fecha=fecha, tipo=tipo)
         db.session.add(nuevo)
+        actualizar_balances(current_user.id, [int(persona_id)])
+        incrementar_version(current_user.id)
         db.session.commit()
         flash('Saldo registrado correctamente.', 'success')
         return redirect(url_for('saldo_favor'))
 
     @app.route('/saldo-favor/historico/<int:persona_id>')
     @login_required
+    @respuesta_condicional
     def saldo_favor_historico(persona_id):
-        persona = Person.query.filter_by(id=persona_id, user_id=current_user.id).first_or_404()
-        registros = SaldoFavor.query.filter_by(persona_id=persona.id, user_id=current_user.id).order_by(SaldoFavor.fecha.desc()).all()
-        saldo_total = sum(r.monto if r.tipo == 'ingreso' else -r.monto for r in registros)
-        return render_template('saldo_favor_historico.html', persona=persona, registros=registros, saldo_total=int(saldo_total))
+        def calcular():
+            persona = Person.query.filter_by(id=persona_id, user_id=current_user.id).first()
+            if persona is None:
+                return None
+            registros = SaldoFavor.query.filter_by(persona_id=persona.id, user_id=current_user.id).order_by(SaldoFavor.fecha.desc()).all()
+            return {
+                'persona': {'id': persona.id, 'name': persona.name},
+                'registros': [{'fecha': r.fecha, 'monto': r.monto, 'tipo': r.tipo, 'comentario': r.comentario} for r in registros],
+                'saldo_total': obtener_balance(current_user.id, persona.id).saldo_neto,
+            }
+
+        datos = cache.obtener(clave_usuario('saldo_historico', current_user, persona_id), calcular)
+        if datos is None:
+            abort(404)
+        return render_template('saldo_favor_historico.html', **datos)
 
     # EXPORT CSV
     @app.route('/export/csv')
     @login_required
     def export_csv():
-        movimientos = Movimiento.query.filter_by(user_id=current_user.id).all()
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['Fecha', 'Tipo', 'Categoría', 'Descripción', 'Monto'])
-        for m in movimientos:
-            writer.writerow([m.fecha, m.tipo, m.categoria, m.descripcion, int(m.monto)])
-        output.seek(0)
-        return send_file(io.BytesIO(output.getvalue().encode('utf-8')), mimetype='text/csv', as_attachment=True, download_name='movimientos.csv')
-
-    # EXPORT PDF
-    @app.route('/export/pdf')
-    @login_required
-    def export_pdf():
-        movimientos = Movimiento.query.filter_by(user_id=current_user.id).all()
-        buffer = io.BytesIO()
-        pdf = canvas.Canvas(buffer, pagesize=letter)
+        """CSV en streaming. Filtros opcionales: desde, hasta, tipo y detalles=1."""
+        filas = filas_csv(
+            current_user.id,
+            desde=parse_date_arg(request.args.get('desde'), 'desde'),
+            hasta=parse_date_arg(request.args.get('hasta'), 'hasta'),
+            tipo=request.args.get('tipo') or None,
+            con_detalles=request.args.get('detalles') == '1',
+        )
+        return Response(stream_with_context(filas), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=movimientos.csv'})
+
+    # EXPORT PDF (en segundo plano)
+    def filtros_exportacion():
+        return {
+            'desde': parse_date_arg(request.args.get('desde'), 'desde'),
+            'hasta': parse_date_arg(request.args.get('hasta'), 'hasta'),
+            'tipo': request.args.get('tipo') or None,
+        }
+
+    def generar_pdf_movimientos(destino, progreso, user_id, desde=None, hasta=None, tipo=None):
+        """Dibuja el reporte de movimientos en `destino` (se ejecuta en un hilo del JobRunner)."""
+        total = totales_rango(user_id, desde, hasta)['cantidad'] or 1
+        pdf = canvas.Canvas(destino, pagesize=letter)
         width, height = letter
         pdf.setFont('Helvetica-Bold', 14)
         pdf.drawString(220, height - 50, 'Reporte de Movimientos')
         y = height - 100
         pdf.setFont('Helvetica', 10)
-        for m in movimientos:
+        for i, m in enumerate(movimientos_exportables(user_id, desde, hasta, tipo), start=1):
             pdf.drawString(50, y, f"{m.fecha} | {m.tipo.capitalize()} | {m.categoria} | {format_currency_int(m.monto)}")
             y -= 15
             if y < 50:
                 pdf.showPage()
+                pdf.setFont('Helvetica', 10)
                 y = height - 50
+            if i % 500 == 0:
+                progreso(i * 100 / total)
         pdf.save()
-        buffer.seek(0)
-        return send_file(buffer, mimetype='application/pdf', as_attachment=True, download_name='movimientos.pdf')
+
+    def respuesta_job(estado):
+        return {
+            'job_id': estado['id'],
+            'estado': estado['estado'],
+            'progreso': estado['progreso'],
+            'error': estado['error'],
+            'estado_url': url_for('export_job_estado', job_id=estado['id']),
+            'descarga_url': url_for('export_job_descargar', job_id=estado['id']) if estado['estado'] == 'listo' else None,
+        }
+
+    @app.route('/export/pdf')
+    @login_required
+    def export_pdf():
+        """Encola el PDF y devuelve el id del trabajo; si ya está generado para
+        la versión actual de los datos, redirige directo a la descarga."""
+        filtros = filtros_exportacion()
+        user_id = current_user.id
+        version = current_user.data_version
+        estado = jobs.lanzar(
+            app, 'pdf', user_id, filtros, version, 'pdf',
+            lambda destino, progreso: generar_pdf_movimientos(destino, progreso, user_id, **filtros),
+        )
+        if estado['estado'] == 'listo' and not prefiere_json():
+            return redirect(url_for('export_job_descargar', job_id=estado['id']))
+        return jsonify(respuesta_job(estado)), 200 if estado['estado'] == 'listo' else 202
+
+    @app.route('/export/jobs/<job_id>')
+    @login_required
+    def export_job_estado(job_id):
+        estado = jobs.estado(job_id)
+        if not estado or estado['user_id'] != current_user.id:
+            return jsonify({'error': 'Trabajo no encontrado'}), 404
+        return jsonify(respuesta_job(estado))
+
+    @app.route('/export/jobs/<job_id>/descargar')
+    @login_required
+    def export_job_descargar(job_id):
+        estado = jobs.estado(job_id)
+        if not estado or estado['user_id'] != current_user.id or estado['estado'] != 'listo':
+            return render_template('errors/404.html'), 404
+        return send_file(jobs.ruta_artefacto(job_id, estado['extension']), mimetype='application/pdf',
+                         as_attachment=True, download_name='movimientos.pdf')
+
+    # IMPORTAR CSV / EXCEL
+    @app.route('/import', methods=['GET', 'POST'])
+    @login_required
+    def importar():
+        resultado = None
+        if request.method == 'POST':
+            archivo = request.files.get('archivo')
+            if not archivo or not archivo.filename:
+                flash('Selecciona un archivo CSV o Excel.', 'danger')
+                return redirect(url_for('importar'))
+            try:
+                resultado = importar_movimientos(current_user.id, archivo.stream, archivo.filename)
+            except ImportacionError as e:
+                if prefiere_json():
+                    return jsonify({'error': str(e)}), 400
+                flash(str(e), 'danger')
+                return redirect(url_for('importar'))
+
+            if prefiere_json():
+                return jsonify({
+                    'filas': resultado.filas,
+                    'movimientos': resultado.movimientos,
+                    'detalles': resultado.detalles,
+                    'abonos': resultado.abonos,
+                    'errores': [{'fila': f, 'error': e} for f, e in resultado.errores],
+                })
+            flash(f'Importación terminada: {resultado.movimientos} movimientos, '
+                  f'{len(resultado.errores)} filas con error.', 'success' if not resultado.errores else 'warning')
+        return render_template('importar.html', resultado=resultado)
+
+    # MÉTRICAS PROMETHEUS
+    @app.route('/metrics')
+    def metricas_endpoint():
+        token = os.getenv('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            abort(401)
+        return metricas.exponer()
+
+    # ADMIN: métricas de SQL
+    def es_admin():
+        admins = {u.strip() for u in os.getenv('ADMIN_USERS', '').split(',') if u.strip()}
+        return current_user.username in admins
+
+    @app.route('/admin/sql')
+    @login_required
+    def admin_sql():
+        if not es_admin():
+            abort(404)
+        instrumentacion = app.extensions.get('instrumentacion')
+        endpoint = request.args.get('vista') or None
+        recientes = instrumentacion.ultimas() if instrumentacion else []
+        if endpoint:
+            recientes = [r for r in recientes if r['endpoint'] == endpoint]
+        return render_template(
+            'admin_sql.html',
+            activa=instrumentacion is not None,
+            resumen=instrumentacion.por_endpoint() if instrumentacion else [],
+            recientes=recientes[:100],
+            endpoint=endpoint,
+            lenta_ms=instrumentacion.lenta_ms if instrumentacion else None,
+        )
+
+    # -------------------------
+    # CLI
+    # -------------------------
+    @app.cli.command('rebuild-balances')
+    @click.option('--user-id', type=int, default=None, help='Reconstruir solo este usuario.')
+    def rebuild_balances_command(user_id):
+        """Regenera desde cero la tabla person_balance."""
+        total = reconstruir_balances(user_id)
+        incrementar_version(user_id)
+        db.session.commit()
+        click.echo(f'person_balance reconstruida: {total} filas.')
+
+    @app.cli.command('rebuild-rollups')
+    @click.option('--user-id', type=int, default=None, help='Reconstruir solo este usuario.')
+    def rebuild_rollups_command(user_id):
+        """Regenera desde cero la tabla movimiento_mensual."""
+        total = reconstruir_rollups(user_id)
+        incrementar_version(user_id)
+        db.session.commit()
+        click.echo(f'movimiento_mensual reconstruida: {total} filas.')
+
+    @app.cli.command('import-movimientos')
+    @click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--user-id', type=int, required=True, help='Usuario dueño de los movimientos.')
+    @click.option('--chunk-size', type=int, default=5000, show_default=True, help='Filas por bloque/transacción.')
+    @click.option('--errores', type=click.Path(dir_okay=False), default=None, help='Guardar los errores por fila en este CSV.')
+    def import_movimientos_command(archivo, user_id, chunk_size, errores):
+        """Importa movimientos y repartos desde un CSV o Excel."""
+        inicio = datetime.now()
+        try:
+            with open(archivo, 'rb') as f:
+                resultado = importar_movimientos(user_id, f, archivo, tamano=chunk_size)
+        except ImportacionError as e:
+            raise click.ClickException(str(e))
+        segundos = max((datetime.now() - inicio).total_seconds(), 1e-6)
+
+        click.echo(f'Filas leídas: {resultado.filas} ({resultado.filas / segundos:,.0f} filas/s)')
+        click.echo(f'Movimientos: {resultado.movimientos} | detalles: {resultado.detalles} | abonos: {resultado.abonos}')
+        if resultado.errores:
+            click.echo(f'Filas con error: {len(resultado.errores)}')
+            if errores:
+                with open(errores, 'w', encoding='utf-8', newline='') as f:
+                    f.write(resultado.errores_csv())
+                click.echo(f'Detalle de errores en {errores}')
+            else:
+                for fila, mensaje in resultado.errores[:20]:
+                    click.echo(f'  fila {fila}: {mensaje}')
 
     # Error handlers
     @app.errorhandler(IntegrityError)
@@ -711,7 +1163,8 @@ def create_app():
     with app.app_context():
         db_dir = os.path.join(BASE_DIR, 'db')
         db_file = os.path.join(db_dir, 'database.db')
-        if not os.path.exists(db_file):
+        # Un archivo vacío (conexión abierta antes de crear el esquema) cuenta como inexistente
+        if not os.path.exists(db_file) or os.path.getsize(db_file) == 0:
             os.makedirs(db_dir, exist_ok=True)
             db.create_all()
 
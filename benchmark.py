@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+# Mide latencia, número de consultas y memoria pico de las rutas principales
+# con datos sintéticos (generar_datos.py), para comparar entre commits:
+#
+#   py benchmark.py --escala 100k --salida antes.json
+#   py benchmark.py --escala 100k --salida despues.json --comparar antes.json
+#   py benchmark.py --database-url postgresql://localhost/bench --escala 100k
+#
+# Sin --database-url usa un SQLite temporal. Si la base no tiene el usuario
+# sintético, lo genera con la escala y semilla indicadas. La caché de lecturas
+# se desactiva (CACHE_BACKEND=ninguno) salvo con --con-cache.
+
+
+def configurar_entorno(args):
+    """Variables que lee create_app(): hay que fijarlas antes de importar app."""
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        ruta = os.path.join(tempfile.mkdtemp(prefix='bench-'), f'bench-{args.escala}.db')
+        os.environ['DATABASE_URL'] = 'sqlite:///' + ruta
+    if not args.con_cache:
+        os.environ['CACHE_BACKEND'] = 'ninguno'
+    os.environ['EXPORTS_DIR'] = tempfile.mkdtemp(prefix='bench-exports-')
+    os.environ.pop('SQL_INSTRUMENTACION', None)
+
+
+def commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ''
+
+
+class Contador:
+    """Cuenta las sentencias enviadas al engine (de cualquier hilo)."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.total = 0
+        event.listen(engine, 'before_cursor_execute', self._contar)
+
+    def _contar(self, *args):
+        self.total += 1
+
+
+def casos(app, client, ids):
+    """(nombre, función que hace la petición y devuelve el status)."""
+    jobs = app.extensions['jobs']
+
+    def get(ruta, **kwargs):
+        def pedir():
+            r = client.get(ruta, **kwargs)
+            r.get_data()  # consume respuestas en streaming
+            return r.status_code
+        return pedir
+
+    def abonar():
+        r = client.post(f'/movimiento/{ids["movimiento"]}/abonar', data={
+            'detalle_id': ids['detalle'], 'monto': '100', 'fecha': '2025-12-31T12:00', 'usar_saldo': 'no',
+        })
+        return r.status_code
+
+    def exportar_pdf():
+        # Directorio vacío para que el trabajo se genere de nuevo en cada repetición
+        for nombre in os.listdir(jobs.directorio):
+            os.remove(os.path.join(jobs.directorio, nombre))
+        r = client.get('/export/pdf', headers={'Accept': 'application/json'})
+        job_id = r.get_json()['job_id']
+        while (jobs.estado(job_id) or {}).get('estado') not in ('listo', 'error'):
+            time.sleep(0.005)
+        return 200 if jobs.estado(job_id)['estado'] == 'listo' else 500
+
+    return [
+        ('dashboard', get('/dashboard')),
+        ('dashboard_table', get('/dashboard/table')),
+        ('api_summary', get('/api/v1/summary')),
+        ('api_deudas', get('/api/v1/deudas')),
+        ('api_series', get('/api/v1/series?agrupar=dia&rango=todo')),
+        ('api_movimientos', get('/api/v1/movimientos?limite=100')),
+        ('movimientos', get('/movimientos')),
+        ('movimiento_detail', get(f'/movimiento/{ids["movimiento"]}')),
+        ('movimiento_detail?abono_id', get(f'/movimiento/{ids["movimiento"]}?abono_id={ids["abono"]}')),
+        ('abonar', abonar),
+        ('saldo_favor', get('/saldo-favor')),
+        ('saldo_favor_historico', get(f'/saldo-favor/historico/{ids["persona"]}')),
+        ('export_csv', get('/export/csv?detalles=1')),
+        ('export_pdf', exportar_pdf),
+    ]
+
+
+def medir(funcion, contador, repeticiones, calentamiento=1):
+    """Latencias en ms, consultas por llamada y memoria pico (tracemalloc) en MB."""
+    for _ in range(calentamiento):
+        funcion()
+
+    tiempos, consultas = [], []
+    for _ in range(repeticiones):
+        antes = contador.total
+        inicio = time.perf_counter()
+        status = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        consultas.append(contador.total - antes)
+
+    # La memoria se mide aparte: tracemalloc hace más lentas las llamadas
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tiempos.sort()
+    return {
+        'status': status,
+        'repeticiones': repeticiones,
+        'p50_ms': round(statistics.median(tiempos), 2),
+        'p95_ms': round(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))], 2),
+        'min_ms': round(tiempos[0], 2),
+        'media_ms': round(statistics.fmean(tiempos), 2),
+        'consultas': int(statistics.median(consultas)),
+        'memoria_pico_mb': round(pico / 1024 / 1024, 2),
+    }
+
+
+def comparar(resultados, anterior):
+    print(f'\n🔁 Comparación con {anterior["commit"] or "?"} ({anterior["fecha"]})')
+    print(f'{"ruta":<28} {"p50 ms":>18} {"consultas":>12} {"memoria MB":>18}')
+    for nombre, r in resultados.items():
+        a = anterior['rutas'].get(nombre)
+        if not a:
+            continue
+        cambio = (r['p50_ms'] - a['p50_ms']) / a['p50_ms'] * 100 if a['p50_ms'] else 0
+        print(f'{nombre:<28} {a["p50_ms"]:>7} → {r["p50_ms"]:<7} {cambio:+5.0f}% '
+              f'{a["consultas"]:>4} → {r["consultas"]:<5} '
+              f'{a["memoria_pico_mb"]:>7} → {r["memoria_pico_mb"]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de las rutas principales con datos sintéticos.')
+    parser.add_argument('--database-url', help='Base a usar (por defecto un SQLite temporal)')
+    parser.add_argument('--escala', choices=['1k', '100k', '1m'], default='1k')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--solo', help='Rutas a medir, separadas por coma')
+    parser.add_argument('--con-cache', action='store_true', help='Medir con la caché de lecturas activa')
+    parser.add_argument('--salida', help='Guardar resultados en este JSON')
+    parser.add_argument('--comparar', help='JSON de una ejecución anterior')
+    args = parser.parse_args()
+
+    configurar_entorno(args)
+    from app import app, db
+    from generar_datos import ESCALAS, generar
+    from models.move import Abono, DetalleMovimiento
+    from models.users import Person, User
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    usuario_bench = f'bench-{args.escala}'
+
+    with app.app_context():
+        motor = db.engine.dialect.name
+        db.create_all()
+        usuario = User.query.filter_by(username=f'{usuario_bench}0').first()
+        if usuario is None:
+            print(f'⏳ Generando datos sintéticos ({args.escala}, semilla {args.semilla})...', flush=True)
+            ids_usuarios, _ = generar(ESCALAS[args.escala], semilla=args.semilla, prefijo=usuario_bench)
+            usuario = db.session.get(User, ids_usuarios[f'{usuario_bench}0'])
+
+        # Un movimiento donde alguien pagó todo y un deudor con abono
+        detalle, abono_id = db.session.query(DetalleMovimiento, Abono.id).join(
+            Abono, Abono.detalle_id == DetalleMovimiento.id,
+        ).join(
+            Person, Person.id == DetalleMovimiento.persona_id,
+        ).filter(
+            Person.user_id == usuario.id,
+            DetalleMovimiento.pago_todo.is_(False),
+            DetalleMovimiento.movimiento_id.in_(
+                db.session.query(DetalleMovimiento.movimiento_id).filter(DetalleMovimiento.pago_todo.is_(True))
+            ),
+        ).order_by(DetalleMovimiento.id.desc()).first()
+        ids = {'movimiento': detalle.movimiento_id, 'detalle': detalle.id, 'abono': abono_id, 'persona': detalle.persona_id}
+        user_id = usuario.id
+        contador = Contador(db.engine)
+
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s['_user_id'] = str(user_id)
+        s['_fresh'] = True
+
+    seleccion = set(args.solo.split(',')) if args.solo else None
+    print(f'📋 Motor: {motor} | escala: {args.escala} | commit: {commit_actual() or "?"} | repeticiones: {args.repeticiones}')
+    print(f'{"ruta":<28} {"status":>6} {"p50 ms":>9} {"p95 ms":>9} {"consultas":>10} {"memoria MB":>11}')
+    resultados = {}
+    for nombre, funcion in casos(app, client, ids):
+        if seleccion and nombre not in seleccion:
+            continue
+        r = medir(funcion, contador, args.repeticiones)
+        resultados[nombre] = r
+        print(f'{nombre:<28} {r["status"]:>6} {r["p50_ms"]:>9} {r["p95_ms"]:>9} {r["consultas"]:>10} {r["memoria_pico_mb"]:>11}', flush=True)
+
+    salida = {
+        'commit': commit_actual(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'motor': motor,
+        'escala': args.escala,
+        'semilla': args.semilla,
+        'cache': args.con_cache,
+        'python': platform.python_version(),
+        'rutas': resultados,
+    }
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(salida, f, indent=2)
+        print(f'💾 Resultados en {args.salida}')
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(resultados, json.load(f))
+
+    shutil.rmtree(os.environ['EXPORTS_DIR'], ignore_errors=True)
+    if any(r['status'] >= 400 for r in resultados.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
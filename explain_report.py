@@ -0,0 +1,93 @@
+import argparse
+from datetime import date
+
+from sqlalchemy import func, select
+
+from app import app, db
+from models.move import Movimiento, DetalleMovimiento, Abono, AbonoIndirecto
+from models.users import Person, SaldoFavor
+from services.balances import falta_movimiento
+
+# Muestra el plan de ejecución de las consultas principales de cada ruta.
+# Ejecutar antes y después de `flask db upgrade` para comparar el efecto de
+# los índices:
+#
+#   py explain_report.py --user-id 1 > antes.txt
+#   flask db upgrade
+#   py explain_report.py --user-id 1 > despues.txt
+
+
+def consultas(user_id, persona_id, mov_id, detalle_id):
+    """(ruta, descripción, sentencia) de los patrones de acceso más usados."""
+    return [
+        ('/dashboard/table', 'página de movimientos (fecha DESC, id DESC) con faltante',
+         select(Movimiento.id, falta_movimiento())
+         .where(Movimiento.user_id == user_id)
+         .order_by(Movimiento.fecha.desc(), Movimiento.id.desc())
+         .limit(11)),
+        ('/movimientos', 'historial filtrado por rango de fechas',
+         select(Movimiento.tipo, func.sum(Movimiento.monto))
+         .where(Movimiento.user_id == user_id, Movimiento.fecha >= date(2024, 1, 1), Movimiento.fecha <= date(2024, 12, 31))
+         .group_by(Movimiento.tipo)),
+        ('/dashboard', 'personas del usuario',
+         select(Person.id).where(Person.user_id == user_id)),
+        ('/dashboard', 'detalles y abonos por persona (motor de balances)',
+         select(DetalleMovimiento.persona_id, func.sum(DetalleMovimiento.monto))
+         .join(Movimiento, Movimiento.id == DetalleMovimiento.movimiento_id)
+         .where(Movimiento.user_id == user_id)
+         .group_by(DetalleMovimiento.persona_id)),
+        ('/saldo-favor/historico', 'saldo a favor de una persona',
+         select(SaldoFavor.id).where(SaldoFavor.persona_id == persona_id, SaldoFavor.user_id == user_id)),
+        ('/movimiento/<id>', 'detalles de un movimiento',
+         select(DetalleMovimiento.id).where(DetalleMovimiento.movimiento_id == mov_id)),
+        ('/movimiento/<id>', 'abonos de un detalle',
+         select(Abono.id).where(Abono.detalle_id == detalle_id)),
+        ('/movimiento/<id>?abono_id', 'deudas abiertas de la persona que pagó todo (primera página)',
+         select(DetalleMovimiento.movimiento_id, DetalleMovimiento.falta)
+         .join(Movimiento, Movimiento.id == DetalleMovimiento.movimiento_id)
+         .where(DetalleMovimiento.persona_id == persona_id, DetalleMovimiento.falta > 0, Movimiento.user_id == user_id)
+         .order_by(Movimiento.fecha.desc(), Movimiento.id.desc())
+         .limit(21)),
+        ('/abono/<id>/asignar-indirecto', 'monto ya distribuido de un abono',
+         select(func.sum(AbonoIndirecto.monto_aplicado)).where(AbonoIndirecto.abono_id == detalle_id)),
+        ('/abono/<id>/delete', 'uso de saldo a favor ligado al abono',
+         select(SaldoFavor.id).where(SaldoFavor.abono_id == detalle_id, SaldoFavor.user_id == user_id)),
+    ]
+
+
+def explicar(stmt, analyze=False):
+    conn = db.session.connection()
+    compiled = stmt.compile(dialect=conn.dialect)
+    params = compiled.params
+    if conn.dialect.positional:
+        params = tuple(params[nombre] for nombre in compiled.positiontup)
+
+    if conn.dialect.name == 'sqlite':
+        prefijo = 'EXPLAIN QUERY PLAN '
+    else:
+        prefijo = 'EXPLAIN (ANALYZE, BUFFERS) ' if analyze else 'EXPLAIN '
+
+    filas = conn.exec_driver_sql(prefijo + str(compiled), params).fetchall()
+    return [str(f[-1]) for f in filas]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reporte EXPLAIN de las rutas principales.')
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('--analyze', action='store_true', help='EXPLAIN ANALYZE (solo PostgreSQL)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        persona_id = db.session.query(Person.id).filter_by(user_id=args.user_id).limit(1).scalar() or 0
+        mov_id = db.session.query(Movimiento.id).filter_by(user_id=args.user_id).limit(1).scalar() or 0
+        detalle_id = db.session.query(DetalleMovimiento.id).filter_by(movimiento_id=mov_id).limit(1).scalar() or 0
+
+        print(f'📋 Motor: {db.engine.dialect.name}')
+        for ruta, descripcion, stmt in consultas(args.user_id, persona_id, mov_id, detalle_id):
+            print(f'\n== {ruta} — {descripcion}')
+            for linea in explicar(stmt, args.analyze):
+                print(f'   {linea}')
+
+
+if __name__ == '__main__':
+    main()
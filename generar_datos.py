@@ -0,0 +1,255 @@
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert, update
+from werkzeug.security import generate_password_hash
+
+from app import app, db
+from models.move import DetalleMovimiento, Abono, AbonoIndirecto
+from models.users import User, Person, SaldoFavor
+from services.balances import reconstruir_balances
+from services.cache import incrementar_version
+from services.movimientos import insertar_detalles, insertar_movimientos
+from services.rollups import reconstruir_rollups
+
+# Genera datos sintéticos reproducibles (misma semilla = mismos datos) para
+# medir rendimiento: usuarios, personas, movimientos con repartos (incluido
+# quien pagó todo), abonos, abonos indirectos y saldos a favor.
+#
+#   py generar_datos.py --escala 100k                    # en DATABASE_URL
+#   py generar_datos.py --escala 1m --usuarios 3 --semilla 7
+#
+# Los usuarios se llaman <prefijo>0, <prefijo>1, ... con contraseña "bench".
+
+ESCALAS = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+PASSWORD = 'bench'
+
+CATEGORIAS = {
+    'gasto': ['comida', 'casa', 'servicios', 'transporte', 'ocio', 'salud', 'viajes'],
+    'ingreso': ['sueldo', 'ventas', 'reembolso', 'otros'],
+    'pago': ['tarjeta', 'prestamo', 'arriendo'],
+}
+NOMBRES = ['Ana', 'Beto', 'Caro', 'Dani', 'Eva', 'Fede', 'Gabi', 'Hugo', 'Inés', 'Juan', 'Karla', 'Luis']
+
+
+class Generador:
+    """Genera los datos de un usuario por bloques (una transacción por bloque)."""
+
+    def __init__(self, user_id, persona_ids, rng, hasta=None, dias=5 * 365):
+        self.user_id = user_id
+        self.persona_ids = persona_ids
+        self.rng = rng
+        self.hasta = hasta or date(2025, 12, 31)
+        self.dias = dias
+        self.cuentas = {'movimientos': 0, 'detalles': 0, 'abonos': 0, 'abonos_indirectos': 0, 'saldos_favor': 0}
+
+    # --- valores aleatorios ---
+    def _monto(self, minimo=1_000, maximo=500_000):
+        return self.rng.randint(minimo // 100, maximo // 100) * 100
+
+    def _fecha(self):
+        return self.hasta - timedelta(days=self.rng.randint(0, self.dias))
+
+    def _reparto(self, monto):
+        """Detalles de un movimiento: 2-4 personas, a veces una pagó todo."""
+        personas = self.rng.sample(self.persona_ids, min(self.rng.randint(2, 4), len(self.persona_ids)))
+        parte = max(monto // len(personas) // 100 * 100, 100)
+        pagador = personas[0] if self.rng.random() < 0.5 else None
+        detalles = []
+        for persona_id in personas:
+            if persona_id == pagador:
+                abonado = parte
+            else:
+                abonado = self.rng.choice([0, 0, parte // 2 // 100 * 100, parte])
+            detalles.append({'persona_id': persona_id, 'monto': parte, 'abonado': abonado, 'pago_todo': persona_id == pagador})
+        return detalles
+
+    # --- bloques ---
+    def bloque(self, cantidad):
+        movimientos = []
+        for _ in range(cantidad):
+            tipo = self.rng.choices(('gasto', 'ingreso', 'pago'), weights=(6, 3, 1))[0]
+            monto = self._monto()
+            movimientos.append({
+                'user_id': self.user_id,
+                'tipo': tipo,
+                'categoria': self.rng.choice(CATEGORIAS[tipo]),
+                'descripcion': f'{tipo} sintético',
+                'monto': monto,
+                'fecha': self._fecha(),
+                'detalles': self._reparto(monto) if tipo == 'gasto' and self.rng.random() < 0.6 else [],
+            })
+
+        mov_ids = insertar_movimientos([{k: v for k, v in m.items() if k != 'detalles'} for m in movimientos])
+        filas = [
+            dict(d, movimiento_id=mov_id, fecha=m['fecha'])
+            for mov_id, m in zip(mov_ids, movimientos)
+            for d in m['detalles']
+        ]
+        detalle_ids, n_abonos = insertar_detalles(filas)
+        for detalle_id, f in zip(detalle_ids, filas):
+            f['id'] = detalle_id
+
+        self.cuentas['movimientos'] += len(mov_ids)
+        self.cuentas['detalles'] += len(detalle_ids)
+        self.cuentas['abonos'] += n_abonos
+        if detalle_ids:
+            self._indirectos_y_saldos(filas)
+
+    def _indirectos_y_saldos(self, filas):
+        """Reparte abonos de deudores hacia deudas de quien pagó todo, como
+        `asignar_abono_indirecto`, y registra saldos a favor como `abonar` y
+        `saldo_favor_add`."""
+        abonos = {
+            detalle_id: (abono_id, monto)
+            for abono_id, detalle_id, monto in db.session.query(Abono.id, Abono.detalle_id, Abono.monto).filter(
+                Abono.detalle_id >= filas[0]['id'], Abono.detalle_id <= filas[-1]['id'],
+            )
+        }
+        pagadores = {f['movimiento_id']: f['persona_id'] for f in filas if f['pago_todo']}
+
+        # Deudas abiertas por persona dentro del bloque: posibles destinos
+        abiertas = {}
+        for f in filas:
+            if not f['pago_todo'] and f['monto'] > f['abonado']:
+                abiertas.setdefault(f['persona_id'], []).append(f)
+
+        nuevos_abonos, indirectos, cambios, saldos = [], [], [], []
+        ahora = datetime.combine(self.hasta, datetime.min.time())
+        for f in filas:
+            abono = abonos.get(f['id'])
+            pagador = pagadores.get(f['movimiento_id'])
+            if abono is None or pagador is None or f['pago_todo']:
+                continue
+            abono_id, monto = abono
+            sorteo = self.rng.random()
+            destinos = abiertas.get(pagador)
+            if sorteo < 0.3 and destinos:
+                destino = destinos[-1]
+                aplicado = min(monto, destino['monto'] - destino['abonado'])
+                destino['abonado'] += aplicado
+                if destino['abonado'] >= destino['monto']:
+                    destinos.pop()
+                nuevos_abonos.append({'detalle_id': destino['id'], 'monto': aplicado, 'fecha': ahora})
+                indirectos.append({
+                    'abono_id': abono_id, 'movimiento_destino_id': destino['movimiento_id'],
+                    'persona_destino_id': pagador, 'monto_aplicado': aplicado, 'fecha': ahora,
+                })
+                cambios.append(destino)
+            elif sorteo < 0.4:
+                saldos.append({
+                    'persona_id': pagador, 'user_id': self.user_id, 'monto': monto, 'tipo': 'ingreso', 'fecha': ahora,
+                    'comentario': f'Saldo a favor generado por abono #{abono_id} del movimiento #{f["movimiento_id"]}',
+                    'abono_id': abono_id, 'movimiento_id': f['movimiento_id'],
+                })
+            elif sorteo < 0.45:
+                saldos.append({
+                    'persona_id': f['persona_id'], 'user_id': self.user_id, 'monto': -monto, 'tipo': 'ingreso', 'fecha': ahora,
+                    'comentario': f'Uso de saldo a favor en movimiento #{f["movimiento_id"]}',
+                    'abono_id': abono_id, 'movimiento_id': f['movimiento_id'],
+                })
+
+        # Registros manuales de /saldo-favor/add
+        for _ in range(len(filas) // 50):
+            monto = self._monto(500, 50_000)
+            saldos.append({
+                'persona_id': self.rng.choice(self.persona_ids), 'user_id': self.user_id, 'monto': monto,
+                'tipo': self.rng.choice(('ingreso', 'egreso')), 'comentario': 'Registro manual',
+                'abono_id': None, 'movimiento_id': None,
+                'fecha': datetime.combine(self._fecha(), datetime.min.time()),
+            })
+
+        if nuevos_abonos:
+            db.session.execute(insert(Abono), nuevos_abonos)
+            db.session.execute(insert(AbonoIndirecto), indirectos)
+            unicos = {d['id']: d for d in cambios}.values()
+            db.session.execute(update(DetalleMovimiento), [
+                {
+                    'id': d['id'], 'abonado': d['abonado'], 'falta': max(d['monto'] - d['abonado'], 0),
+                    'estado': 'Pagado' if d['abonado'] >= d['monto'] else 'Debe',
+                }
+                for d in unicos
+            ])
+        if saldos:
+            db.session.execute(insert(SaldoFavor), saldos)
+
+        self.cuentas['abonos'] += len(nuevos_abonos)
+        self.cuentas['abonos_indirectos'] += len(indirectos)
+        self.cuentas['saldos_favor'] += len(saldos)
+
+
+def generar(movimientos, usuarios=1, personas=20, semilla=42, prefijo='bench', bloque=5_000, progreso=None):
+    """Crea `usuarios` usuarios con `movimientos` movimientos repartidos entre ellos.
+
+    Devuelve {username: user_id} y los conteos de filas insertadas. Falla si
+    alguno de los usuarios ya existe.
+    """
+    rng = random.Random(semilla)
+    db.create_all()
+
+    nombres = [f'{prefijo}{i}' for i in range(usuarios)]
+    if User.query.filter(User.username.in_(nombres)).first():
+        raise SystemExit(f'Ya existen usuarios {prefijo}*: usa otra base de datos u otro --prefijo.')
+
+    password = generate_password_hash(PASSWORD)
+    ids = {}
+    totales = {}
+    for i, nombre in enumerate(nombres):
+        usuario = User(username=nombre, password=password)
+        db.session.add(usuario)
+        db.session.flush()
+        personas_usuario = [Person(name=f'{NOMBRES[j % len(NOMBRES)]} {j}', user_id=usuario.id) for j in range(personas)]
+        db.session.add_all(personas_usuario)
+        db.session.commit()
+        ids[nombre] = usuario.id
+
+        generador = Generador(usuario.id, [p.id for p in personas_usuario], rng)
+        restantes = movimientos // usuarios + (1 if i < movimientos % usuarios else 0)
+        while restantes > 0:
+            cantidad = min(bloque, restantes)
+            generador.bloque(cantidad)
+            db.session.commit()
+            restantes -= cantidad
+            if progreso:
+                progreso(nombre, generador.cuentas)
+
+        reconstruir_rollups(usuario.id)
+        reconstruir_balances(usuario.id)
+        incrementar_version(usuario.id)
+        db.session.commit()
+        for campo, valor in generador.cuentas.items():
+            totales[campo] = totales.get(campo, 0) + valor
+
+    return ids, totales
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera datos sintéticos para pruebas de rendimiento.')
+    parser.add_argument('--escala', choices=sorted(ESCALAS), default='1k', help='Movimientos totales: 1k, 100k o 1m')
+    parser.add_argument('--movimientos', type=int, help='Cantidad exacta de movimientos (reemplaza --escala)')
+    parser.add_argument('--usuarios', type=int, default=1)
+    parser.add_argument('--personas', type=int, default=20, help='Personas por usuario')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--prefijo', default='bench', help='Prefijo del nombre de usuario')
+    args = parser.parse_args()
+
+    movimientos = args.movimientos or ESCALAS[args.escala]
+    inicio = time.perf_counter()
+
+    def progreso(nombre, cuentas):
+        print(f'  {nombre}: {cuentas["movimientos"]:,} movimientos ({time.perf_counter() - inicio:,.1f} s)', flush=True)
+
+    with app.app_context():
+        print(f'📋 Motor: {db.engine.dialect.name}')
+        ids, totales = generar(movimientos, args.usuarios, args.personas, args.semilla, args.prefijo, progreso=progreso)
+
+    print(f'✅ Usuarios: {", ".join(f"{n} (id {i})" for n, i in ids.items())} — contraseña "{PASSWORD}"')
+    for campo, valor in totales.items():
+        print(f'   {campo}: {valor:,}')
+    print(f'   tiempo: {time.perf_counter() - inicio:,.1f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+import glob
+import os
+
+
+# ==============================
+# Configuración de gunicorn
+# ==============================
+# Con varios workers, las métricas de Prometheus se comparten en archivos
+# dentro de PROMETHEUS_MULTIPROC_DIR (ver services/metricas.py).
+
+def on_starting(server):
+    """Limpia los archivos de métricas de una ejecución anterior."""
+    directorio = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+        for archivo in glob.glob(os.path.join(directorio, '*.db')):
+            os.remove(archivo)
+
+
+def child_exit(server, worker):
+    """Quita de los gauges 'livesum' los valores del worker que terminó."""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
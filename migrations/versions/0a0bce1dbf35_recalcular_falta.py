@@ -0,0 +1,34 @@
+"""Recalcula falta / estado de los repartos desde abonado
+
+Revision ID: 0a0bce1dbf35
+Revises: 5b4768ffb30e
+Create Date: 2026-10-18 21:40:12.903518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a0bce1dbf35'
+down_revision = '5b4768ffb30e'
+branch_labels = None
+depends_on = None
+
+
+# Eliminar un abono bajaba abonado sin tocar falta: esos repartos seguían
+# fuera del índice de deudas abiertas (falta > 0) y del selector de destino.
+FALTA = 'CASE WHEN monto > abonado THEN monto - abonado ELSE 0 END'
+
+
+def upgrade():
+    op.execute(sa.text(
+        f"UPDATE detalle_movimiento SET falta = {FALTA}, "
+        f"estado = CASE WHEN monto > abonado THEN 'Debe' ELSE 'Pagado' END "
+        f"WHERE falta <> {FALTA}"
+    ))
+
+
+def downgrade():
+    # Solo corrige datos; no hay nada que deshacer
+    pass
@@ -0,0 +1,41 @@
+"""Índice parcial de deudas abiertas (falta > 0)
+
+Revision ID: 23f151977418
+Revises: b6106ec552dc
+Create Date: 2026-10-18 18:02:41.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '23f151977418'
+down_revision = 'b6106ec552dc'
+branch_labels = None
+depends_on = None
+
+
+NOMBRE = 'ix_detalle_movimiento_abiertos'
+
+
+def _existe():
+    return NOMBRE in {ix['name'] for ix in sa.inspect(op.get_bind()).get_indexes('detalle_movimiento')}
+
+
+def upgrade():
+    if _existe():
+        return
+    # Como en fb92bffcbab7: CONCURRENTLY en PostgreSQL, fuera de la transacción
+    concurrente = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        op.create_index(
+            NOMBRE, 'detalle_movimiento', ['persona_id', 'movimiento_id'], unique=False,
+            sqlite_where=sa.text('falta > 0'), postgresql_where=sa.text('falta > 0'),
+            postgresql_concurrently=concurrente,
+        )
+
+
+def downgrade():
+    if _existe():
+        op.drop_index(NOMBRE, table_name='detalle_movimiento')
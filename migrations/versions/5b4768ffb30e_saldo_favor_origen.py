@@ -0,0 +1,149 @@
+"""Origen de los saldos a favor: abono_id y movimiento_id
+
+Revision ID: 5b4768ffb30e
+Revises: 23f151977418
+Create Date: 2026-10-18 19:11:52.640271
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b4768ffb30e'
+down_revision = '23f151977418'
+branch_labels = None
+depends_on = None
+
+
+LOTE = 5000
+
+INDICES = [
+    ('ix_saldo_favor_abono_id', ['abono_id']),
+    ('ix_saldo_favor_movimiento_id', ['movimiento_id']),
+]
+
+# Comentarios que escribía la app antes de tener las llaves
+USO = re.compile(r'^Uso de saldo a favor en movimiento #(\d+)$')
+GENERADO = re.compile(r'^Saldo a favor generado por abono #(\d+) del movimiento #(\d+)$')
+REVERSION = re.compile(r'^Reversión de uso de saldo por eliminación de abono #\d+ del movimiento #(\d+)$')
+
+
+def _columnas():
+    return {c['name'] for c in sa.inspect(op.get_bind()).get_columns('saldo_favor')}
+
+
+def _indices():
+    return {ix['name'] for ix in sa.inspect(op.get_bind()).get_indexes('saldo_favor')}
+
+
+def _existentes(bind, tabla, ids):
+    if not ids:
+        return set()
+    consulta = sa.text(f'SELECT id FROM {tabla} WHERE id IN :ids').bindparams(sa.bindparam('ids', expanding=True))
+    return {i for (i,) in bind.execute(consulta, {'ids': sorted(ids)})}
+
+
+def _abonos_de_movimientos(bind, mov_ids):
+    """{(movimiento_id, persona_id, monto): [(abono_id, fecha), ...]} de los abonos de esos movimientos."""
+    if not mov_ids:
+        return {}
+    consulta = sa.text(
+        'SELECT a.id, a.fecha, a.monto, d.movimiento_id, d.persona_id '
+        'FROM abono a JOIN detalle_movimiento d ON d.id = a.detalle_id '
+        'WHERE d.movimiento_id IN :ids ORDER BY a.id'
+    ).bindparams(sa.bindparam('ids', expanding=True))
+    candidatos = {}
+    for abono_id, fecha, monto, movimiento_id, persona_id in bind.execute(consulta, {'ids': sorted(mov_ids)}):
+        candidatos.setdefault((movimiento_id, persona_id, monto), []).append((abono_id, fecha))
+    return candidatos
+
+
+def _vincular_lote(bind, filas, usados):
+    """Ids de origen de cada fila del lote según su comentario; devuelve los UPDATE."""
+    interpretadas = []
+    for id_, persona_id, monto, fecha, comentario in filas:
+        comentario = (comentario or '').strip()
+        if m := USO.match(comentario):
+            interpretadas.append((id_, persona_id, monto, fecha, 'uso', None, int(m.group(1))))
+        elif m := GENERADO.match(comentario):
+            interpretadas.append((id_, persona_id, monto, fecha, 'generado', int(m.group(1)), int(m.group(2))))
+        elif m := REVERSION.match(comentario):
+            interpretadas.append((id_, persona_id, monto, fecha, 'reversion', None, int(m.group(1))))
+    if not interpretadas:
+        return []
+
+    # Los ids del comentario pueden ser de filas ya borradas
+    movimientos = _existentes(bind, 'movimiento', {f[6] for f in interpretadas})
+    abonos = _existentes(bind, 'abono', {f[5] for f in interpretadas if f[5]})
+    candidatos = _abonos_de_movimientos(bind, {f[6] for f in interpretadas if f[4] == 'uso' and f[6] in movimientos})
+
+    cambios = []
+    for id_, persona_id, monto, fecha, tipo, abono_id, movimiento_id in interpretadas:
+        if movimiento_id not in movimientos:
+            continue
+        if tipo == 'generado':
+            abono_id = abono_id if abono_id in abonos else None
+        elif tipo == 'uso':
+            # El uso no guardaba el abono: el de la misma persona y monto en ese
+            # movimiento, preferiblemente con la misma fecha (abonar usa la misma)
+            libres = [c for c in candidatos.get((movimiento_id, persona_id, -monto), ()) if c[0] not in usados]
+            libres.sort(key=lambda c: (c[1] != fecha, c[0]))
+            abono_id = libres[0][0] if libres else None
+            if abono_id:
+                usados.add(abono_id)
+        cambios.append({'id': id_, 'abono_id': abono_id, 'movimiento_id': movimiento_id})
+    return cambios
+
+
+def _backfill():
+    """Recorre saldo_favor por rangos de id; cada lote se confirma por separado."""
+    bind = op.get_bind()
+    actualizar = sa.text('UPDATE saldo_favor SET abono_id = :abono_id, movimiento_id = :movimiento_id WHERE id = :id')
+    lote = sa.text(
+        'SELECT id, persona_id, monto, fecha, comentario FROM saldo_favor '
+        'WHERE id > :ultimo AND abono_id IS NULL AND movimiento_id IS NULL ORDER BY id LIMIT :lote'
+    )
+    ultimo, usados = 0, set()
+    with op.get_context().autocommit_block():
+        while True:
+            filas = bind.execute(lote, {'ultimo': ultimo, 'lote': LOTE}).fetchall()
+            if not filas:
+                break
+            cambios = _vincular_lote(bind, filas, usados)
+            if cambios:
+                bind.execute(actualizar, cambios)
+            ultimo = filas[-1][0]
+
+
+def upgrade():
+    columnas = _columnas()
+    if 'abono_id' not in columnas:
+        with op.batch_alter_table('saldo_favor') as batch_op:
+            batch_op.add_column(sa.Column('abono_id', sa.Integer(), nullable=True))
+            batch_op.add_column(sa.Column('movimiento_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_saldo_favor_abono_id', 'abono', ['abono_id'], ['id'], ondelete='SET NULL')
+            batch_op.create_foreign_key('fk_saldo_favor_movimiento_id', 'movimiento', ['movimiento_id'], ['id'], ondelete='SET NULL')
+
+    _backfill()
+
+    concurrente = op.get_bind().dialect.name == 'postgresql'
+    existentes = _indices()
+    with op.get_context().autocommit_block():
+        for nombre, cols in INDICES:
+            if nombre not in existentes:
+                op.create_index(nombre, 'saldo_favor', cols, unique=False, postgresql_concurrently=concurrente)
+
+
+def downgrade():
+    existentes = _indices()
+    for nombre, _ in reversed(INDICES):
+        if nombre in existentes:
+            op.drop_index(nombre, table_name='saldo_favor')
+    with op.batch_alter_table('saldo_favor') as batch_op:
+        batch_op.drop_constraint('fk_saldo_favor_movimiento_id', type_='foreignkey')
+        batch_op.drop_constraint('fk_saldo_favor_abono_id', type_='foreignkey')
+        batch_op.drop_column('movimiento_id')
+        batch_op.drop_column('abono_id')
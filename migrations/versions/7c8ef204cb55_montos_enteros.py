@@ -0,0 +1,116 @@
+"""Montos como enteros (BigInteger) en lugar de Float
+
+Revision ID: 7c8ef204cb55
+Revises: fb92bffcbab7
+Create Date: 2026-10-18 14:02:41.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c8ef204cb55'
+down_revision = 'fb92bffcbab7'
+branch_labels = None
+depends_on = None
+
+
+# Tablas con llave `id`: se convierten en línea, por lotes.
+COLUMNAS = [
+    ('movimiento', ['monto']),
+    ('detalle_movimiento', ['monto', 'abonado', 'falta']),
+    ('abono', ['monto']),
+    ('abono_indirecto', ['monto_aplicado']),
+    ('saldo_favor', ['monto']),
+]
+
+# Modelos de lectura (pocas filas): se convierten de una vez.
+DERIVADAS = [
+    ('person_balance', ['monto', 'pagado', 'le_deben', 'saldo_favor', 'saldo_neto']),
+    ('movimiento_mensual', ['total']),
+]
+
+LOTE = 10000
+
+
+def _pendientes(tabla, columnas):
+    """Columnas que aún no son enteras (la tabla pudo crearse ya con el modelo nuevo)."""
+    tipos = {c['name']: c['type'] for c in sa.inspect(op.get_bind()).get_columns(tabla)}
+    return [c for c in columnas if c in tipos and not isinstance(tipos[c], sa.Integer)]
+
+
+def _redondeado(columna):
+    return f'CAST(ROUND({columna}) AS BIGINT)'
+
+
+def _convertir_por_lotes(tabla, columnas):
+    """Copia a columnas `<col>_int` por rangos de id, confirmando cada lote,
+    y al final reemplaza las columnas originales en una sola transacción."""
+    bind = op.get_bind()
+    postgres = bind.dialect.name == 'postgresql'
+
+    for col in columnas:
+        op.add_column(tabla, sa.Column(f'{col}_int', sa.BigInteger(), nullable=True))
+
+    asignaciones = ', '.join(f'{c}_int = {_redondeado(c)}' for c in columnas)
+    minimo, maximo = bind.execute(sa.text(f'SELECT MIN(id), MAX(id) FROM {tabla}')).one()
+
+    # Cada UPDATE se confirma por separado: los locks de fila duran un lote,
+    # no toda la tabla, y la app puede seguir escribiendo mientras tanto.
+    with op.get_context().autocommit_block():
+        if minimo is not None:
+            for inicio in range(minimo, maximo + 1, LOTE):
+                op.execute(
+                    f'UPDATE {tabla} SET {asignaciones} '
+                    f'WHERE id >= {inicio} AND id < {inicio + LOTE}'
+                )
+
+    # Filas escritas durante el backfill por la versión anterior de la app
+    if postgres:
+        op.execute(f'LOCK TABLE {tabla} IN SHARE ROW EXCLUSIVE MODE')
+    distintas = ' OR '.join(f'{c}_int IS NULL OR {c}_int <> {_redondeado(c)}' for c in columnas)
+    op.execute(f'UPDATE {tabla} SET {asignaciones} WHERE {distintas}')
+
+    with op.batch_alter_table(tabla) as batch:
+        for col in columnas:
+            batch.drop_column(col)
+            batch.alter_column(f'{col}_int', new_column_name=col, existing_type=sa.BigInteger(), nullable=False)
+
+
+def upgrade():
+    # El índice (persona_id, falta) se reconstruye sobre la columna nueva.
+    concurrente = op.get_bind().dialect.name == 'postgresql'
+    indice_falta = 'ix_detalle_movimiento_persona_falta' in {
+        ix['name'] for ix in sa.inspect(op.get_bind()).get_indexes('detalle_movimiento')
+    }
+    falta_pendiente = 'falta' in _pendientes('detalle_movimiento', ['falta'])
+
+    if indice_falta and falta_pendiente:
+        op.drop_index('ix_detalle_movimiento_persona_falta', table_name='detalle_movimiento')
+
+    for tabla, columnas in COLUMNAS:
+        pendientes = _pendientes(tabla, columnas)
+        if pendientes:
+            _convertir_por_lotes(tabla, pendientes)
+
+    if indice_falta and falta_pendiente:
+        with op.get_context().autocommit_block():
+            op.create_index('ix_detalle_movimiento_persona_falta', 'detalle_movimiento', ['persona_id', 'falta'],
+                            unique=False, postgresql_concurrently=concurrente)
+
+    for tabla, columnas in DERIVADAS:
+        pendientes = _pendientes(tabla, columnas)
+        if not pendientes:
+            continue
+        with op.batch_alter_table(tabla) as batch:
+            for col in pendientes:
+                batch.alter_column(col, existing_type=sa.Float(), type_=sa.BigInteger(),
+                                   existing_nullable=False, postgresql_using=_redondeado(col))
+
+
+def downgrade():
+    for tabla, columnas in DERIVADAS + COLUMNAS:
+        with op.batch_alter_table(tabla) as batch:
+            for col in columnas:
+                batch.alter_column(col, existing_type=sa.BigInteger(), type_=sa.Float(), existing_nullable=False)
@@ -0,0 +1,32 @@
+"""Versión de datos por usuario (invalidación de caché)
+
+Revision ID: b6106ec552dc
+Revises: 7c8ef204cb55
+Create Date: 2026-10-18 15:20:07.502114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6106ec552dc'
+down_revision = '7c8ef204cb55'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columnas = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('user')}
+
+    with op.batch_alter_table('user') as batch_op:
+        if 'data_version' not in columnas:
+            batch_op.add_column(sa.Column('data_version', sa.Integer(), nullable=False, server_default='0'))
+        if 'datos_actualizados' not in columnas:
+            batch_op.add_column(sa.Column('datos_actualizados', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('datos_actualizados')
+        batch_op.drop_column('data_version')
@@ -0,0 +1,50 @@
+"""Índices para los patrones de acceso de las rutas
+
+Revision ID: fb92bffcbab7
+Revises: af4704456634
+Create Date: 2026-10-18 11:26:05.381742
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fb92bffcbab7'
+down_revision = 'af4704456634'
+branch_labels = None
+depends_on = None
+
+
+INDICES = [
+    # (nombre, tabla, columnas)
+    ('ix_movimiento_user_fecha', 'movimiento', ['user_id', 'fecha', 'id']),
+    ('ix_detalle_movimiento_movimiento_id', 'detalle_movimiento', ['movimiento_id']),
+    ('ix_detalle_movimiento_persona_falta', 'detalle_movimiento', ['persona_id', 'falta']),
+    ('ix_abono_detalle_id', 'abono', ['detalle_id']),
+    ('ix_abono_indirecto_abono_id', 'abono_indirecto', ['abono_id']),
+    ('ix_saldo_favor_user_persona', 'saldo_favor', ['user_id', 'persona_id']),
+    ('ix_person_user_id', 'person', ['user_id']),
+]
+
+
+def _existentes(tabla):
+    return {ix['name'] for ix in sa.inspect(op.get_bind()).get_indexes(tabla)}
+
+
+def upgrade():
+    # En PostgreSQL se crean con CONCURRENTLY para no bloquear escrituras;
+    # eso exige ejecutarlos fuera de la transacción de la migración.
+    concurrente = op.get_bind().dialect.name == 'postgresql'
+
+    with op.get_context().autocommit_block():
+        for nombre, tabla, columnas in INDICES:
+            if nombre in _existentes(tabla):
+                continue
+            op.create_index(nombre, tabla, columnas, unique=False, postgresql_concurrently=concurrente)
+
+
+def downgrade():
+    for nombre, tabla, _ in reversed(INDICES):
+        if nombre in _existentes(tabla):
+            op.drop_index(nombre, table_name=tabla)
@@ -5,11 +5,15 @@ from models import db
 
 class Movimiento(db.Model):
     __tablename__ = 'movimiento'
+    __table_args__ = (
+        # Listados por usuario ordenados por (fecha DESC, id DESC) y filtros por rango
+        db.Index('ix_movimiento_user_fecha', 'user_id', 'fecha', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     tipo = db.Column(db.String(20), nullable=False)
     categoria = db.Column(db.String(120), nullable=False)
     descripcion = db.Column(db.String(300), nullable=True)
-    monto = db.Column(db.Float, nullable=False)
+    monto = db.Column(db.BigInteger, nullable=False)
     fecha = db.Column(db.Date, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
@@ -17,12 +21,20 @@ class Movimiento(db.Model):
 
 class DetalleMovimiento(db.Model):
     __tablename__ = 'detalle_movimiento'
+    __table_args__ = (
+        # Deudas abiertas de una persona (falta > 0)
+        db.Index('ix_detalle_movimiento_persona_falta', 'persona_id', 'falta'),
+        # Índice parcial solo con las deudas abiertas: selector de movimiento
+        # destino y asignación de abonos (services/asignacion.py)
+        db.Index('ix_detalle_movimiento_abiertos', 'persona_id', 'movimiento_id',
+                 sqlite_where=db.text('falta > 0'), postgresql_where=db.text('falta > 0')),
+    )
     id = db.Column(db.Integer, primary_key=True)
     persona_id = db.Column(db.Integer, db.ForeignKey('person.id'), nullable=False)
-    movimiento_id = db.Column(db.Integer, db.ForeignKey('movimiento.id'), nullable=False)
-    monto = db.Column(db.Float, nullable=False)
-    abonado = db.Column(db.Float, nullable=False, default=0)
-    falta = db.Column(db.Float, nullable=False, default=0)
+    movimiento_id = db.Column(db.Integer, db.ForeignKey('movimiento.id'), nullable=False, index=True)
+    monto = db.Column(db.BigInteger, nullable=False)
+    abonado = db.Column(db.BigInteger, nullable=False, default=0)
+    falta = db.Column(db.BigInteger, nullable=False, default=0)
     estado = db.Column(db.String(20), nullable=False, default='Debe')
     pago_todo = db.Column(db.Boolean, default=False)
 
@@ -30,8 +42,8 @@ class DetalleMovimiento(db.Model):
 class Abono(db.Model):
     __tablename__ = 'abono'
     id = db.Column(db.Integer, primary_key=True)
-    detalle_id = db.Column(db.Integer, db.ForeignKey('detalle_movimiento.id'), nullable=False)
-    monto = db.Column(db.Float, nullable=False)
+    detalle_id = db.Column(db.Integer, db.ForeignKey('detalle_movimiento.id'), nullable=False, index=True)
+    monto = db.Column(db.BigInteger, nullable=False)
     fecha = db.Column(db.DateTime, default=datetime.utcnow)
 
     asignaciones_indirectas = db.relationship( 'AbonoIndirecto', back_populates='abono', cascade='all, delete-orphan', lazy=True )
@@ -39,13 +51,27 @@ class Abono(db.Model):
 class AbonoIndirecto(db.Model):
     __tablename__ = 'abono_indirecto'
     id = db.Column(db.Integer, primary_key=True)
-    abono_id = db.Column(db.Integer, db.ForeignKey('abono.id'), nullable=False)
+    abono_id = db.Column(db.Integer, db.ForeignKey('abono.id'), nullable=False, index=True)
     movimiento_destino_id = db.Column(db.Integer, db.ForeignKey('movimiento.id'), nullable=False)
     persona_destino_id = db.Column(db.Integer, db.ForeignKey('person.id'), nullable=False)
-    monto_aplicado = db.Column(db.Float, nullable=False)
+    monto_aplicado = db.Column(db.BigInteger, nullable=False)
     fecha = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relaciones
     abono = db.relationship('Abono', back_populates='asignaciones_indirectas', lazy=True)
     movimiento_destino = db.relationship( 'Movimiento', backref=db.backref('abonos_indirectos', cascade='all, delete-orphan'), lazy=True )
     persona_destino = db.relationship('Person', lazy=True)
+
+class MovimientoMensual(db.Model):
+    """Acumulado mensual de movimientos por usuario, tipo y categoría.
+
+    Se actualiza al crear o eliminar un Movimiento (services/rollups.py) y
+    alimenta los totales y gráficas del dashboard.
+    """
+    __tablename__ = 'movimiento_mensual'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    mes = db.Column(db.Date, primary_key=True)  # primer día del mes
+    tipo = db.Column(db.String(20), primary_key=True)
+    categoria = db.Column(db.String(120), primary_key=True)
+    total = db.Column(db.BigInteger, nullable=False, default=0)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
@@ -12,6 +12,11 @@ class User(db.Model, UserMixin):
     username = db.Column(db.String(120), unique=True, nullable=False)
     password = db.Column(db.String(255), nullable=False)
 
+    # Versión de los datos del usuario: la incrementan las rutas de escritura
+    # (services/cache.py) e invalida cachés y exportaciones generadas.
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    datos_actualizados = db.Column(db.DateTime, default=datetime.utcnow)
+
     # Relaciones
     persons = db.relationship('Person', backref='owner', lazy=True)
     movimientos = db.relationship('Movimiento', backref='owner', lazy=True)
@@ -25,7 +30,7 @@ class Person(db.Model):
     __tablename__ = 'person'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
 
     detalles = db.relationship('DetalleMovimiento', backref='person', lazy=True)
 
@@ -52,13 +57,52 @@ class ProjectMembers(db.Model):
 # ==============================
 class SaldoFavor(db.Model):
     __tablename__ = 'saldo_favor'
+    __table_args__ = (
+        # Totales por usuario agrupados por persona e histórico de una persona
+        db.Index('ix_saldo_favor_user_persona', 'user_id', 'persona_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     persona_id = db.Column(db.Integer, db.ForeignKey('person.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    monto = db.Column(db.Float, nullable=False)
+    monto = db.Column(db.BigInteger, nullable=False)
     comentario = db.Column(db.Text)
     fecha = db.Column(db.DateTime, default=datetime.utcnow)
     tipo = db.Column(db.String(10), default='ingreso')  # ingreso o egreso
+    # Origen del registro (vacíos en los manuales): el abono que consumió el
+    # saldo (monto < 0) o cuyo sobrante lo generó (monto > 0), y su movimiento
+    abono_id = db.Column(db.Integer, db.ForeignKey('abono.id', ondelete='SET NULL'), nullable=True, index=True)
+    movimiento_id = db.Column(db.Integer, db.ForeignKey('movimiento.id', ondelete='SET NULL'), nullable=True, index=True)
 
     persona = db.relationship('Person', backref='saldos_favor', lazy=True)
     usuario = db.relationship('User', backref='saldos_favor', lazy=True)
+
+
+# ==============================
+# Balance materializado por persona
+# ==============================
+class PersonBalance(db.Model):
+    """Modelo de lectura con los totales de cada persona.
+
+    Lo mantienen las rutas de escritura (ver services/balances.py) dentro de
+    la misma transacción; se reconstruye con `flask rebuild-balances`.
+    """
+    __tablename__ = 'person_balance'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    persona_id = db.Column(db.Integer, db.ForeignKey('person.id'), primary_key=True)
+    monto = db.Column(db.BigInteger, nullable=False, default=0)        # total asignado en detalles
+    pagado = db.Column(db.BigInteger, nullable=False, default=0)       # total abonado
+    le_deben = db.Column(db.BigInteger, nullable=False, default=0)     # pendiente de otros cuando pagó todo
+    saldo_favor = db.Column(db.BigInteger, nullable=False, default=0)  # suma de SaldoFavor.monto
+    saldo_neto = db.Column(db.BigInteger, nullable=False, default=0)   # ingresos - egresos de SaldoFavor
+    ultima_fecha_saldo = db.Column(db.DateTime)
+    actualizado = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    persona = db.relationship('Person', lazy=True)
+
+    @property
+    def debe(self):
+        return max(self.monto - self.pagado, 0)
+
+    @property
+    def balance(self):
+        return self.le_deben - self.debe + self.saldo_favor
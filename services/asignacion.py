@@ -0,0 +1,190 @@
+from datetime import datetime
+
+from sqlalchemy import insert, or_
+
+from models import db
+from models.move import Movimiento, DetalleMovimiento, Abono, AbonoIndirecto
+from models.users import SaldoFavor
+from services.balances import actualizar_balances, personas_de_movimientos
+from services.montos import suma
+from services.movimientos import ajustar_abonado
+from services.paginacion import paginar_keyset
+
+ESTRATEGIAS = {
+    'antiguos': 'Más antiguos primero',
+    'mayores': 'Mayores deudas primero',
+    'proporcional': 'Proporcional a la deuda',
+}
+
+
+# ==============================
+# Asignación automática de abonos indirectos
+# ==============================
+# Reparte lo que queda de un abono entre todas las deudas abiertas de quien
+# pagó el movimiento de origen. El plan se calcula en memoria a partir de una
+# sola lectura de las deudas; aplicarlo escribe abonos, relaciones
+# AbonoIndirecto y repartos con tres executemany en la transacción actual
+# (sin commit), en lugar de un formulario por movimiento destino. Los
+# repartos se suman en SQL (ajustar_abonado), no con el valor leído.
+
+
+def disponible_abono(abono):
+    """Lo que queda por distribuir del abono: monto - asignaciones indirectas
+    - saldo a favor ya generado con su sobrante."""
+    distribuido = db.session.query(suma(AbonoIndirecto.monto_aplicado)).filter(AbonoIndirecto.abono_id == abono.id).scalar()
+    a_saldo = db.session.query(suma(SaldoFavor.monto)).filter(SaldoFavor.abono_id == abono.id, SaldoFavor.monto > 0).scalar()
+    return max(abono.monto - distribuido - a_saldo, 0)
+
+
+def _consulta_deudas_abiertas(user_id, persona_id):
+    # persona_id + falta > 0 coincide con el índice parcial
+    # ix_detalle_movimiento_abiertos: solo se leen las deudas abiertas de la
+    # persona, no todo detalle_movimiento.
+    return db.session.query(
+        DetalleMovimiento.id.label('detalle_id'),
+        DetalleMovimiento.movimiento_id,
+        Movimiento.fecha,
+        Movimiento.categoria,
+        Movimiento.descripcion,
+        DetalleMovimiento.monto,
+        DetalleMovimiento.abonado,
+        DetalleMovimiento.falta,
+    ).join(
+        Movimiento, Movimiento.id == DetalleMovimiento.movimiento_id,
+    ).filter(
+        DetalleMovimiento.persona_id == persona_id,
+        DetalleMovimiento.falta > 0,
+        DetalleMovimiento.pago_todo.is_not(True),
+        Movimiento.user_id == user_id,
+    )
+
+
+def deudas_abiertas(user_id, persona_id, bloquear=False):
+    """Repartos de la persona con falta > 0 en movimientos del usuario.
+
+    Devuelve dicts con detalle_id, movimiento_id, fecha, categoria,
+    descripcion, monto, abonado y falta, ordenados por (fecha, movimiento_id).
+    Con `bloquear` los repartos quedan tomados (FOR UPDATE) hasta el commit,
+    para que el plan no se calcule sobre un falta que otra petición cambia.
+    """
+    consulta = _consulta_deudas_abiertas(user_id, persona_id).order_by(Movimiento.fecha, DetalleMovimiento.movimiento_id)
+    if bloquear:
+        consulta = consulta.with_for_update(of=DetalleMovimiento)
+    return [fila._asdict() for fila in consulta]
+
+
+def _clave_deuda(fila):
+    return fila.fecha, fila.movimiento_id
+
+
+def pagina_deudas_abiertas(user_id, persona_id, buscar='', despues=None, antes=None, por_pagina=20):
+    """Página de deudas abiertas para el selector de movimiento destino.
+
+    Orden (fecha DESC, movimiento DESC) con cursores (ver paginar_keyset).
+    `buscar` filtra por categoría o descripción; "#123" o "123" también por
+    número de movimiento. Devuelve (PaginaKeyset, lista de dicts).
+    """
+    consulta = _consulta_deudas_abiertas(user_id, persona_id)
+    buscar = (buscar or '').strip()
+    if buscar:
+        condiciones = [
+            Movimiento.categoria.icontains(buscar, autoescape=True),
+            Movimiento.descripcion.icontains(buscar, autoescape=True),
+        ]
+        numero = buscar.lstrip('#')
+        if numero.isdigit():
+            condiciones.append(Movimiento.id == int(numero))
+        consulta = consulta.filter(or_(*condiciones))
+
+    pagina = paginar_keyset(consulta, Movimiento.fecha, Movimiento.id, _clave_deuda, despues, antes, por_pagina)
+    return pagina, [fila._asdict() for fila in pagina.items]
+
+
+def _en_orden(disponible, deudas):
+    restante = disponible
+    montos = []
+    for d in deudas:
+        monto = min(restante, d['falta'])
+        montos.append(monto)
+        restante -= monto
+    return montos
+
+
+def _proporcional(disponible, deudas):
+    # Cociente entero por deuda y los pesos sobrantes, uno a uno, a los
+    # mayores residuos (método de Hamilton): la suma es exacta y nadie
+    # recibe más de lo que debe.
+    total = sum(d['falta'] for d in deudas)
+    if disponible >= total:
+        return [d['falta'] for d in deudas]
+    montos, residuos = [], []
+    for i, d in enumerate(deudas):
+        cociente, residuo = divmod(disponible * d['falta'], total)
+        montos.append(cociente)
+        residuos.append((-residuo, i))
+    sobrante = disponible - sum(montos)
+    for _, i in sorted(residuos)[:sobrante]:
+        montos[i] += 1
+    return montos
+
+
+def planificar(disponible, deudas, estrategia):
+    """Plan de asignación: copias de los dicts de `deudas` con 'aplicar' > 0.
+
+    `deudas` viene de deudas_abiertas(); no se modifica. Lanza ValueError si
+    la estrategia no existe.
+    """
+    if estrategia not in ESTRATEGIAS:
+        raise ValueError(f"Estrategia inválida (se espera {', '.join(ESTRATEGIAS)})")
+    if disponible <= 0 or not deudas:
+        return []
+
+    if estrategia == 'proporcional':
+        montos = _proporcional(disponible, deudas)
+        orden = deudas
+    else:
+        if estrategia == 'mayores':
+            orden = sorted(deudas, key=lambda d: (-d['falta'], d['fecha'], d['movimiento_id']))
+        else:
+            orden = deudas
+        montos = _en_orden(disponible, orden)
+
+    return [dict(d, aplicar=monto) for d, monto in zip(orden, montos) if monto > 0]
+
+
+def aplicar_plan(user_id, abono, persona_id, plan, sobrante=0, movimiento_origen_id=None):
+    """Escribe el plan en la transacción actual; no hace commit.
+
+    Crea un Abono por deuda, su AbonoIndirecto y actualiza abonado / falta /
+    estado de cada reparto. Si `sobrante` > 0 lo registra como saldo a favor
+    de la persona. Devuelve los ids de las personas cuyos balances cambiaron.
+    """
+    ahora = datetime.now()
+    if plan:
+        db.session.execute(insert(Abono), [
+            {'detalle_id': p['detalle_id'], 'monto': p['aplicar'], 'fecha': ahora}
+            for p in plan
+        ])
+        db.session.execute(insert(AbonoIndirecto), [
+            {
+                'abono_id': abono.id,
+                'movimiento_destino_id': p['movimiento_id'],
+                'persona_destino_id': persona_id,
+                'monto_aplicado': p['aplicar'],
+                'fecha': ahora,
+            }
+            for p in plan
+        ])
+        ajustar_abonado({p['detalle_id']: p['aplicar'] for p in plan})
+
+    if sobrante > 0:
+        db.session.add(SaldoFavor(
+            persona_id=persona_id, user_id=user_id, monto=sobrante, fecha=datetime.utcnow(),
+            comentario=f'Saldo a favor generado por abono #{abono.id} del movimiento #{movimiento_origen_id}',
+            abono_id=abono.id, movimiento_id=movimiento_origen_id,
+        ))
+
+    personas = set(personas_de_movimientos([p['movimiento_id'] for p in plan]))
+    personas.add(persona_id)
+    actualizar_balances(user_id, personas)
+    return personas
@@ -0,0 +1,274 @@
+from datetime import datetime
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.attributes import flag_modified
+
+from models import db
+from models.move import Movimiento, DetalleMovimiento, Abono
+from models.users import User, Person, SaldoFavor, PersonBalance
+from services.montos import suma
+
+
+# ==============================
+# Motor de balances por persona
+# ==============================
+# Calcula debe / pagado / le_deben / saldo_favor / balance de todas las
+# personas de un usuario con un número fijo de consultas agregadas, sin
+# recorrer relaciones (`p.detalles`, `d.abonos`) fila por fila.
+
+
+def _abonos_por_detalle(user_id):
+    """Subconsulta (detalle_id, total) con la suma de abonos de cada detalle del usuario."""
+    return db.session.query(
+        Abono.detalle_id.label('detalle_id'),
+        suma(Abono.monto).label('total'),
+    ).join(
+        DetalleMovimiento, DetalleMovimiento.id == Abono.detalle_id,
+    ).join(
+        Movimiento, Movimiento.id == DetalleMovimiento.movimiento_id,
+    ).filter(
+        Movimiento.user_id == user_id,
+    ).group_by(Abono.detalle_id).subquery()
+
+
+def _positivo(expr):
+    """max(expr, 0) en SQL."""
+    return case((expr > 0, expr), else_=0)
+
+
+def falta_movimiento():
+    """Subconsulta correlacionada con lo que falta por pagar de cada Movimiento.
+
+    Suma, por detalle, max(monto - abonos, 0). Se usa como columna extra en
+    las consultas paginadas para no recorrer `mov.detalles` / `det.abonos`.
+    """
+    abonado = select(
+        suma(Abono.monto),
+    ).where(
+        Abono.detalle_id == DetalleMovimiento.id,
+    ).correlate(DetalleMovimiento).scalar_subquery()
+
+    return select(
+        suma(_positivo(DetalleMovimiento.monto - abonado)),
+    ).where(
+        DetalleMovimiento.movimiento_id == Movimiento.id,
+    ).correlate(Movimiento).scalar_subquery()
+
+
+def _totales_vacios():
+    return {'monto': 0, 'pagado': 0, 'le_deben': 0, 'saldo_favor': 0, 'saldo_neto': 0, 'ultima_fecha_saldo': None}
+
+
+def totales_por_persona(user_id, persona_ids=None):
+    """Devuelve {persona_id: {'monto', 'pagado', 'le_deben', 'saldo_favor', 'saldo_neto', 'ultima_fecha_saldo'}}.
+
+    Usa tres consultas agregadas independientemente del número de personas,
+    detalles o abonos. `persona_ids` limita el cálculo a esas personas.
+    """
+    abonos = _abonos_por_detalle(user_id)
+    totales = {}
+
+    def fila(persona_id):
+        return totales.setdefault(persona_id, _totales_vacios())
+
+    # Lo que debe cada persona y lo que ha abonado
+    montos = db.session.query(
+        DetalleMovimiento.persona_id,
+        suma(DetalleMovimiento.monto),
+        suma(func.coalesce(abonos.c.total, 0)),
+    ).join(
+        Movimiento, Movimiento.id == DetalleMovimiento.movimiento_id,
+    ).outerjoin(
+        abonos, abonos.c.detalle_id == DetalleMovimiento.id,
+    ).filter(
+        Movimiento.user_id == user_id,
+    ).group_by(DetalleMovimiento.persona_id)
+    if persona_ids is not None:
+        montos = montos.filter(DetalleMovimiento.persona_id.in_(persona_ids))
+
+    for persona_id, monto, pagado in montos:
+        fila(persona_id).update(monto=monto, pagado=pagado)
+
+    # Lo que le deben a quien pagó todo: pendiente de los demás detalles del mismo movimiento
+    pagador = aliased(DetalleMovimiento)
+    otro = aliased(DetalleMovimiento)
+    pendiente = otro.monto - func.coalesce(abonos.c.total, 0)
+    le_deben = db.session.query(
+        pagador.persona_id,
+        suma(_positivo(pendiente)),
+    ).join(
+        Movimiento, Movimiento.id == pagador.movimiento_id,
+    ).join(
+        otro, (otro.movimiento_id == pagador.movimiento_id) & (otro.persona_id != pagador.persona_id),
+    ).outerjoin(
+        abonos, abonos.c.detalle_id == otro.id,
+    ).filter(
+        Movimiento.user_id == user_id,
+        pagador.pago_todo.is_(True),
+    ).group_by(pagador.persona_id)
+    if persona_ids is not None:
+        le_deben = le_deben.filter(pagador.persona_id.in_(persona_ids))
+
+    for persona_id, total in le_deben:
+        fila(persona_id)['le_deben'] = total
+
+    # Saldo a favor: suma directa y neto según tipo (ingreso / egreso)
+    saldos = db.session.query(
+        SaldoFavor.persona_id,
+        suma(SaldoFavor.monto),
+        suma(case((SaldoFavor.tipo == 'ingreso', SaldoFavor.monto), else_=-SaldoFavor.monto)),
+        func.max(SaldoFavor.fecha),
+    ).filter(
+        SaldoFavor.user_id == user_id,
+    ).group_by(SaldoFavor.persona_id)
+    if persona_ids is not None:
+        saldos = saldos.filter(SaldoFavor.persona_id.in_(persona_ids))
+
+    for persona_id, total, neto, ultima_fecha in saldos:
+        fila(persona_id).update(saldo_favor=total, saldo_neto=neto, ultima_fecha_saldo=ultima_fecha)
+
+    return totales
+
+
+# ==============================
+# Mantenimiento de PersonBalance
+# ==============================
+
+def personas_de_movimiento(mov_id):
+    """Ids de las personas con detalle en el movimiento (deudores y pagador)."""
+    return [pid for (pid,) in db.session.query(DetalleMovimiento.persona_id).filter_by(movimiento_id=mov_id).distinct()]
+
+
+def personas_de_movimientos(mov_ids):
+    """Como personas_de_movimiento() para varios movimientos, en una consulta."""
+    if not mov_ids:
+        return []
+    return [
+        pid for (pid,) in db.session.query(DetalleMovimiento.persona_id)
+        .filter(DetalleMovimiento.movimiento_id.in_(set(mov_ids))).distinct()
+    ]
+
+
+def personas_con_detalles(persona_ids):
+    """Subconjunto de `persona_ids` que tiene algún detalle (y por lo tanto
+    posibles abonos); una sola consulta en lugar de recorrer `p.detalles`."""
+    if not persona_ids:
+        return set()
+    return {
+        pid for (pid,) in db.session.query(DetalleMovimiento.persona_id)
+        .filter(DetalleMovimiento.persona_id.in_(persona_ids)).distinct()
+    }
+
+
+def actualizar_balances(user_id, persona_ids):
+    """Recalcula las filas de PersonBalance de las personas indicadas.
+
+    Se llama desde las rutas de escritura antes del commit, de modo que el
+    modelo de lectura queda actualizado en la misma transacción.
+    """
+    persona_ids = sorted(set(persona_ids))
+    if not persona_ids:
+        return {}
+
+    totales = totales_por_persona(user_id, persona_ids)
+    existentes = {
+        b.persona_id: b
+        for b in PersonBalance.query.filter(
+            PersonBalance.user_id == user_id,
+            PersonBalance.persona_id.in_(persona_ids),
+        )
+    }
+
+    ahora = datetime.utcnow()
+    balances = {}
+    for persona_id in persona_ids:
+        b = existentes.get(persona_id)
+        if b is None:
+            b = PersonBalance(user_id=user_id, persona_id=persona_id)
+            db.session.add(b)
+        for campo, valor in totales.get(persona_id, _totales_vacios()).items():
+            setattr(b, campo, valor)
+            # Todas las filas con las mismas columnas: el flush agrupa los
+            # UPDATE en un solo executemany en vez de uno por combinación
+            # de columnas cambiadas
+            flag_modified(b, campo)
+        b.actualizado = ahora
+        balances[persona_id] = b
+
+    return balances
+
+
+def reconstruir_balances(user_id=None):
+    """Borra y vuelve a generar PersonBalance (de un usuario o de todos)."""
+    borrar = PersonBalance.query
+    usuarios = db.session.query(User.id)
+    if user_id is not None:
+        borrar = borrar.filter(PersonBalance.user_id == user_id)
+        usuarios = usuarios.filter(User.id == user_id)
+    borrar.delete(synchronize_session=False)
+
+    total = 0
+    for (uid,) in usuarios.all():
+        persona_ids = [pid for (pid,) in db.session.query(Person.id).filter_by(user_id=uid)]
+        total += len(actualizar_balances(uid, persona_ids))
+    return total
+
+
+def _balances_sin_guardar(user_id, persona_ids):
+    """PersonBalance calculados pero fuera de la sesión, para las lecturas.
+
+    Las rutas GET no escriben: la fila se guarda en la próxima escritura que
+    toque a la persona (actualizar_balances) o con `flask rebuild-balances`.
+    """
+    totales = totales_por_persona(user_id, persona_ids)
+    return {
+        pid: PersonBalance(user_id=user_id, persona_id=pid, **totales.get(pid, _totales_vacios()))
+        for pid in persona_ids
+    }
+
+
+def obtener_balance(user_id, persona_id):
+    """Lectura por llave primaria; si la fila aún no existe se calcula sin guardarla."""
+    b = db.session.get(PersonBalance, (user_id, persona_id))
+    if b is None:
+        b = _balances_sin_guardar(user_id, [persona_id])[persona_id]
+    return b
+
+
+def obtener_balances(user_id):
+    """Lista de (Person, PersonBalance) de un usuario en una sola consulta.
+
+    Las personas que aún no tienen fila (p. ej. recién creadas) se calculan
+    en bloque, sin guardarlas.
+    """
+    filas = db.session.query(Person, PersonBalance).outerjoin(
+        PersonBalance,
+        (PersonBalance.persona_id == Person.id) & (PersonBalance.user_id == user_id),
+    ).filter(Person.user_id == user_id).order_by(Person.id).all()
+
+    faltantes = [p.id for p, b in filas if b is None]
+    if faltantes:
+        calculados = _balances_sin_guardar(user_id, faltantes)
+        filas = [(p, b if b is not None else calculados[p.id]) for p, b in filas]
+
+    return filas
+
+
+def deudas_por_persona(user_id):
+    """Lista de deudas por persona para el dashboard y los reportes.
+
+    Cada elemento tiene 'person', 'debe', 'pagado', 'le_deben', 'saldo_favor'
+    y 'balance'. Se lee de PersonBalance.
+    """
+    return [
+        {
+            'person': p,
+            'debe': b.debe,
+            'pagado': b.pagado,
+            'le_deben': b.le_deben,
+            'saldo_favor': b.saldo_favor,
+            'balance': b.balance,
+        }
+        for p, b in obtener_balances(user_id)
+    ]
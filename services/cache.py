@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from models.users import User
+
+
+# ==============================
+# Caché de lecturas por usuario
+# ==============================
+# Las claves incluyen el id del usuario y su `data_version`; cada ruta de
+# escritura incrementa la versión (incrementar_version) en la misma
+# transacción, así las entradas viejas dejan de leerse sin tener que
+# borrarlas: el LRU y el TTL las van descartando.
+#
+# Los valores guardados se comparten entre peticiones: deben ser datos
+# simples (dicts, listas, números) y no modificarse después de leerlos.
+
+
+class Cache:
+    """Interfaz del backend de caché (memoria local, Redis, ...)."""
+
+    def get(self, clave):
+        """Valor guardado o None si no existe / expiró."""
+        raise NotImplementedError
+
+    def set(self, clave, valor, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, clave):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def obtener(self, clave, calcular, ttl=None):
+        """Devuelve el valor en caché o lo calcula con `calcular()` y lo guarda."""
+        valor = self.get(clave)
+        if valor is None:
+            valor = calcular()
+            self.set(clave, valor, ttl)
+        return valor
+
+
+class CacheNula(Cache):
+    """No guarda nada (CACHE_BACKEND=ninguno)."""
+
+    def get(self, clave):
+        return None
+
+    def set(self, clave, valor, ttl=None):
+        pass
+
+    def delete(self, clave):
+        pass
+
+    def clear(self):
+        pass
+
+
+class CacheMemoria(Cache):
+    """LRU en memoria del proceso con expiración por TTL y tamaño máximo."""
+
+    def __init__(self, max_items=1024, ttl=300):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._datos = OrderedDict()  # clave -> (expira, valor)
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            expira, valor = entrada
+            if expira < time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave, valor, ttl=None):
+        expira = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._datos[clave] = (expira, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_items:
+                self._datos.popitem(last=False)
+
+    def delete(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+def crear_cache():
+    """Backend según el entorno: CACHE_BACKEND (memoria | ninguno), CACHE_TTL, CACHE_MAX_ITEMS."""
+    backend = os.getenv('CACHE_BACKEND', 'memoria').lower()
+    if backend == 'ninguno':
+        return CacheNula()
+    if backend != 'memoria':
+        raise ValueError(f'CACHE_BACKEND desconocido: {backend}')
+    return CacheMemoria(
+        max_items=int(os.getenv('CACHE_MAX_ITEMS', '1024')),
+        ttl=int(os.getenv('CACHE_TTL', '300')),
+    )
+
+
+def clave_usuario(nombre, usuario, *partes):
+    """Clave de caché de `nombre` para la versión actual de los datos del usuario."""
+    return ':'.join([nombre, str(usuario.id), f'v{usuario.data_version}', *map(str, partes)])
+
+
+def incrementar_version(user_id=None):
+    """Marca que los datos del usuario (o de todos, con None) cambiaron.
+
+    UPDATE atómico en la transacción actual; no hace commit.
+    """
+    query = User.query
+    if user_id is not None:
+        query = query.filter(User.id == user_id)
+    query.update({
+        User.data_version: User.data_version + 1,
+        User.datos_actualizados: datetime.utcnow(),
+    }, synchronize_session=False)
@@ -0,0 +1,183 @@
+from datetime import date
+
+from sqlalchemy import case, cast, func
+
+from models import db
+from models.move import Movimiento, MovimientoMensual
+from services.montos import suma
+
+
+# ==============================
+# Agregados del dashboard
+# ==============================
+# Todos los cálculos se hacen con SUM / GROUP BY en la base de datos, así el
+# costo depende del número de grupos (tipos, categorías, periodos) y no de la
+# cantidad de movimientos del usuario. Los totales y las resoluciones de mes
+# en adelante se leen de movimiento_mensual; día y semana se agrupan sobre
+# movimiento dentro del rango pedido.
+
+RESOLUCIONES = ('dia', 'semana', 'mes', 'trimestre', 'anio')
+
+# Rango de la gráfica en meses (None = todo el histórico)
+RANGOS = {'3': 3, '12': 12, '24': 24, '60': 60, 'todo': None}
+
+FORMATO_ETIQUETA = {
+    'dia': '%d/%m/%Y',
+    'semana': '%d/%m/%Y',
+    'mes': '%m/%Y',
+    'anio': '%Y',
+}
+
+
+def _dialecto():
+    return db.session.get_bind().dialect.name
+
+
+def periodo_expr(granularidad):
+    """Expresión SQL que trunca `Movimiento.fecha` al inicio del periodo (dia, semana o mes)."""
+    if granularidad == 'dia':
+        return Movimiento.fecha
+
+    if _dialecto() == 'sqlite':
+        if granularidad == 'semana':
+            # Lunes de la semana: siguiente domingo (o el mismo) menos 6 días
+            return func.date(Movimiento.fecha, 'weekday 0', '-6 days', type_=db.Date)
+        return func.strftime('%Y-%m-01', Movimiento.fecha, type_=db.Date)
+
+    unidad = 'week' if granularidad == 'semana' else 'month'
+    return cast(func.date_trunc(unidad, Movimiento.fecha), db.Date)
+
+
+def inicio_rango(rango, hoy=None):
+    """Primer día del periodo de `rango` meses que termina en el mes actual."""
+    meses = RANGOS.get(rango)
+    if meses is None:
+        return None
+    hoy = hoy or date.today()
+    indice = hoy.year * 12 + (hoy.month - 1) - (meses - 1)
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def _etiqueta(periodo, resolucion):
+    if resolucion == 'trimestre':
+        return f'T{(periodo.month - 1) // 3 + 1}/{periodo.year}'
+    return periodo.strftime(FORMATO_ETIQUETA[resolucion])
+
+
+def _agrupar_meses(periodo, resolucion):
+    if resolucion == 'trimestre':
+        return periodo.replace(month=(periodo.month - 1) // 3 * 3 + 1)
+    if resolucion == 'anio':
+        return periodo.replace(month=1)
+    return periodo
+
+
+def totales_por_tipo(user_id):
+    """Devuelve {'ingreso': int, 'gasto': int, 'pago': int} desde los acumulados mensuales."""
+    filas = db.session.query(
+        MovimientoMensual.tipo,
+        suma(MovimientoMensual.total),
+    ).filter(MovimientoMensual.user_id == user_id).group_by(MovimientoMensual.tipo).all()
+
+    totales = {'ingreso': 0, 'gasto': 0, 'pago': 0}
+    for tipo, total in filas:
+        totales[tipo] = total
+    return totales
+
+
+def totales_rango(user_id, desde=None, hasta=None):
+    """Totales por tipo y número de movimientos entre dos fechas (inclusive), en SQL."""
+    query = db.session.query(
+        Movimiento.tipo,
+        suma(Movimiento.monto),
+        func.count(Movimiento.id),
+    ).filter(Movimiento.user_id == user_id)
+    if desde is not None:
+        query = query.filter(Movimiento.fecha >= desde)
+    if hasta is not None:
+        query = query.filter(Movimiento.fecha <= hasta)
+
+    totales = {'ingreso': 0, 'gasto': 0, 'pago': 0, 'cantidad': 0}
+    for tipo, total, cantidad in query.group_by(Movimiento.tipo):
+        totales[tipo] = total
+        totales['cantidad'] += cantidad
+    totales['balance'] = totales['ingreso'] - totales['gasto']
+    return totales
+
+
+def gastos_por_categoria(user_id, desde=None):
+    """Datos de la gráfica de dona: total de gastos por categoría desde `desde`."""
+    query = db.session.query(
+        MovimientoMensual.categoria,
+        suma(MovimientoMensual.total),
+    ).filter(
+        MovimientoMensual.user_id == user_id,
+        MovimientoMensual.tipo == 'gasto',
+    )
+    if desde is not None:
+        query = query.filter(MovimientoMensual.mes >= desde)
+    filas = query.group_by(MovimientoMensual.categoria).order_by(MovimientoMensual.categoria).all()
+
+    return {
+        'labels': [categoria for categoria, _ in filas],
+        'valores': [total for _, total in filas],
+    }
+
+
+def _serie_movimientos(user_id, granularidad, desde):
+    periodo = periodo_expr(granularidad).label('periodo')
+    query = db.session.query(
+        periodo,
+        suma(case((Movimiento.tipo == 'ingreso', Movimiento.monto), else_=0)),
+        suma(case((Movimiento.tipo == 'gasto', Movimiento.monto), else_=0)),
+    ).filter(
+        Movimiento.user_id == user_id,
+        Movimiento.tipo.in_(('ingreso', 'gasto')),
+    )
+    if desde is not None:
+        query = query.filter(Movimiento.fecha >= desde)
+    return query.group_by(periodo).order_by(periodo).all()
+
+
+def _serie_mensual(user_id, resolucion, desde):
+    query = db.session.query(
+        MovimientoMensual.mes,
+        suma(case((MovimientoMensual.tipo == 'ingreso', MovimientoMensual.total), else_=0)),
+        suma(case((MovimientoMensual.tipo == 'gasto', MovimientoMensual.total), else_=0)),
+    ).filter(
+        MovimientoMensual.user_id == user_id,
+        MovimientoMensual.tipo.in_(('ingreso', 'gasto')),
+    )
+    if desde is not None:
+        query = query.filter(MovimientoMensual.mes >= desde)
+    filas = query.group_by(MovimientoMensual.mes).order_by(MovimientoMensual.mes).all()
+
+    # A lo sumo un registro por mes: reagrupar a trimestre/año es trivial
+    acumulado = {}
+    for mes, ingresos, gastos in filas:
+        clave = _agrupar_meses(mes, resolucion)
+        previo = acumulado.get(clave, (0, 0))
+        acumulado[clave] = (previo[0] + ingresos, previo[1] + gastos)
+    return [(periodo, i, g) for periodo, (i, g) in acumulado.items()]
+
+
+def serie_ingresos_gastos(user_id, resolucion='mes', desde=None):
+    """Serie de ingresos y gastos agrupada por periodo.
+
+    Día y semana se agrupan en SQL sobre movimiento; mes, trimestre y año
+    salen de movimiento_mensual. Devuelve un punto por periodo con ambas
+    series alineadas a las mismas etiquetas.
+    """
+    if resolucion not in RESOLUCIONES:
+        resolucion = 'mes'
+
+    if resolucion in ('dia', 'semana'):
+        filas = _serie_movimientos(user_id, resolucion, desde)
+    else:
+        filas = _serie_mensual(user_id, resolucion, desde)
+
+    return {
+        'labels': [_etiqueta(p, resolucion) for p, _, _ in filas],
+        'ingresos': [i for _, i, _ in filas],
+        'gastos': [g for _, _, g in filas],
+    }
@@ -0,0 +1,86 @@
+import csv
+
+from models import db
+from models.move import Movimiento, DetalleMovimiento
+from models.users import Person
+
+
+# ==============================
+# Exportaciones
+# ==============================
+
+ENCABEZADO_CSV = ['Fecha', 'Tipo', 'Categoría', 'Descripción', 'Monto']
+ENCABEZADO_DETALLE_CSV = ['Persona', 'Monto persona', 'Abonado', 'Falta', 'Estado', 'Pagó todo']
+
+
+class _Eco:
+    """Objeto tipo archivo que devuelve lo escrito, para usar csv.writer sin buffer."""
+
+    def write(self, valor):
+        return valor
+
+
+def filtrar_movimientos(query, desde=None, hasta=None, tipo=None):
+    """Aplica los filtros opcionales de fecha (inclusive) y tipo."""
+    if desde is not None:
+        query = query.filter(Movimiento.fecha >= desde)
+    if hasta is not None:
+        query = query.filter(Movimiento.fecha <= hasta)
+    if tipo:
+        query = query.filter(Movimiento.tipo == tipo)
+    return query
+
+
+def movimientos_exportables(user_id, desde=None, hasta=None, tipo=None, lote=1000):
+    """Consulta (fecha, tipo, categoria, descripcion, monto) ordenada y leída por lotes."""
+    query = db.session.query(
+        Movimiento.fecha, Movimiento.tipo, Movimiento.categoria, Movimiento.descripcion, Movimiento.monto,
+    ).filter(Movimiento.user_id == user_id)
+    query = filtrar_movimientos(query, desde, hasta, tipo)
+    return query.order_by(Movimiento.fecha, Movimiento.id).execution_options(yield_per=lote)
+
+
+def filas_csv(user_id, desde=None, hasta=None, tipo=None, con_detalles=False, lote=1000):
+    """Generador del CSV de movimientos, en bloques de `lote` filas.
+
+    Lee con `yield_per` (cursor del lado del servidor en PostgreSQL), así que
+    la memoria no depende del tamaño de la exportación y el primer bloque
+    sale antes de terminar la consulta. Con `con_detalles` agrega una fila por
+    persona del movimiento.
+    """
+    columnas = [Movimiento.fecha, Movimiento.tipo, Movimiento.categoria, Movimiento.descripcion, Movimiento.monto]
+    encabezado = list(ENCABEZADO_CSV)
+    if con_detalles:
+        columnas += [Person.name, DetalleMovimiento.monto, DetalleMovimiento.abonado,
+                     DetalleMovimiento.falta, DetalleMovimiento.estado, DetalleMovimiento.pago_todo]
+        encabezado += ENCABEZADO_DETALLE_CSV
+
+    query = db.session.query(*columnas).filter(Movimiento.user_id == user_id)
+    query = filtrar_movimientos(query, desde, hasta, tipo)
+    orden = [Movimiento.fecha, Movimiento.id]
+    if con_detalles:
+        query = query.outerjoin(DetalleMovimiento, DetalleMovimiento.movimiento_id == Movimiento.id) \
+                     .outerjoin(Person, Person.id == DetalleMovimiento.persona_id)
+        orden.append(DetalleMovimiento.id)
+    query = query.order_by(*orden).execution_options(yield_per=lote)
+
+    writer = csv.writer(_Eco())
+    yield writer.writerow(encabezado)
+
+    bloque = []
+    for fila in query:
+        fecha, tipo_mov, categoria, descripcion, monto = fila[:5]
+        valores = [fecha, tipo_mov, categoria, descripcion, monto]
+        if con_detalles:
+            persona, monto_persona, abonado, falta, estado, pago_todo = fila[5:]
+            if persona is None:
+                valores += ['', '', '', '', '', '']
+            else:
+                valores += [persona, monto_persona, abonado, falta, estado, 'Sí' if pago_todo else 'No']
+        bloque.append(writer.writerow(valores))
+        if len(bloque) >= lote:
+            yield ''.join(bloque)
+            bloque = []
+
+    if bloque:
+        yield ''.join(bloque)
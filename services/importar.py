@@ -0,0 +1,244 @@
+import csv
+import io
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from models import db
+from models.users import Person
+from services.balances import actualizar_balances
+from services.cache import incrementar_version
+from services.movimientos import TIPOS, acumular_movimientos, insertar_detalles, insertar_movimientos
+from utils import parse_amount_series
+
+
+# ==============================
+# Importación masiva (CSV / Excel)
+# ==============================
+# Formato "largo": una fila por movimiento o por cada persona de un reparto.
+# Las filas con el mismo `ref` forman un único movimiento (los datos del
+# movimiento se toman de la primera fila válida); sin `ref`, cada fila es un
+# movimiento independiente.
+#
+#   ref, fecha, tipo, categoria, descripcion, monto, persona, monto_persona, abonado, pago_todo
+#
+# El archivo se lee por bloques y cada bloque se inserta con executemany
+# (INSERT ... RETURNING) en su propia transacción.
+
+COLUMNAS_OBLIGATORIAS = ('fecha', 'tipo', 'categoria', 'monto')
+COLUMNAS = ('ref', 'fecha', 'tipo', 'categoria', 'descripcion', 'monto',
+            'persona', 'monto_persona', 'abonado', 'pago_todo')
+ALIAS = {'categoría': 'categoria', 'descripción': 'descripcion', 'pagó_todo': 'pago_todo'}
+VERDADEROS = ('1', 'si', 'sí', 'true', 'x', 'yes')
+EXTENSIONES_EXCEL = ('.xlsx', '.xlsm')
+
+TAMANO_BLOQUE = 5000
+
+
+class ImportacionError(ValueError):
+    """El archivo no se puede importar (formato o columnas)."""
+
+
+class ResultadoImportacion:
+    """Contadores y errores por fila de una importación."""
+
+    def __init__(self):
+        self.filas = 0
+        self.movimientos = 0
+        self.detalles = 0
+        self.abonos = 0
+        self.errores = []  # [(fila, mensaje)]
+
+    def error(self, fila, mensaje):
+        self.errores.append((int(fila), mensaje))
+
+    @property
+    def filas_ok(self):
+        return self.filas - len({f for f, _ in self.errores})
+
+    def errores_csv(self):
+        salida = io.StringIO()
+        writer = csv.writer(salida)
+        writer.writerow(['fila', 'error'])
+        writer.writerows(self.errores)
+        return salida.getvalue()
+
+
+# --- lectura ---
+def _normalizar_columnas(df):
+    df.columns = [ALIAS.get(str(c).strip().lower(), str(c).strip().lower()) for c in df.columns]
+    faltan = [c for c in COLUMNAS_OBLIGATORIAS if c not in df.columns]
+    if faltan:
+        raise ImportacionError(f"Faltan columnas obligatorias: {', '.join(faltan)}")
+    for c in COLUMNAS:
+        if c not in df.columns:
+            df[c] = ''
+    return df[list(COLUMNAS)].fillna('').astype(str)
+
+
+def _bloques_excel(archivo, tamano):
+    from openpyxl import load_workbook
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if encabezado is None:
+            return
+        encabezado = ['' if c is None else str(c) for c in encabezado]
+        bloque = []
+        for fila in filas:
+            bloque.append(['' if v is None else (v.date().isoformat() if isinstance(v, datetime) else v) for v in fila])
+            if len(bloque) >= tamano:
+                yield pd.DataFrame(bloque, columns=encabezado)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame(bloque, columns=encabezado)
+    finally:
+        libro.close()
+
+
+def leer_en_bloques(archivo, nombre, tamano=TAMANO_BLOQUE):
+    """Itera DataFrames de hasta `tamano` filas con las columnas normalizadas.
+
+    Cada bloque conserva el número de fila del archivo (encabezado = fila 1)
+    en la columna `_fila` para reportar errores.
+    """
+    ext = os.path.splitext(nombre or '')[1].lower()
+    if ext in EXTENSIONES_EXCEL:
+        bloques = _bloques_excel(archivo, tamano)
+    elif ext in ('', '.csv', '.txt'):
+        bloques = pd.read_csv(archivo, chunksize=tamano, dtype=str, keep_default_na=False,
+                              skipinitialspace=True, encoding='utf-8-sig')
+    else:
+        raise ImportacionError(f'Formato no soportado: {ext}')
+
+    inicio = 2
+    try:
+        for df in bloques:
+            df = _normalizar_columnas(df)
+            df['_fila'] = range(inicio, inicio + len(df))
+            inicio += len(df)
+            yield df
+    except (pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise ImportacionError(f'No se pudo leer el archivo: {e}') from e
+
+
+# --- validación ---
+def _validar(df, personas, resultado):
+    """Valida y convierte un bloque. Devuelve solo las filas válidas."""
+    errores = pd.Series('', index=df.index)
+
+    def marcar(mascara, mensaje):
+        errores[mascara & (errores == '')] = mensaje
+
+    df['tipo'] = df['tipo'].str.strip().str.lower()
+    df['categoria'] = df['categoria'].str.strip()
+    df['descripcion'] = df['descripcion'].str.strip()
+    df['persona'] = df['persona'].str.strip()
+    df['ref'] = df['ref'].str.strip()
+
+    fechas = pd.to_datetime(df['fecha'].str.strip(), errors='coerce', format='%Y-%m-%d')
+    # parse_amount_series convierte los vacíos en 0: se miran antes de convertir
+    monto_vacio = df['monto'].str.strip() == ''
+    df['monto'], monto_invalido = parse_amount_series(df['monto'])
+    df['monto_persona'], monto_persona_invalido = parse_amount_series(df['monto_persona'])
+    df['abonado'], abonado_invalido = parse_amount_series(df['abonado'])
+    df['persona_id'] = df['persona'].str.lower().map(personas)
+
+    marcar(fechas.isna(), 'Fecha inválida (se espera AAAA-MM-DD)')
+    marcar(~df['tipo'].isin(TIPOS), f"Tipo inválido (se espera {', '.join(TIPOS)})")
+    marcar(df['categoria'] == '', 'Categoría vacía')
+    marcar(df['monto_persona'] < 0, 'Monto de persona negativo')
+    marcar(monto_vacio, 'Monto vacío')
+    marcar(monto_invalido, 'Monto inválido')
+    marcar(monto_persona_invalido, 'Monto de persona inválido')
+    marcar(abonado_invalido | (df['abonado'] < 0), 'Abonado inválido')
+    marcar((df['persona'] != '') & df['persona_id'].isna(), 'Persona no encontrada')
+    marcar((df['persona'] == '') & ((df['monto_persona'] != 0) | (df['abonado'] != 0)),
+           'Monto de persona sin persona')
+
+    for fila, mensaje in zip(df.loc[errores != '', '_fila'], errores[errores != '']):
+        resultado.error(fila, mensaje)
+
+    validas = df[errores == ''].copy()
+    validas['fecha'] = fechas[errores == ''].dt.date
+    validas['pago_todo'] = validas['pago_todo'].str.strip().str.lower().isin(VERDADEROS)
+    validas['ref'] = validas['ref'].where(validas['ref'] != '', '#' + validas['_fila'].astype(str))
+    return validas
+
+
+# --- inserción ---
+def _insertar_bloque(user_id, df, refs, resultado):
+    """Inserta movimientos, detalles y abonos iniciales de un bloque validado.
+
+    `refs` acumula ref → movimiento_id entre bloques para que un movimiento
+    pueda continuar en el bloque siguiente.
+    """
+    nuevos = df[~df['ref'].isin(refs)].drop_duplicates('ref')
+    if len(nuevos):
+        movimientos = [
+            {'user_id': user_id, 'fecha': f, 'tipo': t, 'categoria': c, 'descripcion': d, 'monto': m}
+            for f, t, c, d, m in zip(nuevos['fecha'], nuevos['tipo'], nuevos['categoria'],
+                                     nuevos['descripcion'], nuevos['monto'].tolist())
+        ]
+        ids = insertar_movimientos(movimientos)
+        refs.update(zip(nuevos['ref'], ids))
+        acumular_movimientos(user_id, movimientos)
+        resultado.movimientos += len(ids)
+
+    repartos = df[df['persona_id'].notna()]
+    if not len(repartos):
+        return set()
+
+    abonado = repartos['abonado'].clip(upper=repartos['monto_persona'])
+    detalles = [
+        {'movimiento_id': refs[r], 'persona_id': int(p), 'monto': m, 'abonado': a, 'pago_todo': bool(pt), 'fecha': f}
+        for r, p, m, a, pt, f in zip(repartos['ref'], repartos['persona_id'], repartos['monto_persona'].tolist(),
+                                     abonado.tolist(), repartos['pago_todo'], repartos['fecha'])
+    ]
+    detalle_ids, abonos = insertar_detalles(detalles)
+    resultado.detalles += len(detalle_ids)
+    resultado.abonos += abonos
+
+    return {int(p) for p in repartos['persona_id'].unique()}
+
+
+def importar_movimientos(user_id, archivo, nombre, tamano=TAMANO_BLOQUE):
+    """Importa un CSV/Excel de movimientos para `user_id`.
+
+    Cada bloque se valida en forma vectorizada, se insertan sus filas válidas
+    y se confirma; las filas con error se omiten y se reportan en el resultado.
+    Al final se recalculan los balances de las personas afectadas, también si
+    un bloque posterior falla: los bloques ya confirmados quedan guardados.
+    """
+    personas = {
+        nombre.strip().lower(): id_
+        for id_, nombre in db.session.query(Person.id, Person.name).filter(Person.user_id == user_id)
+    }
+    resultado = ResultadoImportacion()
+    refs = {}
+    afectadas = set()
+    confirmados = 0
+
+    try:
+        for df in leer_en_bloques(archivo, nombre, tamano):
+            resultado.filas += len(df)
+            validas = _validar(df, personas, resultado)
+            if not len(validas):
+                continue
+            try:
+                personas_bloque = _insertar_bloque(user_id, validas, refs, resultado)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            afectadas |= personas_bloque
+            confirmados += 1
+    finally:
+        if confirmados:
+            actualizar_balances(user_id, afectadas)
+            incrementar_version(user_id)
+            db.session.commit()
+    return resultado
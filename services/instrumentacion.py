@@ -0,0 +1,140 @@
+import json
+import logging
+import time
+from collections import deque
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+logger = logging.getLogger('app.sql')
+
+
+# ==============================
+# Instrumentación de SQL por petición
+# ==============================
+# Opcional (SQL_INSTRUMENTACION=1). Con los eventos del engine cuenta y mide
+# cada consulta de la petición en curso, y con los hooks de Flask mide el
+# render y el total. El resultado se publica en:
+#   - el header Server-Timing (visible en las devtools del navegador),
+#   - una línea de log JSON en el logger "app.sql" (WARNING si hubo consultas lentas),
+#   - un buffer circular con las últimas peticiones para la página /admin/sql.
+
+MAX_LENTAS = 5        # sentencias más lentas guardadas por petición
+MAX_SQL_TEXTO = 500   # caracteres de cada sentencia en el log / buffer
+
+
+class Instrumentacion:
+    """Métricas de SQL y render por petición; se registra con `init_app`."""
+
+    def __init__(self, capacidad=200, lenta_ms=100):
+        self.lenta_ms = lenta_ms
+        self.recientes = deque(maxlen=capacidad)
+
+    def init_app(self, app, engine):
+        event.listen(engine, 'before_cursor_execute', self._antes_de_consulta)
+        event.listen(engine, 'after_cursor_execute', self._despues_de_consulta)
+        before_render_template.connect(self._antes_de_render, app)
+        template_rendered.connect(self._despues_de_render, app)
+        app.before_request(self._inicio_peticion)
+        app.after_request(self._fin_peticion)
+        app.extensions['instrumentacion'] = self
+
+    # --- peticiones ---
+    def _inicio_peticion(self):
+        g.sql_stats = {
+            'inicio': time.perf_counter(),
+            'consultas': 0,
+            'db_ms': 0.0,
+            'render_ms': 0.0,
+            'lentas': [],
+        }
+
+    def _fin_peticion(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+
+        total_ms = (time.perf_counter() - stats['inicio']) * 1000
+        registro = {
+            'fecha': time.time(),
+            'metodo': request.method,
+            'ruta': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'consultas': stats['consultas'],
+            'db_ms': round(stats['db_ms'], 2),
+            'render_ms': round(stats['render_ms'], 2),
+            'total_ms': round(total_ms, 2),
+            'lentas': stats['lentas'],
+        }
+        self.recientes.append(registro)
+
+        response.headers['Server-Timing'] = (
+            f'db;dur={registro["db_ms"]};desc="{registro["consultas"]} consultas", '
+            f'render;dur={registro["render_ms"]}, total;dur={registro["total_ms"]}'
+        )
+        response.headers['X-Query-Count'] = str(registro['consultas'])
+
+        hay_lentas = any(l['ms'] >= self.lenta_ms for l in registro['lentas'])
+        logger.log(logging.WARNING if hay_lentas else logging.INFO, json.dumps(registro, default=str))
+        return response
+
+    # --- render ---
+    def _antes_de_render(self, app, template, context, **extra):
+        if has_request_context() and 'sql_stats' in g:
+            g.sql_render_inicio = time.perf_counter()
+
+    def _despues_de_render(self, app, template, context, **extra):
+        inicio = g.pop('sql_render_inicio', None) if has_request_context() else None
+        if inicio is not None and 'sql_stats' in g:
+            g.sql_stats['render_ms'] += (time.perf_counter() - inicio) * 1000
+
+    # --- consultas ---
+    def _antes_de_consulta(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('sql_inicio', []).append(time.perf_counter())
+
+    def _despues_de_consulta(self, conn, cursor, statement, parameters, context, executemany):
+        pila = conn.info.get('sql_inicio')
+        if not pila:
+            return
+        ms = (time.perf_counter() - pila.pop()) * 1000
+        if not has_request_context() or 'sql_stats' not in g:
+            return
+        stats = g.sql_stats
+        stats['consultas'] += 1
+        stats['db_ms'] += ms
+
+        lentas = stats['lentas']
+        if len(lentas) < MAX_LENTAS or ms > lentas[-1]['ms']:
+            lentas.append({'ms': round(ms, 2), 'sql': ' '.join(statement.split())[:MAX_SQL_TEXTO]})
+            lentas.sort(key=lambda l: l['ms'], reverse=True)
+            del lentas[MAX_LENTAS:]
+
+    # --- consulta del buffer ---
+    def ultimas(self, limite=None):
+        """Peticiones registradas, de la más reciente a la más vieja."""
+        registros = list(self.recientes)[::-1]
+        return registros[:limite] if limite else registros
+
+    def por_endpoint(self):
+        """Resumen por endpoint de lo que hay en el buffer, ordenado por consultas promedio."""
+        resumen = {}
+        for r in list(self.recientes):
+            e = resumen.setdefault(r['endpoint'] or r['ruta'], {
+                'endpoint': r['endpoint'] or r['ruta'], 'peticiones': 0, 'consultas': 0,
+                'max_consultas': 0, 'db_ms': 0.0, 'render_ms': 0.0, 'total_ms': 0.0, 'max_total_ms': 0.0,
+            })
+            e['peticiones'] += 1
+            e['consultas'] += r['consultas']
+            e['max_consultas'] = max(e['max_consultas'], r['consultas'])
+            e['db_ms'] += r['db_ms']
+            e['render_ms'] += r['render_ms']
+            e['total_ms'] += r['total_ms']
+            e['max_total_ms'] = max(e['max_total_ms'], r['total_ms'])
+
+        filas = []
+        for e in resumen.values():
+            n = e['peticiones']
+            filas.append(dict(e, consultas=round(e['consultas'] / n, 1), db_ms=round(e['db_ms'] / n, 2),
+                              render_ms=round(e['render_ms'] / n, 2), total_ms=round(e['total_ms'] / n, 2)))
+        return sorted(filas, key=lambda e: e['consultas'], reverse=True)
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+# ==============================
+# Trabajos en segundo plano
+# ==============================
+# Ejecuta exportaciones pesadas fuera del hilo de la petición. El estado de
+# cada trabajo y el archivo generado viven en disco (directorio compartido por
+# todos los workers de gunicorn), así cualquier proceso puede responder el
+# estado o servir la descarga.
+#
+# El id del trabajo se deriva de (usuario, tipo, filtros, versión de datos):
+# pedir la misma exportación sin cambios en los datos reutiliza el archivo.
+
+ID_VALIDO = re.compile(r'^[0-9a-f]{16}_[0-9a-f]{16}$')
+
+# Un trabajo "procesando" sin actualizaciones durante este tiempo se considera
+# abandonado (p. ej. el worker se reinició) y se vuelve a lanzar.
+MINUTOS_ABANDONO = 15
+
+
+def _hash(*partes):
+    return hashlib.sha256(json.dumps(partes, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class JobRunner:
+    """Pool de hilos con estado y artefactos persistidos en `directorio`.
+
+    `al_terminar(estado)` se llama cuando un trabajo termina (listo o error).
+    """
+
+    def __init__(self, directorio, max_workers=2, al_terminar=None):
+        self.directorio = directorio
+        self.al_terminar = al_terminar
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='export')
+        os.makedirs(directorio, exist_ok=True)
+
+    # --- rutas ---
+    def _ruta_estado(self, job_id):
+        return os.path.join(self.directorio, f'{job_id}.json')
+
+    def ruta_artefacto(self, job_id, extension):
+        return os.path.join(self.directorio, f'{job_id}.{extension}')
+
+    # --- estado ---
+    def estado(self, job_id):
+        """Estado guardado del trabajo o None si no existe / el id no es válido."""
+        if not ID_VALIDO.match(job_id or ''):
+            return None
+        try:
+            with open(self._ruta_estado(job_id), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _guardar(self, estado):
+        ruta = self._ruta_estado(estado['id'])
+        tmp = f'{ruta}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(estado, f)
+        os.replace(tmp, ruta)
+
+    def _reclamar(self, estado):
+        """Crea el archivo de estado solo si no existe (evita duplicar el trabajo entre workers)."""
+        try:
+            fd = os.open(self._ruta_estado(estado['id']), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(estado, f)
+        return True
+
+    def _abandonado(self, estado):
+        return estado['estado'] in ('pendiente', 'procesando') and \
+            time.time() - estado.get('actualizado', 0) > MINUTOS_ABANDONO * 60
+
+    # --- ejecución ---
+    def lanzar(self, app, tipo, user_id, filtros, version, extension, funcion):
+        """Encola `funcion(destino, progreso)` salvo que ya exista o esté en curso.
+
+        `funcion` se ejecuta dentro de `app.app_context()`; debe escribir el
+        archivo en `destino` y puede llamar `progreso(porcentaje)`.
+        """
+        grupo = _hash(tipo, user_id, filtros)
+        job_id = f'{grupo}_{_hash(version)}'
+        actual = self.estado(job_id)
+        if actual and actual['estado'] != 'error' and not self._abandonado(actual):
+            return actual
+
+        ahora = time.time()
+        nuevo = {
+            'id': job_id,
+            'tipo': tipo,
+            'user_id': user_id,
+            'extension': extension,
+            'estado': 'pendiente',
+            'progreso': 0,
+            'error': None,
+            'creado': ahora,
+            'actualizado': ahora,
+            'duracion': None,
+        }
+        if actual is not None:
+            self._guardar(nuevo)
+        elif not self._reclamar(nuevo):
+            return self.estado(job_id)
+
+        self.executor.submit(self._ejecutar, app, dict(nuevo), grupo, funcion)
+        return nuevo
+
+    def _ejecutar(self, app, estado, grupo, funcion):
+        destino = self.ruta_artefacto(estado['id'], estado['extension'])
+        tmp = f'{destino}.{os.getpid()}.tmp'
+        inicio = time.time()
+
+        def progreso(porcentaje):
+            estado.update(progreso=max(0, min(int(porcentaje), 99)), actualizado=time.time())
+            self._guardar(estado)
+
+        estado.update(estado='procesando', actualizado=inicio)
+        self._guardar(estado)
+        try:
+            with app.app_context():
+                funcion(tmp, progreso)
+            os.replace(tmp, destino)
+            estado.update(estado='listo', progreso=100)
+        except Exception as e:
+            logger.exception('Error en trabajo de exportación %s', estado['id'])
+            estado.update(estado='error', error=str(e))
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        finally:
+            estado.update(actualizado=time.time(), duracion=round(time.time() - inicio, 3))
+            self._guardar(estado)
+            if self.al_terminar:
+                self.al_terminar(estado)
+        if estado['estado'] == 'listo':
+            self._limpiar_versiones_anteriores(grupo, estado['id'])
+
+    def _limpiar_versiones_anteriores(self, grupo, job_id):
+        """Borra los artefactos terminados de la misma exportación con datos más viejos."""
+        actual = self.estado(job_id)
+        for nombre in os.listdir(self.directorio):
+            if not (nombre.startswith(f'{grupo}_') and nombre.endswith('.json')):
+                continue
+            otro = self.estado(nombre[:-len('.json')])
+            if not otro or otro['id'] == job_id or otro['estado'] not in ('listo', 'error'):
+                continue
+            if otro['creado'] > actual['creado']:
+                continue
+            for ruta in (self._ruta_estado(otro['id']), self.ruta_artefacto(otro['id'], otro['extension'])):
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
@@ -0,0 +1,124 @@
+import os
+import time
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+from sqlalchemy import event
+
+
+# ==============================
+# Métricas Prometheus (/metrics)
+# ==============================
+# Colectores de prometheus_client en memoria del proceso. Con gunicorn y
+# varios workers se define PROMETHEUS_MULTIPROC_DIR: cada proceso escribe sus
+# valores en archivos de ese directorio y /metrics los agrega (ver
+# gunicorn.conf.py, que limpia el directorio al arrancar y marca los workers
+# que terminan).
+
+DURACION = Histogram(
+    'http_request_duration_seconds', 'Duración de las peticiones HTTP',
+    ['endpoint', 'method'],
+)
+PETICIONES = Counter(
+    'http_requests_total', 'Peticiones HTTP por código de estado',
+    ['endpoint', 'method', 'status'],
+)
+EN_CURSO = Gauge(
+    'http_requests_in_flight', 'Peticiones HTTP en proceso',
+    multiprocess_mode='livesum',
+)
+POOL_EN_USO = Gauge(
+    'db_pool_checked_out', 'Conexiones del pool prestadas',
+    multiprocess_mode='livesum',
+)
+POOL_OVERFLOW = Gauge(
+    'db_pool_overflow', 'Conexiones abiertas por encima de pool_size',
+    multiprocess_mode='livesum',
+)
+POOL_ESPERA = Histogram(
+    'db_pool_wait_seconds', 'Tiempo esperando una conexión del pool',
+    buckets=(.0005, .001, .005, .01, .05, .1, .5, 1, 5, 10, 30),
+)
+EXPORTACIONES = Histogram(
+    'export_job_duration_seconds', 'Duración de los trabajos de exportación',
+    ['tipo', 'estado'],
+    buckets=(.1, .5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+
+
+def registrar_exportacion(estado):
+    """Callback del JobRunner al terminar un trabajo."""
+    if estado.get('duracion') is not None:
+        EXPORTACIONES.labels(estado['tipo'], estado['estado']).observe(estado['duracion'])
+
+
+# --- pool de conexiones ---
+def _estado_pool(pool):
+    # NullPool / StaticPool (SQLite en memoria) no llevan contadores
+    if hasattr(pool, 'checkedout'):
+        POOL_EN_USO.set(pool.checkedout())
+    if hasattr(pool, 'overflow'):
+        POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+
+def _medir_espera(pool):
+    """Envuelve pool.connect para medir cuánto se espera una conexión libre."""
+    conectar = pool.connect
+
+    def connect():
+        inicio = time.perf_counter()
+        try:
+            return conectar()
+        finally:
+            POOL_ESPERA.observe(time.perf_counter() - inicio)
+
+    pool.connect = connect
+
+
+def _instrumentar_pool(engine):
+    pool = engine.pool
+    _medir_espera(pool)
+    event.listen(pool, 'checkout', lambda dbapi_conn, registro, proxy: _estado_pool(pool))
+    event.listen(pool, 'checkin', lambda dbapi_conn, registro: _estado_pool(pool))
+
+
+# --- peticiones ---
+def _inicio_peticion():
+    g.metricas_inicio = time.perf_counter()
+    EN_CURSO.inc()
+
+
+def _fin_peticion(response):
+    inicio = g.get('metricas_inicio')
+    if inicio is not None and request.endpoint != 'metricas_endpoint':
+        endpoint = request.endpoint or 'sin_ruta'
+        DURACION.labels(endpoint, request.method).observe(time.perf_counter() - inicio)
+        PETICIONES.labels(endpoint, request.method, str(response.status_code)).inc()
+    return response
+
+
+def _cierre_peticion(exc):
+    if g.pop('metricas_inicio', None) is not None:
+        EN_CURSO.dec()
+
+
+def exponer():
+    """Respuesta de /metrics: agrega todos los procesos si hay PROMETHEUS_MULTIPROC_DIR."""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), headers={'Content-Type': CONTENT_TYPE_LATEST})
+
+
+def init_app(app, engine):
+    app.before_request(_inicio_peticion)
+    app.after_request(_fin_peticion)
+    app.teardown_request(_cierre_peticion)
+
+    _instrumentar_pool(engine)
+    # engine.dispose() crea un pool nuevo: se vuelve a instrumentar
+    event.listen(engine, 'engine_disposed', _instrumentar_pool)
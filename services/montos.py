@@ -0,0 +1,15 @@
+from sqlalchemy import cast, func
+
+from models import db
+
+
+# ==============================
+# Montos enteros
+# ==============================
+# Los montos se guardan como BigInteger (pesos enteros). En PostgreSQL
+# sum(bigint) devuelve numeric y el driver lo entrega como Decimal; el CAST
+# deja el resultado como int en todos los motores y evita convertir en Python.
+
+def suma(expr):
+    """SUM(expr) exacto como BIGINT, 0 si no hay filas."""
+    return cast(func.coalesce(func.sum(expr), 0), db.BigInteger)
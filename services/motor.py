@@ -0,0 +1,77 @@
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+# ==============================
+# Configuración del engine
+# ==============================
+# Opciones del pool y de la conexión según el motor, tomadas del entorno.
+#
+# PostgreSQL (o cualquier motor de red):
+#   DB_POOL_SIZE (5), DB_MAX_OVERFLOW (10), DB_POOL_TIMEOUT (30 s),
+#   DB_POOL_RECYCLE (1800 s), DB_POOL_PRE_PING (1) y
+#   DB_STATEMENT_TIMEOUT_MS (30000; 0 lo desactiva).
+#
+# SQLite (archivo): WAL para que las lecturas no esperen a las escrituras,
+#   synchronous=NORMAL (seguro con WAL), DB_SQLITE_MMAP_MB (256),
+#   DB_SQLITE_CACHE_MB (64) y DB_SQLITE_BUSY_TIMEOUT_MS (5000).
+
+
+def _entero(nombre, defecto):
+    return int(os.getenv(nombre, str(defecto)))
+
+
+def es_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def opciones_engine(uri):
+    """Valor de SQLALCHEMY_ENGINE_OPTIONS para `uri`."""
+    if es_sqlite(uri):
+        # El pool por defecto de SQLite (QueuePool en archivo, SingletonThreadPool
+        # en memoria) ya sirve; solo se ajusta la espera por bloqueo.
+        return {'connect_args': {'timeout': _entero('DB_SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000}}
+    return {
+        'pool_size': _entero('DB_POOL_SIZE', 5),
+        'max_overflow': _entero('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': _entero('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _entero('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', '1') == '1',
+    }
+
+
+def _pragmas_sqlite(dbapi_conn, registro):
+    cursor = dbapi_conn.cursor()
+    try:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f"PRAGMA mmap_size={_entero('DB_SQLITE_MMAP_MB', 256) * 1024 * 1024}")
+        cursor.execute(f"PRAGMA cache_size={-_entero('DB_SQLITE_CACHE_MB', 64) * 1024}")  # negativo = KiB
+        cursor.execute(f"PRAGMA busy_timeout={_entero('DB_SQLITE_BUSY_TIMEOUT_MS', 5000)}")
+    finally:
+        cursor.close()
+
+
+def _timeout_postgres(dbapi_conn, registro):
+    # Se hace en el evento connect y no con connect_args['options'] porque los
+    # poolers (pgbouncer / Supavisor) no aceptan parámetros de arranque.
+    timeout = _entero('DB_STATEMENT_TIMEOUT_MS', 30000)
+    if timeout <= 0:
+        return
+    cursor = dbapi_conn.cursor()
+    try:
+        cursor.execute(f'SET statement_timeout = {timeout}')
+    finally:
+        cursor.close()
+    # Sin commit, el rollback del pool al devolver la conexión deshace el SET
+    dbapi_conn.commit()
+
+
+def configurar_engine(engine):
+    """Registra la configuración por conexión (pragmas / statement_timeout)."""
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', _pragmas_sqlite)
+    elif engine.dialect.name == 'postgresql':
+        event.listen(engine, 'connect', _timeout_postgres)
@@ -0,0 +1,138 @@
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import bindparam, case, insert, update
+
+from models import db
+from models.move import Movimiento, DetalleMovimiento, Abono
+from services.balances import actualizar_balances
+from services.rollups import acumular, inicio_de_mes
+
+TIPOS = ('ingreso', 'gasto', 'pago')
+
+
+# ==============================
+# Alta masiva de movimientos
+# ==============================
+# Inserta movimientos, repartos y abonos iniciales con executemany
+# (INSERT ... RETURNING) en lugar de un flush por fila. No hace commit: el
+# llamador confirma todo junto, de modo que un error no deja movimientos a
+# medio escribir.
+
+def _insertar_con_ids(modelo, filas):
+    """executemany con RETURNING id; devuelve los ids en el orden de `filas`."""
+    if not filas:
+        return []
+    if db.session.get_bind().dialect.name == 'sqlite':
+        # Con sort_by_parameter_order SQLAlchemy inserta fila por fila en
+        # SQLite. SQLite serializa las escrituras y asigna rowids crecientes
+        # dentro de una sentencia, así que basta con ordenar los ids.
+        return sorted(db.session.scalars(insert(modelo).returning(modelo.id), filas).all())
+    return db.session.scalars(
+        insert(modelo).returning(modelo.id, sort_by_parameter_order=True), filas
+    ).all()
+
+
+def insertar_movimientos(filas):
+    """Inserta dicts de Movimiento y devuelve sus ids en el mismo orden."""
+    return _insertar_con_ids(Movimiento, filas)
+
+
+def insertar_detalles(filas):
+    """Inserta repartos con su abono inicial.
+
+    Cada fila trae movimiento_id, persona_id, monto, abonado, pago_todo y
+    fecha (date del movimiento). falta y estado se calculan aquí igual que en
+    el formulario. Devuelve (ids de detalle, cantidad de abonos).
+    """
+    if not filas:
+        return [], 0
+    detalles = [
+        {
+            'movimiento_id': f['movimiento_id'],
+            'persona_id': f['persona_id'],
+            'monto': f['monto'],
+            'abonado': f['abonado'],
+            'falta': max(f['monto'] - f['abonado'], 0),
+            'estado': 'Pagado' if f['monto'] - f['abonado'] <= 0 else 'Debe',
+            'pago_todo': bool(f.get('pago_todo')),
+        }
+        for f in filas
+    ]
+    ids = _insertar_con_ids(DetalleMovimiento, detalles)
+
+    abonos = [
+        {'detalle_id': detalle_id, 'monto': f['abonado'], 'fecha': datetime.combine(f['fecha'], datetime.min.time())}
+        for detalle_id, f in zip(ids, filas)
+        if f['abonado'] > 0
+    ]
+    if abonos:
+        db.session.execute(insert(Abono), abonos)
+    return ids, len(abonos)
+
+
+def ajustar_abonado(cambios):
+    """Suma a cada reparto ({detalle_id: delta}) y recalcula falta / estado.
+
+    Un UPDATE abonado = abonado + :delta (executemany) en lugar de escribir
+    el valor leído antes: dos escrituras sobre el mismo reparto no se pisan.
+    abonado no baja de 0. No hace commit; las instancias ya cargadas de esos
+    repartos quedan desactualizadas hasta el commit.
+    """
+    if not cambios:
+        return
+    t = DetalleMovimiento.__table__
+    nuevo = t.c.abonado + bindparam('delta')
+    abonado = case((nuevo > 0, nuevo), else_=0)
+    db.session.execute(
+        update(t).where(t.c.id == bindparam('detalle_id')).values(
+            abonado=abonado,
+            falta=case((t.c.monto > abonado, t.c.monto - abonado), else_=0),
+            estado=case((t.c.monto > abonado, 'Debe'), else_='Pagado'),
+        ),
+        [{'detalle_id': detalle_id, 'delta': delta} for detalle_id, delta in cambios.items()],
+    )
+
+
+def acumular_movimientos(user_id, filas):
+    """Suma los movimientos nuevos a movimiento_mensual, un upsert por grupo."""
+    grupos = defaultdict(lambda: [0, 0])
+    for f in filas:
+        g = grupos[(inicio_de_mes(f['fecha']), f['tipo'], f['categoria'])]
+        g[0] += f['monto']
+        g[1] += 1
+    for (mes, tipo, categoria), (total, cantidad) in grupos.items():
+        acumular(user_id, mes, tipo, categoria, total, cantidad=cantidad)
+
+
+def crear_movimientos(user_id, movimientos):
+    """Crea varios movimientos con sus repartos en la transacción actual.
+
+    `movimientos` es una lista de dicts ya validados: tipo, categoria,
+    descripcion, monto, fecha (date) y detalles = [{persona_id, monto,
+    abonado, pago_todo}]. Actualiza acumulados y balances; no hace commit.
+    Devuelve los ids de los movimientos creados.
+    """
+    filas = [
+        {
+            'user_id': user_id,
+            'tipo': m['tipo'],
+            'categoria': m['categoria'],
+            'descripcion': m.get('descripcion') or '',
+            'monto': m['monto'],
+            'fecha': m['fecha'],
+        }
+        for m in movimientos
+    ]
+    ids = insertar_movimientos(filas)
+
+    detalles = [
+        dict(d, movimiento_id=mov_id, fecha=m['fecha'])
+        for mov_id, m in zip(ids, movimientos)
+        for d in m.get('detalles', ())
+    ]
+    insertar_detalles(detalles)
+
+    acumular_movimientos(user_id, filas)
+    actualizar_balances(user_id, [d['persona_id'] for d in detalles])
+    return ids
@@ -0,0 +1,68 @@
+import numpy as np
+
+
+# ==============================
+# Reducción de series para gráficas (LTTB)
+# ==============================
+# Largest-Triangle-Three-Buckets: divide la serie en tantos buckets como
+# puntos se pidan y en cada uno conserva el punto que forma el triángulo de
+# mayor área con el elegido en el bucket anterior y el promedio del
+# siguiente. Mantiene picos y valles, a diferencia de promediar o tomar uno
+# de cada N.
+#
+# Varias series que comparten el eje X (ingresos y gastos) se reducen juntas:
+# el área de cada candidato es la suma de sus áreas en cada serie, ya
+# normalizadas, así las series siguen alineadas a las mismas etiquetas.
+
+
+def _normalizar(y):
+    minimo = y.min(axis=0)
+    rango = y.max(axis=0) - minimo
+    rango[rango == 0] = 1
+    return (y - minimo) / rango
+
+
+def lttb_indices(series, puntos):
+    """Índices (ordenados) de los `puntos` que conserva LTTB.
+
+    `series` es una lista de secuencias del mismo largo. Si ya caben en el
+    presupuesto devuelve todos los índices.
+    """
+    y = np.column_stack([np.asarray(s, dtype=np.float64) for s in series])
+    n = len(y)
+    if puntos >= n or puntos < 3:
+        return np.arange(n)
+
+    y = _normalizar(y)
+    x = np.arange(n, dtype=np.float64)
+    # puntos - 2 buckets para los puntos interiores; el primero y el último se conservan
+    bordes = np.linspace(1, n - 1, puntos - 1).astype(np.int64)
+    # Promedio de cada bucket (el "siguiente" del anterior); al final, el último punto
+    centros_x = np.append(np.add.reduceat(x[1:n - 1], bordes[:-1] - 1) / np.diff(bordes), x[-1])
+    centros_y = np.vstack([np.add.reduceat(y[1:n - 1], bordes[:-1] - 1, axis=0) / np.diff(bordes)[:, None], y[-1]])
+
+    elegidos = np.empty(puntos, dtype=np.int64)
+    elegidos[0], elegidos[-1] = 0, n - 1
+    a = 0
+    for i in range(puntos - 2):
+        ini, fin = bordes[i], bordes[i + 1]
+        cx, cy = centros_x[i + 1], centros_y[i + 1]
+        ax, ay = x[a], y[a]
+        areas = np.abs((ax - cx) * (y[ini:fin] - ay) - (ax - x[ini:fin])[:, None] * (cy - ay)).sum(axis=1)
+        a = ini + int(np.argmax(areas))
+        elegidos[i + 1] = a
+    return elegidos
+
+
+def reducir_serie(serie, puntos, campos=('ingresos', 'gastos')):
+    """Aplica LTTB a una serie {'labels': [...], campo: [...]} del dashboard.
+
+    Devuelve un dict nuevo con las mismas claves más 'total_puntos' (largo
+    original); no modifica `serie` (puede venir de la caché).
+    """
+    total = len(serie['labels'])
+    if total <= puntos:
+        return dict(serie, total_puntos=total)
+    indices = lttb_indices([serie[c] for c in campos], puntos).tolist()
+    reducida = {c: [serie[c][i] for i in indices] for c in campos}
+    return dict(serie, labels=[serie['labels'][i] for i in indices], total_puntos=total, **reducida)
@@ -0,0 +1,92 @@
+import base64
+import json
+from datetime import date
+
+from sqlalchemy import and_, or_
+
+
+# ==============================
+# Paginación por cursor (keyset)
+# ==============================
+# Ordena por (fecha DESC, id DESC) y filtra a partir de la última fila vista,
+# en lugar de OFFSET/LIMIT + COUNT(*). El costo de una página no depende de
+# qué tan profunda sea.
+
+
+def codificar_cursor(fecha, id_):
+    """Cursor opaco para la posición (fecha, id)."""
+    crudo = json.dumps([fecha.isoformat(), id_], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(crudo).rstrip(b'=').decode()
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (fecha, id) o None si el cursor no es válido."""
+    if not cursor:
+        return None
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        fecha, id_ = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return date.fromisoformat(fecha), int(id_)
+    except Exception:
+        return None
+
+
+class PaginaKeyset:
+    """Resultado de una página: filas y cursores para la anterior / siguiente."""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def paginar_keyset(query, col_fecha, col_id, clave, despues=None, antes=None, per_page=10):
+    """Aplica paginación keyset descendente sobre (col_fecha, col_id).
+
+    - `clave(fila)` devuelve la tupla (fecha, id) de una fila del resultado.
+    - `despues` / `antes` son cursores opacos (ver `codificar_cursor`); sin
+      ninguno se devuelve la primera página.
+
+    Se pide una fila de más para saber si hay otra página, sin COUNT(*).
+    """
+    pos_despues = decodificar_cursor(despues)
+    pos_antes = decodificar_cursor(antes) if pos_despues is None else None
+
+    if pos_antes is not None:
+        fecha, id_ = pos_antes
+        filas = query.filter(or_(
+            col_fecha > fecha,
+            and_(col_fecha == fecha, col_id > id_),
+        )).order_by(col_fecha.asc(), col_id.asc()).limit(per_page + 1).all()
+
+        hay_mas = len(filas) > per_page
+        items = list(reversed(filas[:per_page]))
+        return PaginaKeyset(
+            items,
+            next_cursor=codificar_cursor(*clave(items[-1])) if items else None,
+            prev_cursor=codificar_cursor(*clave(items[0])) if hay_mas and items else None,
+        )
+
+    if pos_despues is not None:
+        fecha, id_ = pos_despues
+        query = query.filter(or_(
+            col_fecha < fecha,
+            and_(col_fecha == fecha, col_id < id_),
+        ))
+
+    filas = query.order_by(col_fecha.desc(), col_id.desc()).limit(per_page + 1).all()
+    hay_mas = len(filas) > per_page
+    items = filas[:per_page]
+    return PaginaKeyset(
+        items,
+        next_cursor=codificar_cursor(*clave(items[-1])) if hay_mas else None,
+        prev_cursor=codificar_cursor(*clave(items[0])) if pos_despues is not None and items else None,
+    )
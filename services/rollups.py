@@ -0,0 +1,103 @@
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db
+from models.move import Movimiento, MovimientoMensual
+from models.users import User
+from services.dashboard import periodo_expr
+from services.montos import suma
+
+
+# ==============================
+# Acumulados mensuales (movimiento_mensual)
+# ==============================
+
+def inicio_de_mes(fecha):
+    return fecha.replace(day=1)
+
+
+def _upsert(valores):
+    """INSERT ... ON CONFLICT DO UPDATE sumando total y cantidad."""
+    dialecto = db.session.get_bind().dialect.name
+    if dialecto == 'postgresql':
+        stmt = postgresql.insert(MovimientoMensual).values(valores)
+    elif dialecto == 'sqlite':
+        stmt = sqlite.insert(MovimientoMensual).values(valores)
+    else:
+        fila = db.session.get(MovimientoMensual, (valores['user_id'], valores['mes'], valores['tipo'], valores['categoria']))
+        if fila is None:
+            db.session.add(MovimientoMensual(**valores))
+        else:
+            fila.total += valores['total']
+            fila.cantidad += valores['cantidad']
+        return
+
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'mes', 'tipo', 'categoria'],
+        set_={
+            'total': MovimientoMensual.total + stmt.excluded.total,
+            'cantidad': MovimientoMensual.cantidad + stmt.excluded.cantidad,
+        },
+    )
+    db.session.execute(stmt)
+
+
+def acumular(user_id, fecha, tipo, categoria, monto, cantidad=1):
+    """Suma (o resta, con valores negativos) un importe al acumulado de su mes."""
+    mes = inicio_de_mes(fecha)
+    _upsert({
+        'user_id': user_id,
+        'mes': mes,
+        'tipo': tipo,
+        'categoria': categoria,
+        'total': monto,
+        'cantidad': cantidad,
+    })
+    if cantidad < 0:
+        MovimientoMensual.query.filter(
+            MovimientoMensual.user_id == user_id,
+            MovimientoMensual.mes == mes,
+            MovimientoMensual.tipo == tipo,
+            MovimientoMensual.categoria == categoria,
+            MovimientoMensual.cantidad <= 0,
+        ).delete(synchronize_session=False)
+
+
+def registrar_movimiento(mov):
+    """Agrega un movimiento nuevo a los acumulados (misma transacción)."""
+    acumular(mov.user_id, mov.fecha, mov.tipo, mov.categoria, mov.monto)
+
+
+def descontar_movimiento(mov):
+    """Quita un movimiento que se va a eliminar de los acumulados."""
+    acumular(mov.user_id, mov.fecha, mov.tipo, mov.categoria, -mov.monto, cantidad=-1)
+
+
+def reconstruir_rollups(user_id=None):
+    """Borra y regenera movimiento_mensual a partir de la tabla movimiento."""
+    borrar = MovimientoMensual.query
+    usuarios = db.session.query(User.id)
+    if user_id is not None:
+        borrar = borrar.filter(MovimientoMensual.user_id == user_id)
+        usuarios = usuarios.filter(User.id == user_id)
+    borrar.delete(synchronize_session=False)
+
+    mes = periodo_expr('mes').label('mes')
+    total = 0
+    for (uid,) in usuarios.all():
+        filas = db.session.query(
+            mes,
+            Movimiento.tipo,
+            Movimiento.categoria,
+            suma(Movimiento.monto),
+            func.count(Movimiento.id),
+        ).filter(
+            Movimiento.user_id == uid,
+        ).group_by(mes, Movimiento.tipo, Movimiento.categoria).all()
+
+        db.session.bulk_insert_mappings(MovimientoMensual, [
+            {'user_id': uid, 'mes': m, 'tipo': tipo, 'categoria': categoria, 'total': total, 'cantidad': n}
+            for m, tipo, categoria, total, n in filas
+        ])
+        total += len(filas)
+    return total
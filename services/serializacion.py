@@ -0,0 +1,20 @@
+import orjson
+from flask import Response
+
+
+# ==============================
+# Respuestas JSON de la API de lectura
+# ==============================
+# orjson serializa varias veces más rápido que json y entiende date /
+# datetime (ISO 8601) sin conversión previa. Las listas largas se envían en
+# forma de tabla ({"columnas": [...], "filas": [[...], ...]}) para no repetir
+# los nombres de campo en cada fila.
+
+
+def respuesta_json(datos, status=200):
+    return Response(orjson.dumps(datos), status=status, mimetype='application/json')
+
+
+def tabla(columnas, filas):
+    """{"columnas": columnas, "filas": [[valor, ...], ...]} a partir de dicts."""
+    return {'columnas': list(columnas), 'filas': [[f[c] for c in columnas] for f in filas]}
@@ -1,8 +1,90 @@
-document.addEventListener("DOMContentLoaded", () => {
+// El dashboard llega vacío: cada panel se pide por separado y en paralelo
+// (/api/v1/summary, /api/v1/deudas, /api/v1/series y /dashboard/table), así
+// un panel lento no bloquea al resto.
+
+function moneda(valor) {
+  return '$' + Math.round(valor || 0).toLocaleString('en-US');
+}
+
+function pedirJSON(url) {
+  return fetch(url, { headers: { 'Accept': 'application/json' } }).then(res => {
+    if (!res.ok) throw new Error(res.status);
+    return res.json();
+  });
+}
+
+function errorPanel(contenedor) {
+  return err => {
+    console.error('Error cargando panel:', err);
+    if (contenedor) contenedor.classList.add('opacity-50');
+  };
+}
+
+function cargarResumen() {
+  const panel = document.getElementById('panel-resumen');
+  if (!panel) return;
+  pedirJSON(panel.dataset.url).then(datos => {
+    document.querySelectorAll('[data-resumen]').forEach(el => {
+      el.textContent = moneda(datos[el.dataset.resumen]);
+    });
+  }).catch(errorPanel(panel));
+}
+
+function colorSigno(valor, positivo) {
+  if (valor > 0) return positivo;
+  if (valor < 0) return 'text-red-600';
+  return 'text-gray-500';
+}
+
+function cargarDeudas() {
+  const cuerpo = document.getElementById('panel-deudas');
+  if (!cuerpo) return;
+  pedirJSON(cuerpo.dataset.url).then(datos => {
+    const col = Object.fromEntries(datos.columnas.map((c, i) => [c, i]));
+    cuerpo.replaceChildren(...datos.filas.map(fila => {
+      const tr = document.createElement('tr');
+      tr.className = 'border-b border-gray-200 dark:border-gray-700 hover:bg-gray-50 dark:hover:bg-gray-700 transition';
+      const celdas = [
+        [fila[col.persona], ''],
+        [moneda(fila[col.debe]), ''],
+        [moneda(fila[col.pagado]), ''],
+        [moneda(fila[col.le_deben]), 'font-semibold ' + colorSigno(fila[col.le_deben], 'text-green-600')],
+        [moneda(fila[col.saldo_favor]), 'font-semibold ' + colorSigno(fila[col.saldo_favor], 'text-blue-600')],
+        [moneda(fila[col.balance]), 'font-semibold ' + colorSigno(fila[col.balance], 'text-green-600')],
+      ];
+      celdas.forEach(([texto, clase]) => {
+        const td = document.createElement('td');
+        td.className = ('px-3 py-2 text-center ' + clase).trim();
+        td.textContent = texto;
+        tr.appendChild(td);
+      });
+      return tr;
+    }));
+  }).catch(errorPanel(cuerpo));
+}
+
+function cargarTabla() {
+  const contenedor = document.getElementById('tabla-movimientos');
+  if (!contenedor || !contenedor.dataset.url) return;
+  fetch(contenedor.dataset.url)
+    .then(res => res.text())
+    .then(html => { contenedor.innerHTML = html; })
+    .catch(errorPanel(contenedor));
+}
+
+function cargarGraficas() {
   const ctx1 = document.getElementById('chartIngresosGastos');
   const ctx2 = document.getElementById('chartCategorias');
+  if (!ctx1) return;
+
+  // Un punto por píxel basta: el servidor reduce la serie (LTTB) a ese presupuesto
+  const url = new URL(ctx1.dataset.url, window.location.origin);
+  url.searchParams.set('puntos', Math.max(ctx1.clientWidth || 0, 100));
+
+  pedirJSON(url).then(datos => {
+    const ingresosGastosData = datos.ingresos_gastos;
+    const categoriasData = datos.categorias;
 
-  if (ctx1 && ingresosGastosData) {
     new Chart(ctx1, {
       type: 'line',
       data: {
@@ -26,21 +108,28 @@ document.addEventListener("DOMContentLoaded", () => {
       },
       options: { responsive: true, plugins: { legend: { position: 'top' } } }
     });
-  }
 
-  if (ctx2 && categoriasData) {
-    new Chart(ctx2, {
-      type: 'doughnut',
-      data: {
-        labels: categoriasData.labels,
-        datasets: [{
-          data: categoriasData.valores,
-          backgroundColor: ['#60a5fa', '#34d399', '#fbbf24', '#f87171', '#a78bfa']
-        }]
-      },
-      options: { responsive: true, plugins: { legend: { position: 'bottom' } } }
-    });
-  }
+    if (ctx2) {
+      new Chart(ctx2, {
+        type: 'doughnut',
+        data: {
+          labels: categoriasData.labels,
+          datasets: [{
+            data: categoriasData.valores,
+            backgroundColor: ['#60a5fa', '#34d399', '#fbbf24', '#f87171', '#a78bfa']
+          }]
+        },
+        options: { responsive: true, plugins: { legend: { position: 'bottom' } } }
+      });
+    }
+  }).catch(errorPanel(ctx1));
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+  cargarResumen();
+  cargarTabla();
+  cargarDeudas();
+  cargarGraficas();
 });
 
 
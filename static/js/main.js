@@ -185,3 +185,34 @@ async function toggleDetalle(detalleId, btn) {
     console.error(e);
   }
 }
+
+
+// Exportaciones en segundo plano: encola el trabajo, consulta el estado y descarga al terminar
+document.addEventListener('click', async (e) => {
+  const link = e.target.closest('a.export-job');
+  if (!link || link.dataset.enCurso) return;
+  e.preventDefault();
+
+  const textoOriginal = link.textContent;
+  link.dataset.enCurso = '1';
+  try {
+    let resp = await fetch(link.href, { headers: { 'Accept': 'application/json' } });
+    let job = await resp.json();
+    while (job.estado === 'pendiente' || job.estado === 'procesando') {
+      link.textContent = `Generando… ${Math.round(job.progreso || 0)}%`;
+      await new Promise(r => setTimeout(r, 1000));
+      resp = await fetch(job.estado_url, { headers: { 'Accept': 'application/json' } });
+      job = await resp.json();
+    }
+    if (job.estado === 'listo') {
+      window.location.href = job.descarga_url;
+    } else {
+      alert('No se pudo generar la exportación' + (job.error ? `: ${job.error}` : ''));
+    }
+  } catch (err) {
+    console.error(err);
+  } finally {
+    link.textContent = textoOriginal;
+    delete link.dataset.enCurso;
+  }
+});
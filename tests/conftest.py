@@ -0,0 +1,106 @@
+import itertools
+import os
+import re
+import tempfile
+
+import pytest
+
+# create_app() lee el entorno al importar app: se fija antes de importarla.
+# TEST_DATABASE_URL permite correr las pruebas contra PostgreSQL.
+_directorio = tempfile.mkdtemp(prefix='tests-')
+os.environ['DATABASE_URL'] = os.getenv('TEST_DATABASE_URL') or 'sqlite:///' + os.path.join(_directorio, 'tests.db')
+os.environ['CACHE_BACKEND'] = 'ninguno'
+os.environ['EXPORTS_DIR'] = os.path.join(_directorio, 'exports')
+os.environ.pop('METRICS_TOKEN', None)
+
+from app import app as aplicacion, db  # noqa: E402
+from models.move import Movimiento, DetalleMovimiento  # noqa: E402
+from models.users import User, Person  # noqa: E402
+
+_usuarios = itertools.count(1)
+
+
+@pytest.fixture(scope='session')
+def app():
+    aplicacion.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with aplicacion.app_context():
+        db.create_all()
+    return aplicacion
+
+
+def _nuevo_usuario():
+    u = User(username=f'prueba-{os.getpid()}-{next(_usuarios)}', password='x')
+    db.session.add(u)
+    db.session.commit()
+    return u.id
+
+
+def _cliente_de(app, user_id):
+    cliente = app.test_client()
+    with cliente.session_transaction() as s:
+        s['_user_id'] = str(user_id)
+        s['_fresh'] = True
+    return cliente
+
+
+@pytest.fixture
+def usuario(app):
+    """Id de un usuario nuevo; los datos de cada prueba quedan aislados por usuario."""
+    with app.app_context():
+        return _nuevo_usuario()
+
+
+@pytest.fixture
+def cliente(app, usuario):
+    return _cliente_de(app, usuario)
+
+
+@pytest.fixture
+def cliente_ajeno(app):
+    """Sesión de otro usuario, para comprobar que no ve ni modifica los datos de `usuario`."""
+    with app.app_context():
+        return _cliente_de(app, _nuevo_usuario())
+
+
+@pytest.fixture
+def crear_personas(app, cliente, usuario):
+    """crear_personas('Ana', 'Beto') -> ids, por el formulario de /personas."""
+    def crear(*nombres):
+        for nombre in nombres:
+            cliente.post('/personas', data={'name': nombre})
+        with app.app_context():
+            ids = dict(db.session.query(Person.name, Person.id).filter_by(user_id=usuario))
+        return [ids[n] for n in nombres]
+    return crear
+
+
+@pytest.fixture
+def crear_movimiento(app, cliente, usuario):
+    """Movimiento que paga `pagador` con el reparto {persona_id: monto}; devuelve su id."""
+    def crear(pagador, repartos, fecha='2025-01-01', descripcion='prueba'):
+        datos = {
+            'tipo': 'gasto', 'categoria': 'casa', 'descripcion': descripcion, 'fecha': fecha,
+            'monto': str(sum(repartos.values())),
+            f'pago_{pagador}': '1', f'abonado_{pagador}': str(repartos[pagador]),
+        }
+        for persona_id, monto in repartos.items():
+            datos[f'monto_{persona_id}'] = str(monto)
+        r = cliente.post('/movimientos', data=datos)
+        assert r.status_code == 302
+        with app.app_context():
+            return db.session.query(Movimiento.id).filter_by(user_id=usuario, descripcion=descripcion).order_by(Movimiento.id.desc()).limit(1).scalar()
+    return crear
+
+
+@pytest.fixture
+def abonar(app, cliente):
+    """Abono al reparto de `persona_id` en el movimiento; devuelve el id del abono."""
+    def crear(mov_id, persona_id, monto, usar_saldo='no'):
+        with app.app_context():
+            detalle_id = db.session.query(DetalleMovimiento.id).filter_by(movimiento_id=mov_id, persona_id=persona_id).scalar()
+        r = cliente.post(f'/movimiento/{mov_id}/abonar', data={
+            'detalle_id': detalle_id, 'monto': str(monto), 'fecha': '2025-02-01T10:00', 'usar_saldo': usar_saldo,
+        })
+        assert r.status_code == 302
+        return int(re.search(r'abono_id=(\d+)', r.headers['Location']).group(1))
+    return crear
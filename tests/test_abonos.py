@@ -0,0 +1,14 @@
+from models import db
+from models.move import Abono
+
+
+def test_abono_de_otro_usuario_da_404(app, cliente_ajeno, crear_personas, crear_movimiento, abonar):
+    ana, beto = crear_personas('Ana', 'Beto')
+    mov = crear_movimiento(ana, {ana: 1000, beto: 2000})
+    abono = abonar(mov, beto, 500)
+
+    assert cliente_ajeno.post(f'/abono/{abono}/delete').status_code == 404
+    assert cliente_ajeno.post(f'/abono/{abono}/asignar-indirecto', data={'movimiento_id': '0', 'montoAcum': '0'}).status_code == 404
+    assert cliente_ajeno.post(f'/abono/{abono}/asignar-automatico', data={'estrategia': 'antiguos', 'simular': '1'}).status_code == 404
+    with app.app_context():
+        assert db.session.get(Abono, abono) is not None
@@ -0,0 +1,62 @@
+from datetime import date
+
+import pytest
+
+from services.asignacion import ESTRATEGIAS, planificar
+
+
+def _deuda(movimiento_id, falta, dia):
+    return {
+        'detalle_id': movimiento_id * 10, 'movimiento_id': movimiento_id, 'fecha': date(2025, 1, dia),
+        'categoria': 'casa', 'descripcion': '', 'monto': falta, 'abonado': 0, 'falta': falta,
+    }
+
+
+DEUDAS = [_deuda(1, 700, 1), _deuda(2, 333, 2), _deuda(3, 1000, 3), _deuda(4, 333, 4)]
+
+
+def _aplicado(plan):
+    return {p['movimiento_id']: p['aplicar'] for p in plan}
+
+
+@pytest.mark.parametrize('estrategia', ESTRATEGIAS)
+@pytest.mark.parametrize('disponible', [1, 100, 999, 1001, 2366, 5000])
+def test_total_y_tope_por_deuda(estrategia, disponible):
+    plan = planificar(disponible, DEUDAS, estrategia)
+    faltas = {d['movimiento_id']: d['falta'] for d in DEUDAS}
+
+    assert sum(p['aplicar'] for p in plan) == min(disponible, sum(faltas.values()))
+    assert all(0 < p['aplicar'] <= faltas[p['movimiento_id']] for p in plan)
+
+
+def test_no_modifica_las_deudas():
+    copia = [dict(d) for d in DEUDAS]
+    planificar(1000, DEUDAS, 'proporcional')
+    assert DEUDAS == copia
+
+
+def test_antiguos_y_mayores():
+    assert _aplicado(planificar(1200, DEUDAS, 'antiguos')) == {1: 700, 2: 333, 3: 167}
+    # Empates de falta (333) por fecha
+    assert _aplicado(planificar(1500, DEUDAS, 'mayores')) == {3: 1000, 1: 500}
+    assert [p['movimiento_id'] for p in planificar(2200, DEUDAS, 'mayores')] == [3, 1, 2, 4]
+
+
+def test_proporcional_reparte_sobrantes_por_mayor_residuo():
+    # 100 * falta / 2366: 29.58, 14.07, 42.26, 14.07 -> cocientes 29+14+42+14 = 99;
+    # el peso que sobra va al mayor residuo (movimiento 1)
+    assert _aplicado(planificar(100, DEUDAS, 'proporcional')) == {1: 30, 2: 14, 3: 42, 4: 14}
+
+
+def test_proporcional_empates_en_orden_fijo():
+    iguales = [_deuda(i, 100, i) for i in range(1, 4)]
+    # 200 / 3 por deuda: residuos iguales, los pesos van a las primeras deudas
+    assert _aplicado(planificar(200, iguales, 'proporcional')) == {1: 67, 2: 67, 3: 66}
+    assert _aplicado(planificar(1, iguales, 'proporcional')) == {1: 1}
+
+
+def test_sin_disponible_o_sin_deudas():
+    assert planificar(0, DEUDAS, 'antiguos') == []
+    assert planificar(500, [], 'proporcional') == []
+    with pytest.raises(ValueError):
+        planificar(500, DEUDAS, 'otra')
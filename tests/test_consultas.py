@@ -0,0 +1,13 @@
+import verificar_consultas
+from models import db
+
+
+def test_ninguna_ruta_escala_con_los_datos(app, monkeypatch):
+    chico, grande = verificar_consultas.CHICO, verificar_consultas.GRANDE
+    prefijos = [verificar_consultas.prefijo_usuario(t) for t in (chico, grande)]
+    monkeypatch.setenv('ADMIN_USERS', ','.join(f'{p}0' for p in prefijos))
+
+    _, filas, errores = verificar_consultas.comparar(app, db, chico, grande)
+
+    assert filas
+    assert errores == []
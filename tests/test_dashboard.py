@@ -0,0 +1,11 @@
+def test_etiquetas_por_dia_y_semana_incluyen_el_anio(cliente, crear_personas, crear_movimiento):
+    ana, beto = crear_personas('Ana', 'Beto')
+    crear_movimiento(ana, {ana: 1000, beto: 1000}, fecha='2024-01-03', descripcion='2024')
+    crear_movimiento(ana, {ana: 2000, beto: 2000}, fecha='2025-01-03', descripcion='2025')
+
+    dias = cliente.get('/api/v1/series?agrupar=dia&rango=todo').get_json()['ingresos_gastos']
+    assert dias['labels'] == ['03/01/2024', '03/01/2025']
+    assert dias['gastos'] == [2000, 4000]
+
+    semanas = cliente.get('/api/v1/series?agrupar=semana&rango=todo').get_json()['ingresos_gastos']
+    assert semanas['labels'] == ['01/01/2024', '30/12/2024']
@@ -0,0 +1,60 @@
+from models import db
+from models.move import DetalleMovimiento
+
+
+def _deudas(cliente, persona_id):
+    """{movimiento_id: falta} del selector de movimiento destino."""
+    datos = cliente.get(f'/api/v1/personas/{persona_id}/deudas-abiertas').get_json()
+    i_mov, i_falta = datos['columnas'].index('movimiento_id'), datos['columnas'].index('falta')
+    return {fila[i_mov]: fila[i_falta] for fila in datos['filas']}
+
+
+def _reparto(app, mov_id, persona_id):
+    with app.app_context():
+        d = db.session.query(DetalleMovimiento).filter_by(movimiento_id=mov_id, persona_id=persona_id).one()
+        return d.abonado, d.falta, d.estado
+
+
+def test_borrar_abono_vuelve_a_abrir_la_deuda(app, cliente, crear_personas, crear_movimiento, abonar):
+    ana, beto = crear_personas('Ana', 'Beto')
+    mov = crear_movimiento(ana, {ana: 1000, beto: 2000})
+    assert _deudas(cliente, beto) == {mov: 2000}
+
+    abono = abonar(mov, beto, 2000)
+    assert _reparto(app, mov, beto) == (2000, 0, 'Pagado')
+    assert _deudas(cliente, beto) == {}
+
+    assert cliente.post(f'/abono/{abono}/delete').status_code == 302
+    assert _reparto(app, mov, beto) == (0, 2000, 'Debe')
+    assert _deudas(cliente, beto) == {mov: 2000}
+
+
+def test_borrar_abono_parcial(app, cliente, crear_personas, crear_movimiento, abonar):
+    ana, beto = crear_personas('Ana', 'Beto')
+    mov = crear_movimiento(ana, {ana: 1000, beto: 2000})
+    abonar(mov, beto, 500)
+    segundo = abonar(mov, beto, 1500)
+    assert _deudas(cliente, beto) == {}
+
+    cliente.post(f'/abono/{segundo}/delete')
+    assert _reparto(app, mov, beto) == (500, 1500, 'Debe')
+    assert _deudas(cliente, beto) == {mov: 1500}
+
+
+def test_deuda_reabierta_recibe_asignacion_automatica(app, cliente, crear_personas, crear_movimiento, abonar):
+    # Beto paga un movimiento y Caro le abona; lo abonado se reparte entre las
+    # deudas abiertas de Beto, incluida la que se reabrió al borrar un abono.
+    ana, beto, caro = crear_personas('Ana', 'Beto', 'Caro')
+    deuda = crear_movimiento(ana, {ana: 1000, beto: 800}, fecha='2025-01-01', descripcion='deuda')
+    pago = abonar(deuda, beto, 800)
+    cliente.post(f'/abono/{pago}/delete')
+
+    origen = crear_movimiento(beto, {beto: 1000, caro: 1000}, fecha='2025-01-05', descripcion='origen')
+    abono = abonar(origen, caro, 1000)
+    plan = cliente.post(f'/abono/{abono}/asignar-automatico', data={'estrategia': 'antiguos', 'simular': '1'}).get_json()
+    assert plan['asignado'] == 800
+    assert plan['sobrante'] == 200
+
+    cliente.post(f'/abono/{abono}/asignar-automatico', data={'estrategia': 'antiguos', 'sobrante': 'saldo'})
+    assert _reparto(app, deuda, beto) == (800, 0, 'Pagado')
+    assert _deudas(cliente, beto) == {}
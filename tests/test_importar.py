@@ -0,0 +1,41 @@
+import io
+
+from models.move import Movimiento, DetalleMovimiento
+from services.importar import importar_movimientos
+
+ENCABEZADO = 'ref,fecha,tipo,categoria,descripcion,monto,persona,monto_persona,abonado,pago_todo\n'
+
+
+def _importar(app, usuario, filas, tamano):
+    archivo = io.BytesIO((ENCABEZADO + ''.join(f + '\n' for f in filas)).encode())
+    with app.app_context():
+        return importar_movimientos(usuario, archivo, 'movimientos.csv', tamano=tamano)
+
+
+def test_monto_vacio_es_error(app, usuario):
+    resultado = _importar(app, usuario, [',2024-01-01,gasto,comida,,,,,,'], tamano=10)
+
+    assert resultado.movimientos == 0
+    assert resultado.errores == [(2, 'Monto vacío')]
+    with app.app_context():
+        assert Movimiento.query.filter_by(user_id=usuario).count() == 0
+
+
+def test_movimiento_repartido_entre_bloques(app, usuario, crear_personas):
+    ana, beto, caro = crear_personas('Ana', 'Beto', 'Caro')
+    resultado = _importar(app, usuario, [
+        'A,2024-01-01,gasto,casa,arriendo,3000,Ana,1000,1000,si',
+        'A,2024-01-01,gasto,casa,arriendo,3000,Beto,1000,,',
+        # Segundo bloque: sigue el movimiento A y una fila sin monto
+        'A,2024-01-01,gasto,casa,arriendo,3000,Caro,1000,200,',
+        'B,2024-01-02,gasto,comida,,,Ana,500,,',
+    ], tamano=2)
+
+    assert resultado.movimientos == 1
+    assert resultado.detalles == 3
+    assert resultado.errores == [(5, 'Monto vacío')]
+    with app.app_context():
+        (mov,) = Movimiento.query.filter_by(user_id=usuario).all()
+        assert mov.monto == 3000
+        repartos = {d.persona_id: (d.monto, d.abonado, d.falta) for d in DetalleMovimiento.query.filter_by(movimiento_id=mov.id)}
+    assert repartos == {ana: (1000, 1000, 0), beto: (1000, 0, 1000), caro: (1000, 200, 800)}
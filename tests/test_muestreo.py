@@ -0,0 +1,38 @@
+import math
+
+from services.muestreo import lttb_indices, reducir_serie
+
+
+def _serie(n):
+    ingresos = [round(1000 + 500 * math.sin(i / 7)) for i in range(n)]
+    gastos = [round(800 + 300 * math.cos(i / 11)) for i in range(n)]
+    return {'labels': [f'd{i}' for i in range(n)], 'ingresos': ingresos, 'gastos': gastos}
+
+
+def test_reduce_al_limite_y_conserva_extremos():
+    serie = _serie(1000)
+    reducida = reducir_serie(serie, 100)
+
+    assert reducida['total_puntos'] == 1000
+    for campo in ('labels', 'ingresos', 'gastos'):
+        assert len(reducida[campo]) == 100
+    assert reducida['labels'][0] == 'd0'
+    assert reducida['labels'][-1] == 'd999'
+    # Las series siguen alineadas a las mismas etiquetas
+    for etiqueta, ingreso in zip(reducida['labels'], reducida['ingresos']):
+        assert serie['ingresos'][int(etiqueta[1:])] == ingreso
+
+
+def test_conserva_un_pico_aislado():
+    serie = {'labels': list(range(500)), 'ingresos': [100] * 500, 'gastos': [50] * 500}
+    serie['ingresos'][321] = 100_000
+    assert 321 in reducir_serie(serie, 20)['labels']
+
+
+def test_serie_corta_sin_cambios():
+    serie = _serie(50)
+    reducida = reducir_serie(serie, 100)
+
+    assert reducida == dict(serie, total_puntos=50)
+    assert reducida is not serie
+    assert list(lttb_indices([serie['ingresos']], 50)) == list(range(50))
@@ -0,0 +1,46 @@
+from datetime import date
+
+import services.dashboard
+
+
+def _get(cliente, ruta, etag=None):
+    return cliente.get(ruta, headers={'If-None-Match': etag} if etag else {})
+
+
+def test_etag_cambia_con_cada_escritura(cliente, crear_personas):
+    crear_personas('Ana')
+    _get(cliente, '/saldo-favor')  # consume el flash de crear_personas
+    r = _get(cliente, '/saldo-favor')
+    assert r.status_code == 200
+    assert r.headers.get('Last-Modified') is None
+    etag = r.headers['ETag']
+
+    assert _get(cliente, '/saldo-favor', etag).status_code == 304
+
+    crear_personas('Beto')
+    _get(cliente, '/saldo-favor')
+    assert _get(cliente, '/saldo-favor', etag).status_code == 200
+
+
+def test_series_cambia_de_etag_con_el_mes(cliente, monkeypatch):
+    class Hoy(date):
+        dia = date(2025, 1, 31)
+
+        @classmethod
+        def today(cls):
+            return cls.dia
+
+    monkeypatch.setattr(services.dashboard, 'date', Hoy)
+    ruta = '/api/v1/series?agrupar=mes&rango=3'
+    etag = _get(cliente, ruta).headers['ETag']
+    assert _get(cliente, ruta, etag).status_code == 304
+
+    Hoy.dia = date(2025, 2, 1)
+    r = _get(cliente, ruta, etag)
+    assert r.status_code == 200
+    assert r.headers['ETag'] != etag
+
+    # Sin rango (todo el histórico) la fecha no cambia la respuesta
+    etag_todo = _get(cliente, '/api/v1/series?rango=todo').headers['ETag']
+    Hoy.dia = date(2025, 3, 1)
+    assert _get(cliente, '/api/v1/series?rango=todo', etag_todo).status_code == 304
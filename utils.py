@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
@@ -21,3 +22,16 @@ def export_to_pdf(movimientos, filename="reporte.pdf"):
 def import_from_csv(file):
     df = pd.read_csv(file)
     return df.to_dict(orient='records')
+
+def parse_amount_series(serie, default=0):
+    """Versión vectorizada de parse_amount para una columna de pandas.
+
+    Devuelve (montos, invalidos): montos enteros redondeados (default en
+    vacíos e inválidos) y una máscara con las celdas que no son numéricas.
+    """
+    s = serie.astype('string').str.strip().str.replace(',', '', regex=False)
+    vacio = s.isna() | (s == '')
+    numeros = pd.to_numeric(s.where(~vacio), errors='coerce').astype('float64')
+    invalidos = ~vacio & ~np.isfinite(numeros)
+    montos = numeros.where(~invalidos).round().fillna(default).astype('int64')
+    return montos, invalidos.astype(bool)
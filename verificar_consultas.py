@@ -0,0 +1,386 @@
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+# Control de regresiones N+1: llama todos los endpoints registrados en
+# create_app() con dos usuarios sintéticos de distinto tamaño y falla si el
+# número de consultas de alguna ruta crece con la cantidad de datos.
+#
+#   py verificar_consultas.py                       # SQLite temporal, 100 vs 1000 movimientos
+#   py verificar_consultas.py --chico 200 --grande 5000
+#   py verificar_consultas.py --database-url postgresql://localhost/consultas
+#
+# Termina con código 1 si una ruta escala con los datos, responde con error
+# o no tiene caso definido en CASOS (cada endpoint nuevo necesita el suyo).
+# tests/test_consultas.py corre lo mismo dentro de pytest.
+
+Caso = namedtuple('Caso', 'endpoint metodo ruta datos opciones')
+
+# Tamaño de un usuario sintético: volumen total (movimientos, personas) y
+# forma del movimiento medido (repartos deudores, abonos por reparto)
+Tamano = namedtuple('Tamano', 'movimientos personas repartos abonos')
+
+CHICO = Tamano(movimientos=100, personas=5, repartos=3, abonos=1)
+GRANDE = Tamano(movimientos=1000, personas=20, repartos=15, abonos=10)
+
+
+def caso(endpoint, metodo, ruta, datos=None, **opciones):
+    """`ruta` y los valores de `datos` se formatean con los ids del fixture."""
+    return Caso(endpoint, metodo, ruta, datos, opciones)
+
+
+def _csv_importacion(f):
+    contenido = f'fecha,tipo,categoria,monto,persona,monto_persona\n2025-01-01,gasto,comida,1000,{f["persona_nombre"]},500\n'
+    return {'archivo': (io.BytesIO(contenido.encode()), 'movimientos.csv')}
+
+
+def _lote_api(f):
+    return {'movimientos': [{
+        'tipo': 'gasto', 'categoria': 'comida', 'monto': 1000, 'fecha': '2025-01-01',
+        'detalles': [{'persona_id': f['persona'], 'monto': 500}],
+    }]}
+
+
+# Orden de ejecución: lecturas, exportaciones, escrituras, borrados y sesión.
+CASOS = [
+    caso('index', 'GET', '/'),
+    caso('dashboard', 'GET', '/dashboard'),
+    caso('dashboard_table', 'GET', '/dashboard/table'),
+    caso('api_summary', 'GET', '/api/v1/summary'),
+    caso('api_deudas', 'GET', '/api/v1/deudas'),
+    caso('api_series', 'GET', '/api/v1/series?agrupar=dia&rango=todo'),
+    caso('api_movimientos', 'GET', '/api/v1/movimientos?limite=100'),
+    caso('api_deudas_abiertas', 'GET', '/api/v1/personas/{persona}/deudas-abiertas'),
+    caso('api_deudas_abiertas', 'GET', '/api/v1/personas/{persona}/deudas-abiertas?q=a'),
+    caso('personas', 'GET', '/personas'),
+    caso('movimientos', 'GET', '/movimientos'),
+    caso('movimiento_detail', 'GET', '/movimiento/{movimiento}'),
+    caso('movimiento_detail', 'GET', '/movimiento/{movimiento}?abono_id={abono}'),
+    caso('movimiento_detail', 'POST', '/movimiento/{movimiento}'),
+    caso('saldo_favor', 'GET', '/saldo-favor'),
+    caso('saldo_favor_historico', 'GET', '/saldo-favor/historico/{persona}'),
+    caso('importar', 'GET', '/import'),
+    caso('admin_sql', 'GET', '/admin/sql'),
+    caso('metricas_endpoint', 'GET', '/metrics'),
+    caso('export_csv', 'GET', '/export/csv?detalles=1'),
+    caso('export_pdf', 'GET', '/export/pdf', headers={'Accept': 'application/json'}),
+    caso('export_job_estado', 'GET', '/export/jobs/{job}'),
+    caso('export_job_descargar', 'GET', '/export/jobs/{job}/descargar'),
+
+    caso('personas', 'POST', '/personas', {'name': 'Nueva'}),
+    caso('movimientos', 'POST', '/movimientos', {
+        'tipo': 'gasto', 'categoria': 'comida', 'descripcion': 'control', 'monto': '3000', 'fecha': '2025-01-01',
+        'monto_{persona}': '1000', 'pago_{persona}': '1', 'abonado_{persona}': '1000',
+    }),
+    caso('api_movimientos_batch', 'POST', '/api/movimientos/batch', json=_lote_api),
+    caso('importar', 'POST', '/import', _csv_importacion, headers={'Accept': 'application/json'}),
+    caso('abonar', 'POST', '/movimiento/{movimiento}/abonar', {
+        'detalle_id': '{detalle}', 'monto': '100', 'fecha': '2025-12-31T12:00', 'usar_saldo': 'no',
+    }),
+    caso('asignar_abono_indirecto', 'POST', '/abono/{abono}/asignar-indirecto', {
+        'movimiento_id': '{movimiento_destino}', 'montoAcum': '50',
+    }),
+    caso('asignar_abono_automatico', 'POST', '/abono/{abono}/asignar-automatico', {
+        'estrategia': 'proporcional', 'simular': '1',
+    }),
+    caso('asignar_abono_automatico', 'POST', '/abono/{abono}/asignar-automatico', {
+        'estrategia': 'antiguos', 'sobrante': 'saldo',
+    }),
+    caso('toggle_detalle', 'POST', '/api/detalle/{detalle}/toggle'),
+    caso('saldo_favor_add', 'POST', '/saldo-favor/add', {
+        'persona_id': '{persona}', 'monto': '500', 'fecha': '2025-12-31T12:00', 'comentario': 'control',
+    }),
+    caso('delete_abono', 'POST', '/abono/{abono_borrar}/delete'),
+    caso('movimiento_delete', 'POST', '/movimiento/delete/{movimiento_borrar}'),
+    caso('person_delete', 'POST', '/personas/delete/{persona}'),
+    caso('person_delete', 'POST', '/personas/delete/{persona_borrar}'),
+
+    caso('login', 'GET', '/login'),
+    caso('login', 'POST', '/login', {'username': '{username}', 'password': 'bench'}),
+    caso('register', 'GET', '/register'),
+    caso('register', 'POST', '/register', {'username': '{username}-nuevo', 'password': 'bench123'}),
+    caso('logout', 'GET', '/logout'),
+]
+
+# Endpoints que no pasan por la base de datos de la app
+EXCLUIDOS = {'static'}
+
+
+def configurar_entorno(args):
+    """Variables que lee create_app(): hay que fijarlas antes de importar app."""
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='consultas-'), 'consultas.db')
+    os.environ['CACHE_BACKEND'] = 'ninguno'
+    os.environ['EXPORTS_DIR'] = tempfile.mkdtemp(prefix='consultas-exports-')
+    os.environ.pop('METRICS_TOKEN', None)
+
+
+def casos_faltantes(app):
+    """(endpoint, método) registrados sin un caso en CASOS."""
+    cubiertos = {(c.endpoint, c.metodo) for c in CASOS}
+    faltantes = []
+    for regla in app.url_map.iter_rules():
+        if regla.endpoint in EXCLUIDOS:
+            continue
+        for metodo in sorted(regla.methods - {'HEAD', 'OPTIONS'}):
+            if (regla.endpoint, metodo) not in cubiertos:
+                faltantes.append((regla.endpoint, metodo))
+    return faltantes
+
+
+def _movimiento_medido(db, usuario_id, tamano):
+    """Movimiento que usan los casos: quien pagó todo más `tamano.repartos`
+    deudores con `tamano.abonos` abonos cada uno. Se crea una vez por usuario."""
+    from datetime import date, datetime
+    from sqlalchemy import insert
+    from models.move import Movimiento, DetalleMovimiento, Abono
+    from models.users import Person
+    from services.balances import actualizar_balances
+    from services.movimientos import ajustar_abonado, crear_movimientos
+
+    descripcion = f'control consultas {tamano.repartos}x{tamano.abonos}'
+    existente = db.session.query(Movimiento.id).filter_by(user_id=usuario_id, descripcion=descripcion).scalar()
+    if existente:
+        return existente
+
+    personas = [pid for (pid,) in db.session.query(Person.id).filter_by(user_id=usuario_id).order_by(Person.id)]
+    if len(personas) <= tamano.repartos:
+        raise SystemExit(f'{tamano.repartos} repartos necesitan más de {len(personas)} personas.')
+    pagador, deudores = personas[0], personas[1:tamano.repartos + 1]
+    # Cada deudor debe más de lo que abona: sus repartos siguen abiertos
+    monto = 100 * tamano.abonos + 1000
+    detalles = [{'persona_id': pagador, 'monto': monto, 'abonado': monto, 'pago_todo': True}]
+    detalles += [{'persona_id': pid, 'monto': monto, 'abonado': 100, 'pago_todo': False} for pid in deudores]
+    (mov_id,) = crear_movimientos(usuario_id, [{
+        'tipo': 'gasto', 'categoria': 'control', 'descripcion': descripcion,
+        'monto': monto * len(detalles), 'fecha': date(2025, 1, 1), 'detalles': detalles,
+    }])
+
+    extra = tamano.abonos - 1
+    if extra > 0:
+        repartos = [d for (d,) in db.session.query(DetalleMovimiento.id).filter_by(movimiento_id=mov_id, pago_todo=False)]
+        db.session.execute(insert(Abono), [
+            {'detalle_id': d, 'monto': 100, 'fecha': datetime(2025, 1, 2)} for d in repartos for _ in range(extra)
+        ])
+        ajustar_abonado({d: 100 * extra for d in repartos})
+        actualizar_balances(usuario_id, deudores)
+    db.session.commit()
+    return mov_id
+
+
+def preparar_usuario(db, prefijo, tamano, semilla):
+    """Genera (o reutiliza) el usuario sintético y devuelve los ids que usan los casos.
+
+    Además del volumen (movimientos y personas), crece la forma del
+    movimiento medido: más repartos y más abonos por reparto en el usuario
+    grande, de modo que una ruta que los recorra fila por fila también se
+    detecta.
+    """
+    from generar_datos import generar
+    from models.move import Movimiento, DetalleMovimiento, Abono
+    from models.users import User, Person
+
+    username = f'{prefijo}0'
+    usuario = User.query.filter_by(username=username).first()
+    if usuario is None:
+        ids, _ = generar(tamano.movimientos, personas=tamano.personas, semilla=semilla, prefijo=prefijo)
+        usuario = db.session.get(User, ids[username])
+
+    mov_id = _movimiento_medido(db, usuario.id, tamano)
+    detalle, abono_id = db.session.query(DetalleMovimiento, Abono.id).join(
+        Abono, Abono.detalle_id == DetalleMovimiento.id,
+    ).filter(
+        DetalleMovimiento.movimiento_id == mov_id,
+        DetalleMovimiento.pago_todo.is_(False),
+    ).order_by(DetalleMovimiento.id, Abono.id).first()
+    pagador = DetalleMovimiento.query.filter_by(movimiento_id=mov_id, pago_todo=True).one()
+
+    destino = db.session.query(DetalleMovimiento.movimiento_id).filter(
+        DetalleMovimiento.persona_id == pagador.persona_id,
+        DetalleMovimiento.pago_todo.is_(False),
+        DetalleMovimiento.falta > 0,
+    ).order_by(DetalleMovimiento.id).limit(1).scalar()
+    abono_borrar = db.session.query(Abono.id).join(
+        DetalleMovimiento, DetalleMovimiento.id == Abono.detalle_id,
+    ).join(
+        Movimiento, Movimiento.id == DetalleMovimiento.movimiento_id,
+    ).filter(
+        Movimiento.user_id == usuario.id,
+        Abono.id != abono_id,
+        DetalleMovimiento.movimiento_id != detalle.movimiento_id,
+    ).order_by(Abono.id).limit(1).scalar()
+    sin_repartos = db.session.query(Movimiento.id).filter(
+        Movimiento.user_id == usuario.id,
+        ~Movimiento.id.in_(db.session.query(DetalleMovimiento.movimiento_id)),
+    ).order_by(Movimiento.id).limit(1).scalar()
+
+    persona = db.session.get(Person, pagador.persona_id)
+    nueva = Person(name='Sin movimientos', user_id=usuario.id)
+    db.session.add(nueva)
+    db.session.commit()
+
+    return {
+        'user_id': usuario.id,
+        'username': username,
+        'persona': persona.id,
+        'persona_nombre': persona.name,
+        'persona_borrar': nueva.id,
+        'movimiento': detalle.movimiento_id,
+        'detalle': detalle.id,
+        'abono': abono_id,
+        'abono_borrar': abono_borrar,
+        'movimiento_destino': destino or 0,
+        'movimiento_borrar': sin_repartos,
+    }
+
+
+def _formatear(valor, fixture):
+    if callable(valor):
+        return valor(fixture)
+    if isinstance(valor, dict):
+        return {k.format(**fixture): _formatear(v, fixture) for k, v in valor.items()}
+    if isinstance(valor, str):
+        return valor.format(**fixture)
+    return valor
+
+
+def ejecutar(app, fixture, contador):
+    """Corre todos los casos con el usuario del fixture; devuelve {etiqueta: (status, consultas)}."""
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s['_user_id'] = str(fixture['user_id'])
+        s['_fresh'] = True
+
+    jobs = app.extensions['jobs']
+    resultados = {}
+    for c in CASOS:
+        ruta = c.ruta.format(**fixture)
+        kwargs = {'headers': c.opciones.get('headers')}
+        if c.datos is not None:
+            kwargs['data'] = _formatear(c.datos, fixture)
+        if 'json' in c.opciones:
+            kwargs['json'] = _formatear(c.opciones['json'], fixture)
+
+        antes = contador.total
+        r = client.open(ruta, method=c.metodo, **kwargs)
+        r.get_data()
+        consultas = contador.total - antes
+
+        if c.endpoint == 'export_pdf':
+            # El trabajo corre en otro hilo (sus consultas no se cuentan); se espera a que termine
+            fixture['job'] = r.get_json()['job_id']
+            while jobs.estado(fixture['job'])['estado'] not in ('listo', 'error'):
+                time.sleep(0.01)
+
+        resultados[f'{c.metodo} {c.endpoint} {c.ruta}'] = (r.status_code, consultas)
+    return resultados
+
+
+class Contador:
+    """Cuenta las sentencias ejecutadas dentro de una petición (no las de hilos de fondo)."""
+
+    def __init__(self, engine):
+        from flask import has_request_context
+        from sqlalchemy import event
+        self.total = 0
+        self._en_peticion = has_request_context
+        event.listen(engine, 'before_cursor_execute', self._contar)
+
+    def _contar(self, *args):
+        if self._en_peticion():
+            self.total += 1
+
+
+def prefijo_usuario(tamano):
+    return f'consultas-{tamano.movimientos}-{tamano.repartos}x{tamano.abonos}-'
+
+
+def comparar(app, db, chico=CHICO, grande=GRANDE, semilla=42):
+    """Corre CASOS con un usuario chico y uno grande.
+
+    Devuelve (motor, filas, errores): filas = [(etiqueta, status, consultas
+    chico, consultas grande)] y errores, vacío si ninguna ruta escala con
+    los datos, responde con error o falta en CASOS.
+    """
+    from sqlalchemy import event
+
+    errores = [f'{endpoint} {metodo}: sin caso en CASOS' for endpoint, metodo in casos_faltantes(app)]
+
+    with app.app_context():
+        db.create_all()
+        contador = Contador(db.engine)
+        fixtures = {
+            'chico': preparar_usuario(db, prefijo_usuario(chico), chico, semilla),
+            'grande': preparar_usuario(db, prefijo_usuario(grande), grande, semilla),
+        }
+        motor = db.engine.dialect.name
+
+    try:
+        resultados_chico = ejecutar(app, fixtures['chico'], contador)
+        resultados_grande = ejecutar(app, fixtures['grande'], contador)
+    finally:
+        with app.app_context():
+            event.remove(db.engine, 'before_cursor_execute', contador._contar)
+
+    filas = []
+    for etiqueta, (status_chico, n_chico) in resultados_chico.items():
+        status, n_grande = resultados_grande[etiqueta]
+        if n_grande > n_chico:
+            errores.append(f'{etiqueta}: {n_chico} → {n_grande} consultas')
+        if max(status, status_chico) >= 500 or 404 in (status, status_chico):
+            errores.append(f'{etiqueta}: status {status_chico}/{status}')
+        filas.append((etiqueta, status_chico, status, n_chico, n_grande))
+    return motor, filas, errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verifica que las consultas por ruta no crezcan con los datos.')
+    parser.add_argument('--database-url', help='Base a usar (por defecto un SQLite temporal)')
+    parser.add_argument('--chico', type=int, default=CHICO.movimientos, help='Movimientos del usuario chico')
+    parser.add_argument('--grande', type=int, default=GRANDE.movimientos, help='Movimientos del usuario grande')
+    parser.add_argument('--personas-chico', type=int, default=CHICO.personas)
+    parser.add_argument('--personas-grande', type=int, default=GRANDE.personas)
+    parser.add_argument('--repartos-chico', type=int, default=CHICO.repartos, help='Deudores del movimiento medido')
+    parser.add_argument('--repartos-grande', type=int, default=GRANDE.repartos)
+    parser.add_argument('--abonos-chico', type=int, default=CHICO.abonos, help='Abonos por reparto del movimiento medido')
+    parser.add_argument('--abonos-grande', type=int, default=GRANDE.abonos)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    chico = Tamano(args.chico, args.personas_chico, args.repartos_chico, args.abonos_chico)
+    grande = Tamano(args.grande, args.personas_grande, args.repartos_grande, args.abonos_grande)
+
+    configurar_entorno(args)
+    os.environ['ADMIN_USERS'] = f'{prefijo_usuario(chico)}0,{prefijo_usuario(grande)}0'
+    from app import app, db
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    motor, filas, errores = comparar(app, db, chico, grande, args.semilla)
+
+    print(f'📋 Motor: {motor} | movimientos: {chico.movimientos} vs {grande.movimientos} | personas: {chico.personas} vs {grande.personas}'
+          f' | movimiento medido: {chico.repartos}x{chico.abonos} vs {grande.repartos}x{grande.abonos} (repartos x abonos)')
+    print(f'{"caso":<72} {"status":>6} {"chico":>6} {"grande":>7}')
+    for etiqueta, status_chico, status, n_chico, n_grande in filas:
+        marca = ''
+        if n_grande > n_chico:
+            marca = '  ❌ crece con los datos'
+        if max(status, status_chico) >= 500 or 404 in (status, status_chico):
+            marca += f'  ❌ status {status_chico}/{status}'
+        print(f'{etiqueta:<72} {status:>6} {n_chico:>6} {n_grande:>7}{marca}')
+
+    if errores:
+        print(f'\n❌ {len(errores)} problema(s):')
+        for e in errores:
+            print(f'  - {e}')
+        sys.exit(1)
+    print('\n✅ Ninguna ruta escala con la cantidad de datos.')
+
+
+if __name__ == '__main__':
+    main()